@@ -9,6 +9,9 @@ from logging.handlers import RotatingFileHandler
 import json
 from scenarios_data import PREDEFINED_SCENARIOS
 from database import db
+from interaction_writer import interaction_writer
+from llm_ledger import llm_ledger
+import job_queue
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -53,6 +56,8 @@ def create_app():
     
     # Initialize extensions
     db.init_app(app)
+    interaction_writer.init_app(app)
+    llm_ledger.init_app(app)
     socketio.init_app(app, async_mode='eventlet')
     
     return app
@@ -60,6 +65,9 @@ def create_app():
 app = create_app()
 logger.info('Application instance created')
 
+# Emits events for exchanges generated by distributed workers
+job_event_relay = job_queue.JobEventRelay(app, socketio)
+
 # Import models after creating db instance
 from models import Persona, Simulation, Interaction, Scenario
 
@@ -225,9 +233,19 @@ def analytics():
             if hour is not None:
                 hourly_activity['values'][int(hour)] = count
 
+        # LLM spend from the call ledger, most expensive first
+        llm_usage = {
+            'totals': llm_ledger.totals(),
+            'scenarios': llm_ledger.breakdown('scenario', limit=10),
+            'depths': llm_ledger.breakdown('depth', limit=10),
+            'simulations': llm_ledger.breakdown('simulation', limit=10),
+            'personas': llm_ledger.breakdown('persona', limit=10)
+        }
+
         return render_template(
             "analytics.html",
             metrics=metrics,
+            llm_usage=llm_usage,
             timeline_data=timeline_data,
             persona_distribution=persona_distribution,
             traits_data=traits_data,
@@ -294,9 +312,28 @@ def simulation():
         flash("Error loading simulation data.", "error")
         return redirect(url_for("index"))
 
+def parse_persona_ids(value):
+    """Persona ids from request data; raises ValueError unless it is a list of integers."""
+    if not isinstance(value, list) or not all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+        raise ValueError("Personas must be a list of persona ids")
+    return value
+
+def parse_bounded_int(value, name, low, high):
+    """An integer request option within [low, high]; raises ValueError naming the option otherwise."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}")
+    if not low <= value <= high:
+        raise ValueError(f"{name[0].upper() + name[1:]} must be between {low} and {high}")
+    return value
+
 @app.route("/simulation/start", methods=["POST"])
 def start_simulation():
     from simulation_manager import SimulationManager
+    from simulation_budget import SimulationBudget
+    from simulation_estimator import estimate_simulation
+    from llm_cache import llm_cache
     try:
         data = request.get_json()
         name = data.get("name")
@@ -304,9 +341,18 @@ def start_simulation():
         persona_ids = data.get("personas")
         custom_context = data.get("custom_context")
         conversation_depth = data.get("conversation_depth", "medium")
+        parallelism = data.get("parallelism", 1)
+        priority = data.get("priority", 1)
+        conversation_mode = data.get("conversation_mode", "pairwise")
+        exchanges_per_call = data.get("exchanges_per_call", 1)
+        cache_policy = data.get("cache_policy") or llm_cache.default_policy
         
         # Validate required fields
-        if not all([name, scenario_id, persona_ids]) or len(persona_ids) < 2:
+        try:
+            persona_ids = parse_persona_ids(persona_ids)
+        except ValueError:
+            persona_ids = None
+        if not all([name, scenario_id, persona_ids]) or not isinstance(scenario_id, int) or len(persona_ids) < 2:
             logger.warning('Invalid simulation start request')
             return jsonify({"error": "Invalid request data"}), 400
         
@@ -315,6 +361,40 @@ def start_simulation():
         if conversation_depth not in valid_depths:
             logger.warning(f'Invalid conversation depth: {conversation_depth}')
             return jsonify({"error": "Invalid conversation depth"}), 400
+        
+        # Validate parallelism (number of conversation pairs generated concurrently)
+        try:
+            parallelism = parse_bounded_int(parallelism, "parallelism", 1, SimulationManager.MAX_PARALLELISM)
+        except ValueError as e:
+            logger.warning(f'Invalid parallelism: {parallelism}')
+            return jsonify({"error": str(e)}), 400
+        
+        # Validate priority (fair-share weight when simulations compete for LLM capacity)
+        try:
+            priority = int(priority)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid priority"}), 400
+        if not 1 <= priority <= SimulationManager.MAX_PRIORITY:
+            logger.warning(f'Invalid priority: {priority}')
+            return jsonify({"error": f"Priority must be between 1 and {SimulationManager.MAX_PRIORITY}"}), 400
+        
+        # Validate conversation mode (pairwise exchanges, or whole-roster group rounds)
+        if conversation_mode not in SimulationManager.CONVERSATION_MODES:
+            logger.warning(f'Invalid conversation mode: {conversation_mode}')
+            return jsonify({"error": "Invalid conversation mode"}), 400
+        
+        # Validate exchanges per call (consecutive exchanges of a pair generated in one request)
+        try:
+            exchanges_per_call = parse_bounded_int(exchanges_per_call, "exchanges per call", 1,
+                                                   SimulationManager.MAX_EXCHANGES_PER_CALL)
+        except ValueError as e:
+            logger.warning(f'Invalid exchanges per call: {exchanges_per_call}')
+            return jsonify({"error": str(e)}), 400
+        
+        # Validate LLM response cache policy
+        if cache_policy not in llm_cache.POLICIES:
+            logger.warning(f'Invalid cache policy: {cache_policy}')
+            return jsonify({"error": "Invalid cache policy"}), 400
             
         # Validate scenario requirements
         scenario = Scenario.query.get(scenario_id)
@@ -324,6 +404,23 @@ def start_simulation():
         if len(persona_ids) < scenario.min_participants or \
            (scenario.max_participants and len(persona_ids) > scenario.max_participants):
             return jsonify({"error": "Invalid number of participants for selected scenario"}), 400
+        
+        # Validate the optional budget and reject runs expected to exceed it
+        try:
+            budget = SimulationBudget.from_dict(data.get("budget"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if budget:
+            estimate = estimate_simulation(persona_ids, conversation_depth, scenario=scenario,
+                                           custom_context=custom_context, conversation_mode=conversation_mode,
+                                           exchanges_per_call=exchanges_per_call, parallelism=parallelism)
+            violations = budget.check_estimate(estimate)
+            if violations:
+                logger.warning(f'Rejected simulation {name}: estimate exceeds budget ({"; ".join(violations)})')
+                return jsonify({
+                    "error": f"Estimated usage exceeds the budget: {'; '.join(violations)}",
+                    "estimate": estimate
+                }), 400
             
         simulation = Simulation(
             name=name,
@@ -334,13 +431,36 @@ def start_simulation():
         db.session.add(simulation)
         db.session.commit()
         
+        if job_queue.is_distributed() and conversation_mode == 'pairwise':
+            # Workers claim the exchanges; this process only relays their events.
+            # Group rounds are sequential by nature and always run in-process.
+            job_queue.enqueue_simulation(simulation, persona_ids, conversation_depth,
+                                         custom_context=custom_context, priority=priority,
+                                         exchanges_per_call=exchanges_per_call, cache_policy=cache_policy,
+                                         budget=budget)
+            socketio.emit('simulation_started', {
+                'simulation_id': simulation.id,
+                'status': 'running',
+                'message': 'Simulation queued for workers',
+                'conversation_depth': conversation_depth
+            })
+            logger.info(f'Queued simulation: {name} with scenario: {scenario.name} '
+                       f'and depth: {conversation_depth}')
+            return jsonify({"simulation_id": simulation.id}), 200
+        
         # Pass validated conversation depth to SimulationManager
         manager = SimulationManager(
             simulation.id,
             persona_ids=persona_ids,
             socketio=socketio,
             app=app,
-            conversation_depth=conversation_depth
+            conversation_depth=conversation_depth,
+            parallelism=parallelism,
+            priority=priority,
+            conversation_mode=conversation_mode,
+            exchanges_per_call=exchanges_per_call,
+            cache_policy=cache_policy,
+            budget=budget
         )
         
         # Pass custom context to the simulation manager
@@ -348,7 +468,7 @@ def start_simulation():
         manager.start_simulation()
         
         logger.info(f'Started simulation: {name} with scenario: {scenario.name} '
-                   f'and depth: {conversation_depth}')
+                   f'and depth: {conversation_depth}, parallelism: {parallelism}, mode: {conversation_mode}')
         
         return jsonify({"simulation_id": simulation.id}), 200
     except Exception as e:
@@ -356,18 +476,141 @@ def start_simulation():
         logger.error(f'Error starting simulation: {str(e)}')
         return jsonify({"error": str(e)}), 500
 
+@app.route("/simulation/estimate", methods=["POST"])
+def estimate_simulation_route():
+    """Pre-flight estimate of a simulation's exchanges, tokens, cost and duration."""
+    from simulation_manager import SimulationManager
+    from simulation_budget import SimulationBudget
+    from simulation_estimator import estimate_simulation
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request data"}), 400
+        conversation_depth = data.get("conversation_depth", "medium")
+        conversation_mode = data.get("conversation_mode", "pairwise")
+        if conversation_depth not in SimulationManager.DEPTH_RANGES:
+            return jsonify({"error": "Invalid conversation depth"}), 400
+        if conversation_mode not in SimulationManager.CONVERSATION_MODES:
+            return jsonify({"error": "Invalid conversation mode"}), 400
+        try:
+            persona_ids = parse_persona_ids(data.get("personas") or [])
+            parallelism = parse_bounded_int(data.get("parallelism", 1), "parallelism", 1,
+                                            SimulationManager.MAX_PARALLELISM)
+            exchanges_per_call = parse_bounded_int(data.get("exchanges_per_call", 1), "exchanges per call", 1,
+                                                   SimulationManager.MAX_EXCHANGES_PER_CALL)
+            budget = SimulationBudget.from_dict(data.get("budget"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        scenario_id = data.get("scenario_id")
+        if scenario_id is not None and (not isinstance(scenario_id, int) or isinstance(scenario_id, bool)):
+            return jsonify({"error": "Invalid scenario"}), 400
+
+        scenario = Scenario.query.get(scenario_id) if scenario_id else None
+        estimate = estimate_simulation(persona_ids, conversation_depth, scenario=scenario,
+                                       custom_context=data.get("custom_context"),
+                                       conversation_mode=conversation_mode,
+                                       exchanges_per_call=exchanges_per_call, parallelism=parallelism)
+        estimate["budget_violations"] = budget.check_estimate(estimate) if budget else []
+        return jsonify(estimate), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f'Database error estimating simulation: {str(e)}')
+        return jsonify({"error": "Error estimating simulation"}), 500
+
 @app.route("/simulation/<int:id>/stop", methods=["POST"])
 def stop_simulation(id):
     from simulation_manager import SimulationManager
+    from simulation_registry import simulation_registry
     try:
-        manager = SimulationManager(id, socketio=socketio, app=app)
-        manager.end_simulation()
+        manager = simulation_registry.get(id)
+        if manager:
+            # Reach the running greenthreads and cancel in-flight LLM requests
+            manager.end_simulation("Simulation stopped by user")
+        else:
+            # Not live in this process; drop any queued worker jobs and close out the database record
+            if job_queue.has_jobs(id):
+                job_queue.cancel_jobs(id)
+                job_event_relay.forget(id)
+            manager = SimulationManager(id, socketio=socketio, app=app)
+            manager.end_simulation()
         logger.info(f'Stopped simulation: {id}')
         return jsonify({"status": "success"}), 200
     except Exception as e:
         logger.error(f'Error stopping simulation: {str(e)}')
         return jsonify({"error": str(e)}), 500
 
+@app.route("/simulation/<int:id>/pause", methods=["POST"])
+def pause_simulation(id):
+    from simulation_registry import simulation_registry
+    manager = simulation_registry.get(id)
+    if not manager:
+        return jsonify({"error": "Simulation is not running"}), 404
+    if not manager.pause():
+        return jsonify({"error": "Simulation is already paused"}), 409
+    logger.info(f'Paused simulation: {id}')
+    return jsonify({"status": "paused"}), 200
+
+@app.route("/simulation/<int:id>/resume", methods=["POST"])
+def resume_simulation(id):
+    from simulation_registry import simulation_registry
+    manager = simulation_registry.get(id)
+    if not manager:
+        return jsonify({"error": "Simulation is not running"}), 404
+    if not manager.resume():
+        return jsonify({"error": "Simulation is not paused"}), 409
+    logger.info(f'Resumed simulation: {id}')
+    return jsonify({"status": "running"}), 200
+
+@app.route("/simulations/live")
+def live_simulations():
+    from simulation_registry import simulation_registry
+    return jsonify({
+        "simulations": [manager.get_progress() for manager in simulation_registry.list()]
+    })
+
+@app.route("/api/llm/status")
+def llm_status():
+    from llm_governor import llm_governor
+    from rate_limiter import llm_rate_limiter
+    from retry_policy import llm_circuit_breaker, llm_retry_policy
+    from llm_cache import llm_cache
+    from structured_output import response_parser
+    from prompt_compiler import prompt_compiler
+    from llm_backends import llm_backends, model_router
+    return jsonify({
+        "governor": llm_governor.get_stats(),
+        "rate_limiter": llm_rate_limiter.get_stats(),
+        "circuit_breaker": llm_circuit_breaker.get_stats(),
+        "retries": llm_retry_policy.get_stats(),
+        "cache": llm_cache.get_stats(),
+        "parsing": response_parser.get_stats(),
+        "prompts": prompt_compiler.get_stats(),
+        "backends": llm_backends.get_stats(),
+        "routing": model_router.get_stats(),
+        "ledger": llm_ledger.get_stats()
+    })
+
+@app.route("/api/llm/usage")
+def llm_usage():
+    """Token and cost aggregates from the LLM call ledger, overall or for one simulation."""
+    simulation_id = request.args.get('simulation_id', type=int)
+    dimensions = request.args.getlist('by') or list(llm_ledger.DIMENSIONS)
+    try:
+        return jsonify({
+            "simulation_id": simulation_id,
+            "totals": llm_ledger.totals(simulation_id),
+            "breakdown": {
+                dimension: llm_ledger.breakdown(dimension, simulation_id,
+                                                limit=request.args.get('limit', 20, type=int))
+                for dimension in dimensions
+            }
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except SQLAlchemyError as e:
+        logger.error(f'Database error in LLM usage route: {str(e)}')
+        return jsonify({"error": "Database error occurred"}), 500
+
 @app.route("/results")
 def results():
     try:
@@ -606,4 +849,13 @@ def create_scenario():
 
 if __name__ == '__main__':
     init_db()
+    
+    # Resume interrupted simulations in the serving process only, not the reloader watcher
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        import eventlet
+        from simulation_manager import resume_running_simulations
+        eventlet.spawn(resume_running_simulations, app, socketio)
+        if job_queue.is_distributed():
+            job_event_relay.start()
+    
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
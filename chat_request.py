@@ -1,15 +1,29 @@
 import os
-import json
-from openai import OpenAI
+import time
+import uuid
+from openai import RateLimitError
 from app import logger
 from datetime import datetime, timedelta
+from rate_limiter import llm_rate_limiter
+from llm_governor import llm_governor
+from retry_policy import llm_circuit_breaker, llm_retry_policy
+from llm_cache import llm_cache, build_completion, completion_text
+from llm_ledger import llm_ledger, CallUsage
+from llm_backends import llm_backends, model_router, LARGE_MODEL
+from conflict_matrix import (BEHAVIOR_CONFLICTS, INTERACTION_CONFLICTS, COMMUNICATION_CONFLICTS,
+                             PERSONALITY_KEYWORDS, CLASHING_TRAITS, COMPETING_GOAL_KEYWORDS,
+                             LEADERSHIP_CONFLICT, GOAL_MISALIGNMENT)
+from prompt_compiler import prompt_compiler
+from structured_output import response_parser, EXCHANGE_SCHEMA, EXCHANGES_SCHEMA, GROUP_ROUND_SCHEMA
+from stream_parser import DialogueStreamParser
 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+MODEL = LARGE_MODEL  # Largest model requests are routed to; see ModelRouter
+TEMPERATURE = 0.7
 MAX_HISTORY_INTERACTIONS = 5  # Maximum number of previous interactions to include
+MAX_EXCHANGES_PER_CALL = 5  # Upper bound on consecutive exchanges generated in one request
+EXPECTED_COMPLETION_TOKENS = 600  # Completion size assumed when pacing requests
+STREAMING = os.environ.get("LLM_STREAMING", "false") == "true"  # push dialogue text as it is generated
+STREAM_EMIT_INTERVAL = 0.15  # seconds between coalesced dialogue deltas
 
 def validate_persona(persona):
     """Validate persona data before generating interaction."""
@@ -28,54 +42,29 @@ def analyze_potential_conflicts(initiator, receiver):
     
     # Analyze behavior pattern conflicts
     if initiator.behavior_pattern != receiver.behavior_pattern:
-        behavior_conflicts = {
-            ('proactive', 'reactive'): "Potential tension between proactive and reactive approaches",
-            ('analytical', 'creative'): "Possible conflict between analytical and creative thinking styles",
-            ('balanced', 'proactive'): "May experience pressure from different pace preferences",
-            ('balanced', 'reactive'): "Could face challenges in initiative-taking"
-        }
         pattern_pair = tuple(sorted([initiator.behavior_pattern, receiver.behavior_pattern]))
-        if pattern_pair in behavior_conflicts:
-            conflicts.append(behavior_conflicts[pattern_pair])
+        if pattern_pair in BEHAVIOR_CONFLICTS:
+            conflicts.append(BEHAVIOR_CONFLICTS[pattern_pair])
     
     # Analyze interaction style conflicts
-    interaction_conflicts = {
-        ('formal', 'casual'): "Communication style mismatch between formal and casual approaches",
-        ('enthusiastic', 'reserved'): "Potential discomfort between enthusiastic and reserved personalities",
-        ('neutral', 'formal'): "May experience formality level misalignment",
-        ('neutral', 'casual'): "Could face differences in communication expectations"
-    }
     style_pair = tuple(sorted([initiator.interaction_style, receiver.interaction_style]))
-    if style_pair in interaction_conflicts:
-        conflicts.append(interaction_conflicts[style_pair])
+    if style_pair in INTERACTION_CONFLICTS:
+        conflicts.append(INTERACTION_CONFLICTS[style_pair])
     
     # Analyze communication preference conflicts
     if hasattr(initiator, 'communication_preference') and hasattr(receiver, 'communication_preference'):
-        comm_conflicts = {
-            ('direct', 'diplomatic'): "Tension between direct and diplomatic communication styles",
-            ('detailed', 'concise'): "Potential conflict in information exchange preferences",
-            ('storytelling', 'direct'): "May struggle with different narrative approaches",
-            ('concise', 'storytelling'): "Could face challenges in communication depth"
-        }
         comm_pair = tuple(sorted([initiator.communication_preference, receiver.communication_preference]))
-        if comm_pair in comm_conflicts:
-            conflicts.append(comm_conflicts[comm_pair])
+        if comm_pair in COMMUNICATION_CONFLICTS:
+            conflicts.append(COMMUNICATION_CONFLICTS[comm_pair])
     
     # Analyze personality-based conflicts
-    personality_keywords = {
-        'competitive': ['ambitious', 'driven', 'assertive'],
-        'collaborative': ['cooperative', 'team-oriented', 'supportive'],
-        'analytical': ['logical', 'methodical', 'systematic'],
-        'creative': ['innovative', 'artistic', 'imaginative']
-    }
-    
     initiator_traits = set(word.lower() for word in initiator.personality.split())
     receiver_traits = set(word.lower() for word in receiver.personality.split())
     
-    for trait_category, keywords in personality_keywords.items():
+    for trait_category, keywords in PERSONALITY_KEYWORDS.items():
         if any(word in initiator_traits for word in keywords) and \
            any(word in receiver_traits for word in keywords) and \
-           trait_category in ['competitive', 'analytical']:
+           trait_category in CLASHING_TRAITS:
             conflicts.append(f"Potential competition/conflict in {trait_category} approaches")
     
     # Analyze goal alignment and conflicts
@@ -83,16 +72,21 @@ def analyze_potential_conflicts(initiator, receiver):
     receiver_goals = set(receiver.goals.lower().split())
     
     # Check for competing goals
-    competing_keywords = {'lead', 'control', 'direct', 'manage', 'decide'}
-    if initiator_goals.intersection(competing_keywords) and receiver_goals.intersection(competing_keywords):
-        conflicts.append("Competing leadership or control objectives")
+    if initiator_goals.intersection(COMPETING_GOAL_KEYWORDS) and receiver_goals.intersection(COMPETING_GOAL_KEYWORDS):
+        conflicts.append(LEADERSHIP_CONFLICT)
     
     # Check for goal misalignment
     if not initiator_goals.intersection(receiver_goals):
-        conflicts.append("Significantly different goals and objectives")
+        conflicts.append(GOAL_MISALIGNMENT)
     
     return conflicts
 
+def pair_conflicts(initiator, receiver, conflict_matrix=None):
+    """Potential conflicts of a pair, from the roster's compiled matrix when there is one."""
+    if conflict_matrix is not None:
+        return conflict_matrix.conflicts(initiator, receiver)
+    return analyze_potential_conflicts(initiator, receiver)
+
 def format_dialogue(interaction_data):
     """Format dialogue content consistently."""
     try:
@@ -112,9 +106,10 @@ def format_dialogue(interaction_data):
 def get_recent_interactions(simulation_id, initiator_id, receiver_id):
     """Get recent interactions between the personas in the simulation."""
     from models import Interaction
-    from app import db
+    from sqlalchemy.orm import joinedload
     
     recent = (Interaction.query
+             .options(joinedload(Interaction.initiator), joinedload(Interaction.receiver))
              .filter(Interaction.simulation_id == simulation_id)
              .filter(((Interaction.initiator_id == initiator_id) & 
                      (Interaction.receiver_id == receiver_id)) |
@@ -135,12 +130,15 @@ def get_recent_interactions(simulation_id, initiator_id, receiver_id):
         for interaction in reversed(recent)
     ]
 
-def format_conversation_history(history):
-    """Format conversation history for the prompt."""
-    if not history:
+def format_conversation_history(history, summary=""):
+    """Format conversation history, after the rolling summary of earlier exchanges if any, for the prompt."""
+    if not history and not summary:
         return ""
     
-    formatted = "\nPrevious interactions:\n"
+    formatted = f"\n{summary}\n" if summary else ""
+    if not history:
+        return formatted
+    formatted += "\nPrevious interactions:\n"
     for interaction in history:
         formatted += f"[{interaction['timestamp'].strftime('%H:%M:%S')}]\n"
         formatted += f"Content: {interaction['content']}\n"
@@ -150,123 +148,417 @@ def format_conversation_history(history):
         formatted += "---\n"
     return formatted
 
-def generate_interaction(initiator, receiver, context, simulation_id=None, retry_count=0):
+def estimate_tokens(messages, completion_tokens=EXPECTED_COMPLETION_TOKENS):
+    """Rough token estimate (about 4 characters per token) used for rate-limit pacing."""
+    return sum(len(message['content']) for message in messages) // 4 + completion_tokens
+
+def get_retry_after(error):
+    """Extract the Retry-After interval in seconds from a rate limit error, if present."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def stream_chat_completion(client, messages, model, temperature, on_delta, request_options=None):
+    """Stream a completion, passing dialogue text to `on_delta(stream_id, index, text)` as it arrives.
+
+    `stream_id` is new for every request, so a consumer can discard the partial
+    text of an attempt that failed and is being retried. Returns the assembled
+    completion in the same shape as a non-streamed one.
+    """
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True},
+        **(request_options or {})
+    )
+    stream_id = uuid.uuid4().hex[:12]
+    parser = DialogueStreamParser()
+    content = []
+    pending = {}
+    usage = None
+    finish_reason = None
+    response_model = model
+    last_emit = time.monotonic()
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+            response_model = getattr(chunk, 'model', None) or response_model
+            if not chunk.choices:
+                continue
+            # The last choice chunk says why generation stopped, e.g. 'length' when truncated
+            finish_reason = getattr(chunk.choices[0], 'finish_reason', None) or finish_reason
+            delta = chunk.choices[0].delta
+            text = delta.content
+            if not text and getattr(delta, 'tool_calls', None):
+                # Forced function calls stream the JSON as argument fragments
+                text = delta.tool_calls[0].function.arguments if delta.tool_calls[0].function else None
+            if not text:
+                continue
+            content.append(text)
+            for index, piece in parser.feed(text):
+                pending[index] = pending.get(index, '') + piece
+            # Coalesce token-sized pieces so the socket is not flooded
+            if pending and time.monotonic() - last_emit >= STREAM_EMIT_INTERVAL:
+                for index, piece in sorted(pending.items()):
+                    on_delta(stream_id, index, piece)
+                pending = {}
+                last_emit = time.monotonic()
+    finally:
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+    for index, piece in sorted(pending.items()):
+        on_delta(stream_id, index, piece)
+    
+    response = build_completion(''.join(content), response_model,
+                                getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None),
+                                finish_reason)
+    if usage is None:
+        response.usage = None
+    return response
+
+def create_chat_completion(messages, model=MODEL, temperature=TEMPERATURE, simulation_id=None,
+                           completion_tokens=EXPECTED_COMPLETION_TOKENS, on_delta=None, request_options=None,
+                           usage=None):
+    """Send a chat completion request through the circuit breaker, concurrency governor and rate limiter.
+
+    The request goes to the backend serving `model`, and its outcome feeds the router's model stats.
+    Simulations with a cache-first policy are answered from the response cache when possible.
+    With `on_delta` the completion is streamed and dialogue text is passed on as it arrives.
+    `request_options` are extra create() arguments, e.g. a response format or forced tool call.
+    `usage` (a CallUsage) accumulates tokens and latency of every attempt for the ledger.
+    """
+    if usage is not None:
+        usage.attempts += 1
+    cached = llm_cache.lookup(simulation_id, model, temperature, messages)
+    if cached is not None:
+        if usage is not None:
+            usage.add(cached, cache_status='hit')
+        return cached
+    
+    estimated_tokens = estimate_tokens(messages, completion_tokens)
+    client = llm_backends.client(model)
+    
+    # Hold here while the provider is degraded, before taking a concurrency slot
+    llm_circuit_breaker.before_call()
+    with llm_governor.slot(simulation_id):
+        # Replayed calls never reach the provider, so its quota does not apply
+        if not getattr(client, 'is_replay', False):
+            llm_rate_limiter.acquire(estimated_tokens)
+        started = time.monotonic()
+        try:
+            if on_delta is not None and getattr(client, 'supports_streaming', True):
+                response = stream_chat_completion(client, messages, model, temperature, on_delta, request_options)
+            else:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    **(request_options or {})
+                )
+        except RateLimitError as e:
+            model_router.record(model, failed=True)
+            llm_rate_limiter.record_rate_limited(get_retry_after(e))
+            raise
+        except Exception as e:
+            model_router.record(model, failed=True)
+            llm_circuit_breaker.record_failure(e)
+            raise
+    
+    latency = time.monotonic() - started
+    llm_circuit_breaker.record_success()
+    model_router.record(model, latency)
+    if usage is not None:
+        usage.add(response, latency,
+                  'miss' if llm_cache.policy(simulation_id) == 'cache_first' else 'off')
+    reported = getattr(response, 'usage', None)
+    llm_rate_limiter.record_success(
+        actual_tokens=reported.total_tokens if reported else None,
+        estimated_tokens=estimated_tokens
+    )
+    return response
+
+def generate_interaction(initiator, receiver, context, simulation_id=None, retry_policy=None):
     """Generate interaction between two personas with enhanced analysis and conflict tracking."""
+    return generate_interactions(initiator, receiver, context, simulation_id=simulation_id,
+                                 count=1, retry_policy=retry_policy)[0]
+
+def generate_interactions(initiator, receiver, context, simulation_id=None, count=1, retry_policy=None,
+                          on_delta=None, conflict_matrix=None, history=None, history_summary="", depth=0,
+                          max_depth=None):
+    """Generate `count` consecutive exchanges between two personas in a single request.
+
+    Returns a list of 1 to `count` interaction dicts, each with its own outcome and analysis.
+    `on_delta(stream_id, index, text)` streams each exchange's dialogue as it is generated.
+    `history` is the pair's recent exchanges and `history_summary` the rolling summary of older
+    ones (see ConversationHistory); when omitted the recent exchanges are read from the database.
+    `depth` (exchanges the pair already had) and `max_depth` drive the model choice.
+    """
     try:
         # Validate input personas
         validate_persona(initiator)
         validate_persona(receiver)
+        count = max(1, min(int(count), MAX_EXCHANGES_PER_CALL))
         
-        logger.info(f"Generating interaction between {initiator.name} and {receiver.name}")
+        logger.info(f"Generating {count} interaction(s) between {initiator.name} and {receiver.name}")
         
         # Analyze potential conflicts with enhanced detection
-        conflicts = analyze_potential_conflicts(initiator, receiver)
+        conflicts = pair_conflicts(initiator, receiver, conflict_matrix)
         
         # Get conversation history if simulation_id is provided
-        conversation_history = ""
-        if simulation_id:
-            history = get_recent_interactions(simulation_id, initiator.id, receiver.id)
-            conversation_history = format_conversation_history(history)
+        if history is None and simulation_id:
+            from conversation_history import fit_to_budget, HISTORY_TOKEN_BUDGET
+            history = fit_to_budget(get_recent_interactions(simulation_id, initiator.id, receiver.id),
+                                    HISTORY_TOKEN_BUDGET)
+        conversation_history = format_conversation_history(history, history_summary)
+        
+        messages = prompt_compiler.interaction_messages(initiator, receiver, context, conflicts,
+                                                        conversation_history, count)
+        
+        model = model_router.choose(depth, count, max_depth, conflicts)
         
-        prompt = f'''
-        Generate a detailed dialogue interaction between two personas with the following characteristics and potential conflicts:
+        # One retry budget covers API errors and malformed output for this request
+        policy = retry_policy or llm_retry_policy
+        usage = CallUsage(model)
+        try:
+            interactions = policy.call(
+                lambda: request_interactions(messages, count, simulation_id, on_delta, usage, model),
+                description=f"Interaction between {initiator.name} and {receiver.name}"
+            )
+        except Exception:
+            llm_ledger.record(usage, simulation_id, 'interaction', initiator.id, receiver.id, failed=True)
+            raise
+        llm_ledger.record(usage, simulation_id, 'interaction', initiator.id, receiver.id)
+        return interactions
+        
+    except ValueError as e:
+        logger.error(f"Validation error in generate_interaction: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in generate_interaction: {str(e)}")
+        raise
 
-        Context: {context}
-        {conversation_history}
+def parse_interaction(interaction_data):
+    """Format and validate one generated exchange."""
+    if not isinstance(interaction_data, dict):
+        raise ValueError("Generated interaction is not a JSON object")
+    
+    # Format dialogue content
+    interaction_data['dialogue'] = format_dialogue(interaction_data)
+    
+    # Validate required fields
+    if not interaction_data.get('dialogue'):
+        raise ValueError("Generated interaction missing dialogue content")
+    if not isinstance(interaction_data.get('outcome'), dict):
+        raise ValueError("Generated interaction missing outcome analysis")
+    if not isinstance(interaction_data.get('analysis'), dict):
+        raise ValueError("Generated interaction missing detailed analysis")
         
-        Initiator: {initiator.name}
-        Personality: {initiator.personality}
-        Interests: {initiator.interests}
-        Goals: {initiator.goals}
-        Behavior Pattern: {initiator.behavior_pattern}
-        Interaction Style: {initiator.interaction_style}
-        Communication Preference: {initiator.communication_preference}
+    return interaction_data
 
-        Receiver: {receiver.name}
-        Personality: {receiver.personality}
-        Interests: {receiver.interests}
-        Goals: {receiver.goals}
-        Behavior Pattern: {receiver.behavior_pattern}
-        Interaction Style: {receiver.interaction_style}
-        Communication Preference: {receiver.communication_preference}
+def parse_completion(response):
+    """Extract the JSON reply from a completion, repairing near-valid output.
 
-        Identified Potential Conflicts:
-        {chr(10).join(f"- {conflict}" for conflict in conflicts)}
+    Returns (data, complete); a reply that needed repair or was cut off at the
+    token limit is not complete and must not be cached.
+    """
+    if not response.choices:
+        raise ValueError("Empty response from OpenAI API")
+    refusal = getattr(response.choices[0].message, 'refusal', None)
+    if refusal:
+        raise ValueError(f"Model refused the request: {refusal}")
+    
+    response_text = completion_text(response).strip()
+    logger.debug(f"Raw API response: {response_text}")
+    data, repaired = response_parser.parse_reply(response_text)
+    return data, not repaired and getattr(response.choices[0], 'finish_reason', None) != 'length'
+
+def request_interactions(messages, count=1, simulation_id=None, on_delta=None, usage=None, model=MODEL):
+    """Send one interaction request and parse and validate the exchanges it returns."""
+    response = create_chat_completion(
+        messages=messages,
+        model=model,
+        simulation_id=simulation_id,
+        completion_tokens=EXPECTED_COMPLETION_TOKENS * count,
+        on_delta=on_delta,
+        usage=usage,
+        request_options=(response_parser.request_options('record_interaction', EXCHANGE_SCHEMA,
+                                                         "Record the generated interaction")
+                         if count == 1 else
+                         response_parser.request_options('record_exchanges', EXCHANGES_SCHEMA,
+                                                         "Record the generated consecutive exchanges"))
+    )
+    
+    # Extract and validate response
+    response_data, complete = parse_completion(response)
+    
+    # Accept a bare exchange object as a chunk of one
+    if isinstance(response_data, dict) and isinstance(response_data.get('exchanges'), list):
+        exchanges = response_data['exchanges']
+    else:
+        exchanges = [response_data]
+    if not exchanges:
+        raise ValueError("Generated response contains no exchanges")
+    if len(exchanges) != count:
+        logger.warning(f"Requested {count} exchanges, model returned {len(exchanges)}")
+    
+    interactions = []
+    for exchange in exchanges[:count]:
+        try:
+            interactions.append(parse_interaction(exchange))
+        except ValueError:
+            if not interactions:
+                raise
+            # A reply cut off mid-exchange still carries complete earlier exchanges
+            logger.warning(f"Keeping {len(interactions)} complete exchanges of an incomplete reply")
+            break
+    # Only whole replies are cached; a later hit would otherwise replay the partial one
+    if complete and len(interactions) == count:
+        llm_cache.store(simulation_id, model, TEMPERATURE, messages, response)
+    return interactions
+
+def get_recent_group_turns(simulation_id, limit=MAX_HISTORY_INTERACTIONS * 4):
+    """Get the most recent speaker turns of a group-mode simulation."""
+    from models import Interaction
+    
+    recent = (Interaction.query
+             .filter(Interaction.simulation_id == simulation_id)
+             .order_by(Interaction.id.desc())
+             .limit(limit)
+             .all())
+    
+    return [
+        {
+            'content': interaction.content,
+            'metadata': interaction.interaction_metadata or {}
+        }
+        for interaction in reversed(recent)
+    ]
 
-        Consider these aspects in the interaction:
-        1. Natural development of tension points based on identified conflicts
-        2. Realistic personality clashes and their manifestation
-        3. Impact of different communication styles on understanding
-        4. Progressive relationship development or strain
-        5. Resolution attempts and their effectiveness
+def format_group_history(history):
+    """Format previous group turns for the prompt, one block per round."""
+    if not history:
+        return ""
+    
+    formatted = "\nPrevious rounds:\n"
+    current_round = None
+    for turn in history:
+        round_number = turn['metadata'].get('group_round')
+        if round_number != current_round:
+            if current_round is not None:
+                outcome = previous.get('outcome', {})
+                formatted += f"Outcome: {outcome.get('resolution_status', 'unknown')}\n---\n"
+            formatted += f"Round {round_number}:\n"
+            current_round = round_number
+        formatted += f"{turn['content']}\n"
+        previous = turn['metadata']
+    formatted += f"Outcome: {previous.get('outcome', {}).get('resolution_status', 'unknown')}\n---\n"
+    return formatted
+
+def generate_group_round(participants, context, simulation_id=None, round_number=1, total_rounds=1,
+                         retry_policy=None, conflict_matrix=None):
+    """Generate one multi-speaker round for a whole roster in a single LLM call."""
+    try:
+        if len(participants) < 2:
+            raise ValueError("A group round needs at least two participants")
+        for participant in participants:
+            validate_persona(participant)
         
-        Return a JSON object with the following structure:
-        {{
-            "dialogue": "Format as: [Name]: [Message]\\n[Name]: [Response]",
-            "sentiment": "positive/neutral/negative",
-            "outcome": {{
-                "resolution_status": "resolved/partially_resolved/unresolved",
-                "agreement_level": "full/partial/none",
-                "key_points": ["List of main points discussed"],
-                "tension_points": ["List of areas where conflict or disagreement occurred"],
-                "relationship_impact": "strengthened/strained/unchanged"
-            }},
-            "analysis": {{
-                "interaction_quality": "1-10 score",
-                "communication_effectiveness": "1-10 score",
-                "conflict_intensity": "1-10 score",
-                "resolution_quality": "1-10 score"
-            }}
-        }}
-        '''
+        logger.info(f"Generating group round {round_number}/{total_rounds} for {len(participants)} participants")
         
-        response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a persona interaction simulator. Generate natural dialogue between two personas within the given scenario context, maintaining conversation continuity and relationship development. Always respond with valid JSON that includes detailed interaction analysis."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
+        # Pairwise conflicts are cheap local lookups; name both sides so the model knows who clashes
+        conflicts = []
+        for i, persona_a in enumerate(participants):
+            for persona_b in participants[i + 1:]:
+                for conflict in pair_conflicts(persona_a, persona_b, conflict_matrix):
+                    conflicts.append(f"{persona_a.name} / {persona_b.name}: {conflict}")
         
-        # Extract and validate response
-        if not response.choices:
-            raise ValueError("Empty response from OpenAI API")
-            
-        response_text = response.choices[0].message.content.strip()
-        logger.debug(f"Raw API response: {response_text}")
+        conversation_history = ""
+        if simulation_id:
+            history = get_recent_group_turns(simulation_id)
+            conversation_history = format_group_history(history)
+        
+        messages = prompt_compiler.group_messages(participants, context, conflicts, conversation_history,
+                                                  round_number, total_rounds)
         
+        model = model_router.choose(round_number - 1, 1, total_rounds, conflicts)
+        policy = retry_policy or llm_retry_policy
+        usage = CallUsage(model)
         try:
-            interaction_data = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {str(e)}\nResponse text: {response_text}")
-            if retry_count < MAX_RETRIES:
-                logger.info(f"Retrying interaction generation (attempt {retry_count + 1}/{MAX_RETRIES})")
-                return generate_interaction(initiator, receiver, context, simulation_id, retry_count + 1)
+            round_data = policy.call(
+                lambda: request_group_round(messages, participants, simulation_id, usage, model),
+                description=f"Group round {round_number} of simulation {simulation_id}"
+            )
+        except Exception:
+            llm_ledger.record(usage, simulation_id, 'group_round', failed=True)
             raise
+        llm_ledger.record(usage, simulation_id, 'group_round')
+        return round_data
         
-        # Format dialogue content
-        interaction_data['dialogue'] = format_dialogue(interaction_data)
-        
-        # Validate required fields
-        if not interaction_data.get('dialogue'):
-            raise ValueError("Generated interaction missing dialogue content")
-        if not isinstance(interaction_data.get('outcome'), dict):
-            raise ValueError("Generated interaction missing outcome analysis")
-        if not isinstance(interaction_data.get('analysis'), dict):
-            raise ValueError("Generated interaction missing detailed analysis")
-            
-        return interaction_data
-        
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parsing error in generate_interaction: {str(e)}")
-        raise
     except ValueError as e:
-        logger.error(f"Validation error in generate_interaction: {str(e)}")
+        logger.error(f"Validation error in generate_group_round: {str(e)}")
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in generate_interaction: {str(e)}")
-        if retry_count < MAX_RETRIES:
-            logger.info(f"Retrying interaction generation (attempt {retry_count + 1}/{MAX_RETRIES})")
-            return generate_interaction(initiator, receiver, context, simulation_id, retry_count + 1)
+        logger.error(f"Unexpected error in generate_group_round: {str(e)}")
         raise
+
+def request_group_round(messages, participants, simulation_id=None, usage=None, model=MODEL):
+    """Send one group round request and resolve each turn's speaker and addressee to personas."""
+    response = create_chat_completion(
+        messages=messages,
+        model=model,
+        simulation_id=simulation_id,
+        usage=usage,
+        request_options=response_parser.request_options('record_group_round', GROUP_ROUND_SCHEMA,
+                                                        "Record the generated group round")
+    )
+    
+    round_data, complete = parse_completion(response)
+    if not isinstance(round_data, dict):
+        raise ValueError("Generated group round is not a JSON object")
+    
+    turns = round_data.get('turns')
+    if not isinstance(turns, list) or not turns:
+        raise ValueError("Generated group round missing turns")
+    if not isinstance(round_data.get('outcome'), dict):
+        raise ValueError("Generated group round missing outcome analysis")
+    if not isinstance(round_data.get('analysis'), dict):
+        raise ValueError("Generated group round missing detailed analysis")
+    
+    by_name = {}
+    for persona in participants:
+        by_name.setdefault(persona.name.strip().lower(), persona)
+    
+    resolved = []
+    for turn in turns:
+        if not isinstance(turn, dict):
+            raise ValueError("Generated group round has a malformed turn")
+        speaker = by_name.get(str(turn.get('speaker', '')).strip().lower())
+        message = str(turn.get('message', '')).strip()
+        if speaker is None:
+            raise ValueError(f"Generated group round has unknown speaker '{turn.get('speaker')}'")
+        if not message:
+            continue
+        addressee = by_name.get(str(turn.get('addressee', '')).strip().lower())
+        resolved.append({
+            'speaker': speaker,
+            'addressee': addressee if addressee is not speaker else None,
+            'message': message,
+            'sentiment': turn.get('sentiment', round_data.get('sentiment', 'neutral'))
+        })
+    if not resolved:
+        raise ValueError("Generated group round has no dialogue content")
+    
+    round_data['turns'] = resolved
+    if complete and len(resolved) == len(turns):
+        llm_cache.store(simulation_id, model, TEMPERATURE, messages, response)
+    return round_data
@@ -0,0 +1,180 @@
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+BEHAVIOR_CONFLICTS = {
+    ('proactive', 'reactive'): "Potential tension between proactive and reactive approaches",
+    ('analytical', 'creative'): "Possible conflict between analytical and creative thinking styles",
+    ('balanced', 'proactive'): "May experience pressure from different pace preferences",
+    ('balanced', 'reactive'): "Could face challenges in initiative-taking"
+}
+INTERACTION_CONFLICTS = {
+    ('formal', 'casual'): "Communication style mismatch between formal and casual approaches",
+    ('enthusiastic', 'reserved'): "Potential discomfort between enthusiastic and reserved personalities",
+    ('neutral', 'formal'): "May experience formality level misalignment",
+    ('neutral', 'casual'): "Could face differences in communication expectations"
+}
+COMMUNICATION_CONFLICTS = {
+    ('direct', 'diplomatic'): "Tension between direct and diplomatic communication styles",
+    ('detailed', 'concise'): "Potential conflict in information exchange preferences",
+    ('storytelling', 'direct'): "May struggle with different narrative approaches",
+    ('concise', 'storytelling'): "Could face challenges in communication depth"
+}
+PERSONALITY_KEYWORDS = {
+    'competitive': ['ambitious', 'driven', 'assertive'],
+    'collaborative': ['cooperative', 'team-oriented', 'supportive'],
+    'analytical': ['logical', 'methodical', 'systematic'],
+    'creative': ['innovative', 'artistic', 'imaginative']
+}
+CLASHING_TRAITS = ('competitive', 'analytical')  # Categories that clash when both personas show them
+COMPETING_GOAL_KEYWORDS = {'lead', 'control', 'direct', 'manage', 'decide'}
+LEADERSHIP_CONFLICT = "Competing leadership or control objectives"
+GOAL_MISALIGNMENT = "Significantly different goals and objectives"
+
+# One bit per possible message, in the order analyze_potential_conflicts reports them
+MESSAGES = (
+    list(BEHAVIOR_CONFLICTS.values())
+    + list(INTERACTION_CONFLICTS.values())
+    + list(COMMUNICATION_CONFLICTS.values())
+    + [f"Potential competition/conflict in {category} approaches"
+       for category in PERSONALITY_KEYWORDS if category in CLASHING_TRAITS]
+    + [LEADERSHIP_CONFLICT, GOAL_MISALIGNMENT]
+)
+_BEHAVIOR_BITS = {pair: 1 << i for i, pair in enumerate(BEHAVIOR_CONFLICTS)}
+_INTERACTION_BITS = {pair: 1 << (len(BEHAVIOR_CONFLICTS) + i) for i, pair in enumerate(INTERACTION_CONFLICTS)}
+_COMMUNICATION_BITS = {pair: 1 << (len(BEHAVIOR_CONFLICTS) + len(INTERACTION_CONFLICTS) + i)
+                       for i, pair in enumerate(COMMUNICATION_CONFLICTS)}
+_TRAIT_BITS = {category: 1 << MESSAGES.index(f"Potential competition/conflict in {category} approaches")
+               for category in CLASHING_TRAITS}
+_LEADERSHIP_BIT = 1 << MESSAGES.index(LEADERSHIP_CONFLICT)
+_MISALIGNMENT_BIT = 1 << MESSAGES.index(GOAL_MISALIGNMENT)
+_FALLBACK = 1 << 31  # Pair needs the reference implementation (fields that are not strings)
+
+
+class ConflictMatrix:
+    """Potential conflicts of every persona pair in a roster, compiled once.
+
+    Each persona is reduced to integer codes: a dense code for its (behavior,
+    style, communication) triple, a bitmask of clashing personality traits and
+    a bitmask over the roster's goal vocabulary. A pair's conflicts are then a
+    handful of integer ANDs and one lookup in a small code-by-code table, and
+    are stored as a message bitmask in a flat upper-triangular array('I')
+    (four bytes per pair, ~500KB for 500 personas). `conflicts()` returns
+    exactly what `analyze_potential_conflicts` would, in the same order.
+    """
+
+    def __init__(self, personas):
+        personas = {persona.id: persona for persona in personas}
+        self.persona_ids = sorted(personas)
+        self.index = {persona_id: i for i, persona_id in enumerate(self.persona_ids)}
+        self.size = len(self.persona_ids)
+        self.total_pairs = self.size * (self.size - 1) // 2
+        self.personas = [personas[persona_id] for persona_id in self.persona_ids]
+        self.table = array('I', bytes(4 * self.total_pairs))
+        self._goal_bits = {}  # goal word -> bit in the goal masks
+        self._triples = {}  # (behavior, style, communication) -> dense code
+        self._static = []  # code -> list of bits against every other code
+        self._decoded = {0: ()}
+        self.codes = [self._encode(persona) for persona in self.personas]
+        for i in range(self.size):
+            self._compile_row(i, i + 1)
+
+    def _pair_index(self, i, j):
+        return i * (2 * self.size - i - 1) // 2 + (j - i - 1)
+
+    def _triple_code(self, triple):
+        code = self._triples.get(triple)
+        if code is not None:
+            return code
+        code = len(self._triples)
+        triples = list(self._triples)
+        self._triples[triple] = code
+        for other_code, other in enumerate(triples):
+            self._static[other_code].append(self._static_bits(other, triple))
+        self._static.append([self._static_bits(triple, other) for other in triples + [triple]])
+        return code
+
+    @staticmethod
+    def _static_bits(a, b):
+        bits = 0
+        if a[0] != b[0]:
+            bits |= _BEHAVIOR_BITS.get(tuple(sorted([a[0], b[0]])), 0)
+        bits |= _INTERACTION_BITS.get(tuple(sorted([a[1], b[1]])), 0)
+        bits |= _COMMUNICATION_BITS.get(tuple(sorted([a[2], b[2]])), 0)
+        return bits
+
+    def _encode(self, persona):
+        """(triple code, trait bits, goal mask, leadership bit), or None to defer to the reference."""
+        fields = (getattr(persona, 'behavior_pattern', None), getattr(persona, 'interaction_style', None),
+                  getattr(persona, 'communication_preference', None))
+        if not all(isinstance(value, str) for value in fields + (persona.personality, persona.goals)):
+            return None
+
+        traits = set(word.lower() for word in persona.personality.split())
+        trait_bits = 0
+        for category in CLASHING_TRAITS:
+            if any(word in traits for word in PERSONALITY_KEYWORDS[category]):
+                trait_bits |= _TRAIT_BITS[category]
+
+        goals = set(persona.goals.lower().split())
+        goal_mask = 0
+        for word in goals:
+            bit = self._goal_bits.get(word)
+            if bit is None:
+                bit = self._goal_bits[word] = 1 << len(self._goal_bits)
+            goal_mask |= bit
+        leadership = _LEADERSHIP_BIT if goals & COMPETING_GOAL_KEYWORDS else 0
+        return (self._triple_code(fields), trait_bits, goal_mask, leadership)
+
+    def _pair_bits(self, a, b):
+        if a is None or b is None:
+            return _FALLBACK
+        bits = self._static[a[0]][b[0]] | (a[1] & b[1]) | (a[3] & b[3])
+        if not a[2] & b[2]:
+            bits |= _MISALIGNMENT_BIT
+        return bits
+
+    def _compile_row(self, i, start):
+        """Fill pairs (i, j) for j >= start."""
+        codes = self.codes
+        a = codes[i]
+        idx = self._pair_index(i, start) if start < self.size else 0
+        table = self.table
+        for j in range(start, self.size):
+            table[idx] = self._pair_bits(a, codes[j])
+            idx += 1
+
+    def update_persona(self, persona):
+        """Recompile a persona's pairs after it was edited; a no-op if its conflict fields did not change."""
+        i = self.index.get(persona.id)
+        if i is None:
+            return
+        self.personas[i] = persona
+        code = self._encode(persona)
+        if code == self.codes[i]:
+            return
+        self.codes[i] = code
+        for k in range(i):
+            self.table[self._pair_index(k, i)] = self._pair_bits(self.codes[k], code)
+        self._compile_row(i, i + 1)
+        logger.info(f"Recompiled conflicts of persona {persona.id} against {self.size - 1} others")
+
+    def conflicts(self, initiator, receiver):
+        """Potential conflicts between two personas, as analyze_potential_conflicts returns them."""
+        i, j = self.index.get(initiator.id), self.index.get(receiver.id)
+        if i is None or j is None or i == j:
+            bits = _FALLBACK
+        else:
+            if i > j:
+                i, j = j, i
+            bits = self.table[self._pair_index(i, j)]
+        if bits & _FALLBACK:
+            from chat_request import analyze_potential_conflicts
+            return analyze_potential_conflicts(initiator, receiver)
+
+        messages = self._decoded.get(bits)
+        if messages is None:
+            messages = self._decoded[bits] = tuple(message for bit, message in enumerate(MESSAGES)
+                                                   if bits >> bit & 1)
+        return list(messages)
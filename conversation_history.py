@@ -0,0 +1,202 @@
+import os
+import logging
+from collections import Counter, deque
+from sqlalchemy import case, func
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from models import Interaction
+
+logger = logging.getLogger(__name__)
+
+HISTORY_RAW_TURNS = int(os.environ.get("HISTORY_RAW_TURNS", 3))  # Raw exchanges kept after each summary refresh
+HISTORY_SUMMARY_INTERVAL = int(os.environ.get("HISTORY_SUMMARY_INTERVAL", 5))  # Exchanges between summary refreshes
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 1200))  # Prompt tokens for summary plus raw turns
+HISTORY_SEED_EXCHANGES = 50  # Most recent exchanges per pair replayed into the history on resume
+SUMMARY_POINTS = 6  # Distinct key and tension points kept in a summary
+SUMMARY_POINT_CHARS = 160
+ENTRY_OVERHEAD_CHARS = 100  # Timestamp, outcome and impact lines around an entry's content
+
+
+def entry_tokens(entry):
+    """Rough prompt tokens of a formatted history entry (about 4 characters per token)."""
+    return (len(entry['content']) + ENTRY_OVERHEAD_CHARS) // 4
+
+
+def fit_to_budget(entries, budget):
+    """The newest entries whose estimated tokens fit in `budget`, oldest first.
+
+    The newest entry is always kept, with its content cut to the budget if it
+    is too long on its own.
+    """
+    fitted = []
+    used = 0
+    for entry in reversed(entries):
+        tokens = entry_tokens(entry)
+        if used + tokens > budget:
+            break
+        fitted.append(entry)
+        used += tokens
+    if not fitted and entries:
+        newest = entries[-1]
+        chars = max(0, budget * 4 - ENTRY_OVERHEAD_CHARS)
+        fitted.append({**newest, 'content': "..." + newest['content'][-chars:] if chars else "..."})
+    fitted.reverse()
+    return fitted
+
+
+class PairHistory:
+    """Raw recent exchanges of one pair plus a rolling summary of everything before them."""
+    __slots__ = ('turns', 'summarized', 'statuses', 'impacts', 'last_impact', 'key_points', 'tension_points',
+                 'summary')
+
+    def __init__(self):
+        self.turns = []
+        self.summarized = 0
+        self.statuses = Counter()
+        self.impacts = Counter()
+        self.last_impact = None
+        self.key_points = deque(maxlen=SUMMARY_POINTS)
+        self.tension_points = deque(maxlen=SUMMARY_POINTS)
+        self.summary = ""
+
+    @staticmethod
+    def _remember(points, new_points):
+        for point in new_points or ():
+            point = str(point).strip()[:SUMMARY_POINT_CHARS]
+            if point and point not in points:
+                points.append(point)
+
+    def fold(self, entry):
+        """Fold an exchange leaving the raw window into the summary state."""
+        self.summarized += 1
+        outcome = (entry.get('metadata') or {}).get('outcome') or {}
+        self.statuses[outcome.get('resolution_status', 'unknown')] += 1
+        self.last_impact = outcome.get('relationship_impact', 'unchanged')
+        self.impacts[self.last_impact] += 1
+        self._remember(self.key_points, outcome.get('key_points'))
+        self._remember(self.tension_points, outcome.get('tension_points'))
+
+    def render(self):
+        # No wall-clock times: the summary is part of the cache and cassette key and must match across runs
+        lines = [
+            f"Summary of exchanges 1-{self.summarized}:",
+            "Outcomes: " + ", ".join(f"{count} {status}" for status, count in self.statuses.most_common()),
+            "Relationship: " + ", ".join(f"{count} {impact}" for impact, count in self.impacts.most_common())
+            + f" (most recently {self.last_impact})"
+        ]
+        if self.key_points:
+            lines.append("Points discussed: " + "; ".join(self.key_points))
+        if self.tension_points:
+            lines.append("Open tensions: " + "; ".join(self.tension_points))
+        self.summary = "\n".join(lines)
+
+
+class ConversationHistory:
+    """Per-pair conversation memory for prompts: a rolling summary plus recent raw turns.
+
+    The manager appends each exchange once it is written, so building a prompt
+    reads memory instead of querying `Interaction`. Every `summary_interval`
+    exchanges, all but the last `raw_turns` raw exchanges are folded into the
+    pair's summary (outcome and relationship tallies, recent key and tension
+    points), so the summary text only changes at refreshes and nothing between
+    refreshes is dropped. `recent()` trims the raw turns, newest first, to what
+    fits in the token budget left after the summary; history cost per call
+    stays flat however deep the conversation gets.
+
+    The summary is extractive, built from the stored outcome metadata, and
+    costs no extra LLM calls. On resume it is rebuilt from each pair's last
+    HISTORY_SEED_EXCHANGES exchanges.
+    """
+
+    def __init__(self, raw_turns=HISTORY_RAW_TURNS, summary_interval=HISTORY_SUMMARY_INTERVAL,
+                 token_budget=HISTORY_TOKEN_BUDGET):
+        self.raw_turns = max(1, raw_turns)
+        self.summary_interval = max(1, summary_interval)
+        self.token_budget = token_budget
+        self._pairs = {}  # (low persona id, high persona id) -> PairHistory
+        self.stats = {
+            'appended': 0,
+            'summary_refreshes': 0,
+            'trimmed_turns': 0
+        }
+
+    def append(self, initiator, receiver, content, timestamp, metadata):
+        key = tuple(sorted([initiator.id, receiver.id]))
+        pair = self._pairs.get(key)
+        if pair is None:
+            pair = self._pairs[key] = PairHistory()
+        pair.turns.append({
+            'initiator': initiator.name,
+            'receiver': receiver.name,
+            'content': content,
+            'timestamp': timestamp,
+            'metadata': metadata
+        })
+        self.stats['appended'] += 1
+        if len(pair.turns) >= self.raw_turns + self.summary_interval:
+            for entry in pair.turns[:-self.raw_turns]:
+                pair.fold(entry)
+            del pair.turns[:-self.raw_turns]
+            pair.render()
+            self.stats['summary_refreshes'] += 1
+
+    def summary(self, persona_a, persona_b):
+        """The pair's rolling summary of earlier exchanges, or "" before the first refresh."""
+        pair = self._pairs.get(tuple(sorted([persona_a, persona_b])))
+        return pair.summary if pair else ""
+
+    def recent(self, persona_a, persona_b):
+        """The pair's raw exchanges since the last summary that fit the token budget, oldest first."""
+        pair = self._pairs.get(tuple(sorted([persona_a, persona_b])))
+        if pair is None:
+            return []
+        turns = fit_to_budget(pair.turns, self.token_budget - len(pair.summary) // 4)
+        self.stats['trimmed_turns'] += len(pair.turns) - len(turns)
+        return turns
+
+    def clear(self):
+        self._pairs = {}
+
+    def seed(self, simulation_id, personas):
+        """Rebuild every pair's history from its last HISTORY_SEED_EXCHANGES stored exchanges.
+
+        `personas` maps persona ids to objects with a `name`. Must be called
+        inside an application context.
+        """
+        low = case((Interaction.initiator_id < Interaction.receiver_id, Interaction.initiator_id),
+                   else_=Interaction.receiver_id)
+        high = case((Interaction.initiator_id < Interaction.receiver_id, Interaction.receiver_id),
+                    else_=Interaction.initiator_id)
+        ranked = (db.session.query(
+                      Interaction.id.label('id'),
+                      func.row_number().over(partition_by=(low, high),
+                                             order_by=Interaction.id.desc()).label('position'))
+                  .filter(Interaction.simulation_id == simulation_id)
+                  .subquery())
+        try:
+            rows = (db.session.query(Interaction.initiator_id, Interaction.receiver_id, Interaction.content,
+                                     Interaction.timestamp, Interaction.interaction_metadata)
+                    .join(ranked, ranked.c.id == Interaction.id)
+                    .filter(ranked.c.position <= HISTORY_SEED_EXCHANGES)
+                    .order_by(Interaction.id)
+                    .all())
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Error seeding conversation history for simulation {simulation_id}: {str(e)}")
+            return
+
+        self.clear()
+        for initiator_id, receiver_id, content, timestamp, metadata in rows:
+            initiator, receiver = personas.get(initiator_id), personas.get(receiver_id)
+            if initiator is None or receiver is None:
+                continue
+            self.append(initiator, receiver, content, timestamp, metadata)
+        logger.info(f"Seeded conversation history for simulation {simulation_id}: "
+                    f"{len(rows)} exchanges across {len(self._pairs)} pairs")
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'pairs': len(self._pairs),
+            'summarized_pairs': sum(1 for pair in self._pairs.values() if pair.summary)
+        }
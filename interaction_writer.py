@@ -0,0 +1,156 @@
+import os
+import logging
+import eventlet
+from eventlet.event import Event
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from models import Interaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get("INTERACTION_BATCH_SIZE", 50))
+FLUSH_INTERVAL = float(os.environ.get("INTERACTION_FLUSH_INTERVAL", 0.5))  # seconds
+FLUSH_ATTEMPTS = int(os.environ.get("INTERACTION_FLUSH_ATTEMPTS", 4))  # inserts tried before a row is given up
+RETRY_DELAY = 0.5  # seconds before the first retried flush, doubled on each further attempt
+
+
+class InteractionWriteError(Exception):
+    """A buffered row could not be written after every flush attempt; the exchange is worth regenerating."""
+
+
+class InteractionWriter:
+    """Write-behind buffer for Interaction rows from every running simulation.
+
+    Rows are grouped into one multi-row INSERT ... RETURNING per flush, which
+    happens when the buffer reaches `batch_size` rows or `flush_interval`
+    seconds after the first buffered row, and on shutdown. `add` returns an
+    event that fires with the row id once it is committed, so callers can
+    emit real ids and keep per-pair ordering without one commit per exchange.
+
+    A failed flush puts its rows back at the front of the buffer and retries
+    with exponential backoff; rows added meanwhile wait for the retry. Rows still unwritten after `flush_attempts`
+    are inserted one at a time so a single bad row cannot sink the batch,
+    and only rows that fail on their own get an InteractionWriteError.
+    """
+
+    def __init__(self, app=None, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 flush_attempts=FLUSH_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_attempts = max(1, flush_attempts)
+        self.retry_delay = retry_delay
+        self._buffer = []  # [values, event, failed attempts]
+        self._timer = None
+        self._retrying = False  # The timer is a backoff after a failed flush
+        self.stats = {
+            'rows': 0,
+            'flushes': 0,
+            'errors': 0,
+            'retried_rows': 0,
+            'failed_rows': 0
+        }
+
+    def init_app(self, app):
+        self.app = app
+
+    def add(self, values):
+        """Buffer a row (a dict of Interaction column values) and return an event for its id."""
+        written = Event()
+        self._buffer.append([values, written, 0])
+
+        if self._retrying:
+            pass  # Rows wait for the pending retry so a full buffer does not cut its backoff short
+        elif len(self._buffer) >= self.batch_size:
+            self._cancel_timer()
+            eventlet.spawn_n(self.flush)
+        elif self._timer is None:
+            self._timer = eventlet.spawn_after(self.flush_interval, self.flush)
+        return written
+
+    def _cancel_timer(self):
+        self._retrying = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _insert(self, rows):
+        """Insert the rows in one statement and return their ids; raises SQLAlchemyError."""
+        with self.app.app_context():
+            try:
+                result = db.session.execute(
+                    insert(Interaction).returning(Interaction.id, sort_by_parameter_order=True),
+                    rows
+                )
+                ids = result.scalars().all()
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                raise
+        return ids
+
+    def flush(self):
+        """Write every buffered row in a single multi-row insert."""
+        self._cancel_timer()
+        if not self._buffer:
+            return
+
+        batch, self._buffer = self._buffer, []
+        try:
+            ids = self._insert([values for values, _, _ in batch])
+        except SQLAlchemyError as e:
+            self.stats['errors'] += 1
+            for entry in batch:
+                entry[2] += 1
+            retry = [entry for entry in batch if entry[2] < self.flush_attempts]
+            exhausted = [entry for entry in batch if entry[2] >= self.flush_attempts]
+            if retry:
+                # Rows go back ahead of newer ones so each pair's exchanges stay in order
+                attempts = max(entry[2] for entry in retry)
+                delay = self.retry_delay * 2 ** (attempts - 1)
+                logger.warning(f"Error writing {len(batch)} buffered interactions (attempt {attempts}), "
+                               f"retrying {len(retry)} in {delay:.1f}s: {str(e)}")
+                self.stats['retried_rows'] += len(retry)
+                self._buffer[:0] = retry
+                self._cancel_timer()
+                self._timer = eventlet.spawn_after(delay, self.flush)
+                self._retrying = True
+            if exhausted:
+                self._write_each(exhausted)
+            return
+
+        self.stats['rows'] += len(batch)
+        self.stats['flushes'] += 1
+        logger.debug(f"Wrote {len(batch)} buffered interactions")
+        for (_, written, _), interaction_id in zip(batch, ids):
+            written.send(interaction_id)
+
+    def _write_each(self, entries):
+        """Last attempt for rows that kept failing in batches: one insert per row."""
+        for values, written, _ in entries:
+            try:
+                interaction_id = self._insert([values])[0]
+            except SQLAlchemyError as e:
+                self.stats['failed_rows'] += 1
+                logger.error(f"Giving up on an interaction of simulation {values.get('simulation_id')} "
+                             f"after {self.flush_attempts} attempts: {str(e)}")
+                written.send_exception(InteractionWriteError(f"Interaction could not be stored: {str(e)}"))
+                continue
+            self.stats['rows'] += 1
+            written.send(interaction_id)
+
+    def shutdown(self):
+        """Flush whatever is still buffered; call before the process exits."""
+        try:
+            self.flush()
+            if self._buffer:
+                # The flush failed and scheduled a retry that will not run; give the rows one more go
+                self._cancel_timer()
+                batch, self._buffer = self._buffer, []
+                self._write_each(batch)
+        except Exception as e:
+            logger.error(f"Error flushing interactions on shutdown: {str(e)}")
+
+
+interaction_writer = InteractionWriter()
@@ -0,0 +1,495 @@
+import os
+import logging
+from datetime import datetime, timedelta
+import eventlet
+from sqlalchemy import insert, exists, func
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from models import Simulation, Interaction, Persona, SimulationCheckpoint, ExchangeJob
+from simulation_budget import SimulationBudget
+from llm_ledger import llm_ledger
+
+logger = logging.getLogger(__name__)
+
+# 'inprocess' runs simulations on greenthreads in the web process; 'distributed'
+# only enqueues exchange jobs for worker.py processes to claim
+EXECUTOR = os.environ.get("SIMULATION_EXECUTOR", "inprocess")
+CLAIM_TIMEOUT = int(os.environ.get("JOB_CLAIM_TIMEOUT", 300))  # seconds without a heartbeat before a claim is presumed dead
+HEARTBEAT_INTERVAL = CLAIM_TIMEOUT / 4  # seconds between a worker's claim renewals
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+OPEN_STATUSES = ('pending', 'claimed')
+
+
+def is_distributed():
+    return EXECUTOR == 'distributed'
+
+
+def _job_dict(job):
+    return {
+        'id': job.id,
+        'simulation_id': job.simulation_id,
+        'initiator_id': job.initiator_id,
+        'receiver_id': job.receiver_id,
+        'sequence': job.sequence,
+        'attempts': job.attempts
+    }
+
+
+def enqueue_simulation(simulation, persona_ids, conversation_depth, custom_context=None, priority=1,
+                       exchanges_per_call=1, cache_policy=None, budget=None):
+    """Queue the first exchange of every pair and record the run configuration for workers.
+
+    Pairs are enqueued in roster order and each pair's next exchange is queued
+    behind everything already pending, so workers sweep breadth-first like the
+    in-process scheduler. Must be called inside an application context.
+    """
+    persona_ids = sorted(set(persona_ids))
+    checkpoint = (SimulationCheckpoint.query.filter_by(simulation_id=simulation.id).first()
+                  or SimulationCheckpoint(simulation_id=simulation.id))
+    checkpoint.persona_ids = persona_ids
+    checkpoint.conversation_depth = conversation_depth
+    checkpoint.parallelism = 1
+    checkpoint.priority = priority
+    checkpoint.exchanges_per_call = exchanges_per_call
+    checkpoint.cache_policy = cache_policy
+    checkpoint.custom_context = custom_context
+    checkpoint.budget = budget.to_dict() if budget else None
+    checkpoint.updated_at = datetime.utcnow()
+    db.session.add(checkpoint)
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            'simulation_id': simulation.id,
+            'initiator_id': persona_a,
+            'receiver_id': persona_b,
+            'sequence': 1,
+            'status': 'pending',
+            'attempts': 0,
+            'relayed': False,
+            'available_at': now,
+            'created_at': now
+        }
+        for i, persona_a in enumerate(persona_ids)
+        for persona_b in persona_ids[i + 1:]
+    ]
+    try:
+        if rows:
+            db.session.execute(insert(ExchangeJob), rows)
+        simulation.status = 'running'
+        simulation.start_time = now
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    logger.info(f"Enqueued {len(rows)} pair jobs for simulation {simulation.id}")
+    return len(rows)
+
+
+def claim_jobs(worker_name, limit):
+    """Claim up to `limit` pending jobs for a worker.
+
+    Rows are locked with FOR UPDATE SKIP LOCKED, so concurrent workers on the
+    same Postgres instance each get disjoint jobs without blocking one another.
+    Returns plain dicts so the caller does not hold session-bound rows.
+    """
+    now = datetime.utcnow()
+    try:
+        jobs = (ExchangeJob.query
+                .filter(ExchangeJob.status == 'pending', ExchangeJob.available_at <= now)
+                .order_by(ExchangeJob.id)
+                .with_for_update(skip_locked=True)
+                .limit(limit)
+                .all())
+        for job in jobs:
+            job.status = 'claimed'
+            job.claimed_by = worker_name
+            job.claimed_at = now
+            job.attempts = (job.attempts or 0) + 1
+        claimed = [_job_dict(job) for job in jobs]
+        db.session.commit()
+        return claimed
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+def _own_claim(job, worker_name):
+    """Query for a job row that is still claimed by this worker on this attempt."""
+    return ExchangeJob.query.filter(
+        ExchangeJob.id == job['id'],
+        ExchangeJob.status == 'claimed',
+        ExchangeJob.claimed_by == worker_name,
+        ExchangeJob.attempts == job['attempts']
+    )
+
+
+def complete_job(job, worker_name, interactions, max_depth):
+    """Store a job's finished exchanges, mark it done and queue the pair's next exchange.
+
+    `interactions` is a list of Interaction column dicts in conversation order.
+    Everything happens in one transaction. Returns the first new interaction
+    id, or None if the claim was lost (reclaimed as stale) and the result discarded.
+    """
+    try:
+        rows = [Interaction(**values) for values in interactions]
+        db.session.add_all(rows)
+        db.session.flush()
+
+        updated = _own_claim(job, worker_name).update({
+            'status': 'done',
+            'interaction_id': rows[0].id,
+            'exchanges': len(rows),
+            'completed_at': datetime.utcnow(),
+            'error': None
+        }, synchronize_session=False)
+        if not updated:
+            db.session.rollback()
+            logger.warning(f"Lost claim on job {job['id']}, discarding its result")
+            return None
+
+        next_sequence = job['sequence'] + len(rows)
+        if next_sequence <= max_depth:
+            now = datetime.utcnow()
+            db.session.add(ExchangeJob(
+                simulation_id=job['simulation_id'],
+                initiator_id=job['initiator_id'],
+                receiver_id=job['receiver_id'],
+                sequence=next_sequence,
+                status='pending',
+                available_at=now,
+                created_at=now
+            ))
+        db.session.commit()
+        return rows[0].id
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+def heartbeat_jobs(worker_name, jobs):
+    """Renew the claims a worker still holds so slow exchanges are not reclaimed and generated twice."""
+    if not jobs:
+        return 0
+    try:
+        renewed = 0
+        for job in jobs:
+            renewed += _own_claim(job, worker_name).update({'claimed_at': datetime.utcnow()},
+                                                           synchronize_session=False)
+        db.session.commit()
+        return renewed
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+def fail_job(job, worker_name, error, retry_delay=0, final=False):
+    """Hand a failed job back to the queue, or mark it failed when `final` or after MAX_ATTEMPTS.
+
+    A failed job is the pair's marker: no follow-up is queued, and the event
+    relay reports the pair as stopped early.
+    """
+    final = final or job['attempts'] >= MAX_ATTEMPTS
+    values = {
+        'status': 'failed' if final else 'pending',
+        'error': str(error)[:1000],
+        'claimed_by': None,
+        'claimed_at': None
+    }
+    if not final:
+        values['available_at'] = datetime.utcnow() + timedelta(seconds=retry_delay)
+    try:
+        _own_claim(job, worker_name).update(values, synchronize_session=False)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    if final:
+        logger.error(f"Job {job['id']} failed after {job['attempts']} attempts, pair "
+                     f"({job['initiator_id']}, {job['receiver_id']}) stopped at exchange {job['sequence']}: "
+                     f"{str(error)}")
+
+
+def cancel_job(job, worker_name):
+    """Drop a claimed job whose simulation is no longer running."""
+    try:
+        _own_claim(job, worker_name).update({'status': 'cancelled'}, synchronize_session=False)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+def cancel_jobs(simulation_id):
+    """Cancel every pending job of a simulation; follow-ups queued by claimed jobs are dropped when claimed."""
+    try:
+        cancelled = (ExchangeJob.query
+                     .filter(ExchangeJob.simulation_id == simulation_id, ExchangeJob.status == 'pending')
+                     .update({'status': 'cancelled'}, synchronize_session=False))
+        db.session.commit()
+        return cancelled
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+
+def has_jobs(simulation_id):
+    return db.session.query(exists().where(ExchangeJob.simulation_id == simulation_id)).scalar()
+
+
+def reclaim_stale_jobs(timeout=CLAIM_TIMEOUT):
+    """Return jobs whose worker died mid-claim to the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    stale = ExchangeJob.query.filter(ExchangeJob.status == 'claimed', ExchangeJob.claimed_at < cutoff)
+    try:
+        failed = (stale.filter(ExchangeJob.attempts >= MAX_ATTEMPTS)
+                  .update({'status': 'failed', 'error': 'Claim timed out'}, synchronize_session=False))
+        reclaimed = stale.update({
+            'status': 'pending',
+            'claimed_by': None,
+            'claimed_at': None,
+            'available_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    if reclaimed or failed:
+        logger.warning(f"Reclaimed {reclaimed} stale jobs, failed {failed} after {MAX_ATTEMPTS} attempts")
+    return reclaimed
+
+
+def complete_finished_simulations():
+    """Mark running queue-backed simulations with no open jobs as completed.
+
+    Done as a sweep rather than by the worker finishing the last job, since two
+    workers finishing a simulation's last jobs concurrently cannot see each other.
+    """
+    open_jobs = exists().where(ExchangeJob.simulation_id == Simulation.id,
+                               ExchangeJob.status.in_(OPEN_STATUSES))
+    queued = exists().where(ExchangeJob.simulation_id == Simulation.id)
+    try:
+        simulations = Simulation.query.filter(Simulation.status == 'running', queued, ~open_jobs).all()
+        for simulation in simulations:
+            simulation.status = 'completed'
+            simulation.end_time = datetime.utcnow()
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    for simulation in simulations:
+        failed = ExchangeJob.query.filter_by(simulation_id=simulation.id, status='failed').count()
+        if failed:
+            logger.warning(f"Simulation {simulation.id} completed with {failed} failed exchanges")
+        logger.info(f"Simulation {simulation.id} completed by workers")
+    return [simulation.id for simulation in simulations]
+
+
+class JobEventRelay:
+    """Emits socket events in the web process for exchanges finished by workers.
+
+    Polls done jobs that have not been relayed yet, emits `new_interaction`
+    with the same payload the in-process manager sends, and `simulation_ended`
+    once a relayed simulation is no longer running. Simulations with a budget
+    get `budget_update` after each relayed batch and are stopped once a limit
+    is reached, from the ledger rows the workers wrote.
+    """
+    POLL_INTERVAL = 1.0  # seconds
+    BATCH_SIZE = 200
+
+    def __init__(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.greenthread = None
+        self.pair_metrics = {}  # Running outcome aggregates per (simulation, pair)
+        self._watching = set()  # Simulations with relayed exchanges that have not ended yet
+        self._max_depths = {}
+        self._budgets = {}
+        self._stopped = {}  # simulation_id -> end message for simulations this relay stopped
+        self._failed = {}  # simulation_id -> pairs whose job failed for good
+
+    def start(self):
+        if self.greenthread is None:
+            self.greenthread = eventlet.spawn(self._run)
+            logger.info("Started job event relay")
+
+    def forget(self, simulation_id):
+        """Stop watching a simulation that was ended outside the workers."""
+        self._watching.discard(simulation_id)
+        self._max_depths.pop(simulation_id, None)
+        self._budgets.pop(simulation_id, None)
+        self._failed.pop(simulation_id, None)
+        self.pair_metrics = {key: metrics for key, metrics in self.pair_metrics.items()
+                             if key[0] != simulation_id}
+
+    def _run(self):
+        while True:
+            try:
+                relayed = self.relay_once()
+            except Exception as e:
+                logger.error(f"Error relaying job events: {str(e)}")
+                relayed = 0
+            if relayed < self.BATCH_SIZE:
+                eventlet.sleep(self.POLL_INTERVAL)
+
+    def _max_depth(self, simulation_id):
+        from simulation_manager import SimulationManager
+        if simulation_id not in self._max_depths:
+            checkpoint = SimulationCheckpoint.query.filter_by(simulation_id=simulation_id).first()
+            depth = checkpoint.conversation_depth if checkpoint else 'medium'
+            self._max_depths[simulation_id] = SimulationManager.DEPTH_RANGES.get(
+                depth, SimulationManager.DEPTH_RANGES['medium'])[1]
+        return self._max_depths[simulation_id]
+
+    def _budget(self, simulation_id):
+        if simulation_id not in self._budgets:
+            checkpoint = SimulationCheckpoint.query.filter_by(simulation_id=simulation_id).first()
+            self._budgets[simulation_id] = SimulationBudget.from_dict(checkpoint.budget if checkpoint else None)
+        return self._budgets[simulation_id]
+
+    def _relay_failures(self):
+        """Warn about pairs whose job failed for good; their conversations stop short of the target depth."""
+        failed = (ExchangeJob.query
+                  .filter(ExchangeJob.status == 'failed', ExchangeJob.relayed.is_(False))
+                  .order_by(ExchangeJob.id)
+                  .limit(self.BATCH_SIZE)
+                  .all())
+        if not failed:
+            return
+        persona_ids = {job.initiator_id for job in failed} | {job.receiver_id for job in failed}
+        names = dict(db.session.query(Persona.id, Persona.name).filter(Persona.id.in_(persona_ids)))
+        for job in failed:
+            self._failed[job.simulation_id] = self._failed.get(job.simulation_id, 0) + 1
+            if job.simulation_id not in self._stopped:
+                self._watching.add(job.simulation_id)
+            self.socketio.emit('simulation_warning', {
+                'simulation_id': job.simulation_id,
+                'message': (f"Conversation between {names.get(job.initiator_id)} and {names.get(job.receiver_id)} "
+                            f"stopped at exchange {job.sequence}/{self._max_depth(job.simulation_id)}: {job.error}")
+            })
+        try:
+            (ExchangeJob.query
+             .filter(ExchangeJob.id.in_([job.id for job in failed]))
+             .update({'relayed': True}, synchronize_session=False))
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+    def _end_message(self, simulation_id):
+        if simulation_id in self._stopped:
+            return self._stopped[simulation_id]
+        failed = self._failed.get(simulation_id)
+        if failed:
+            return f"Conversations completed, {failed} pair(s) stopped early after failed exchanges"
+        return 'All conversations completed successfully'
+
+    def _check_budget(self, simulation_id):
+        """Report a queue-backed simulation's remaining budget and stop it once a limit is reached."""
+        if simulation_id in self._stopped:
+            return
+        budget = self._budget(simulation_id)
+        simulation = db.session.get(Simulation, simulation_id)
+        if not budget or simulation is None or simulation.status != 'running':
+            return
+        spent = llm_ledger.totals(simulation_id)
+        exchanges = (db.session.query(func.count(Interaction.id))
+                     .filter(Interaction.simulation_id == simulation_id).scalar())
+        elapsed = (datetime.utcnow() - simulation.start_time).total_seconds() if simulation.start_time else 0.0
+        status = budget.status(spent['total_tokens'], spent['cost'], elapsed, exchanges)
+        self.socketio.emit('budget_update', {'simulation_id': simulation_id, **status})
+        if not status['exceeded']:
+            return
+
+        # Claimed jobs finish; workers drop anything they claim once the simulation is no longer running
+        cancel_jobs(simulation_id)
+        try:
+            simulation.status = 'completed'
+            simulation.end_time = datetime.utcnow()
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+        logger.warning(f"Simulation {simulation_id} reached its budget: {status['exceeded']} "
+                       f"(spent {status['spent']})")
+        self._stopped[simulation_id] = f"Budget limit reached ({status['exceeded']})"
+
+    def _emit_interaction(self, job, interaction, sequence, names):
+        from simulation_manager import record_pair_outcome
+        metadata = interaction.interaction_metadata or {}
+        pair_key = (job.simulation_id,) + tuple(sorted([job.initiator_id, job.receiver_id]))
+        aggregate_metrics = record_pair_outcome(self.pair_metrics, pair_key, metadata)
+        self.socketio.emit('new_interaction', {
+            'simulation_id': job.simulation_id,
+            'interaction': {
+                'id': interaction.id,
+                'initiator': names.get(job.initiator_id),
+                'receiver': names.get(job.receiver_id),
+                'content': interaction.content,
+                'timestamp': interaction.timestamp.isoformat(),
+                'sentiment': metadata.get('sentiment', 'neutral'),
+                'outcome': metadata.get('outcome', {}),
+                'analysis': metadata.get('analysis', {}),
+                'conversation_depth': f"{sequence}/{self._max_depth(job.simulation_id)}",
+                'aggregate_metrics': aggregate_metrics
+            }
+        })
+
+    def relay_once(self):
+        """Emit events for one batch of finished jobs; returns the number relayed."""
+        with self.app.app_context():
+            rows = (db.session.query(ExchangeJob, Interaction)
+                    .join(Interaction, ExchangeJob.interaction_id == Interaction.id)
+                    .filter(ExchangeJob.status == 'done', ExchangeJob.relayed.is_(False))
+                    .order_by(ExchangeJob.id)
+                    .limit(self.BATCH_SIZE)
+                    .all())
+
+            if rows:
+                persona_ids = {job.initiator_id for job, _ in rows} | {job.receiver_id for job, _ in rows}
+                names = dict(db.session.query(Persona.id, Persona.name).filter(Persona.id.in_(persona_ids)))
+
+                for job, first in rows:
+                    interactions = [first]
+                    if (job.exchanges or 1) > 1:
+                        # Only one job per pair is open at a time, so the pair's next rows belong to this job
+                        interactions = (Interaction.query
+                                        .filter(Interaction.simulation_id == job.simulation_id,
+                                                Interaction.initiator_id == job.initiator_id,
+                                                Interaction.receiver_id == job.receiver_id,
+                                                Interaction.id >= first.id)
+                                        .order_by(Interaction.id)
+                                        .limit(job.exchanges)
+                                        .all())
+                    if job.simulation_id not in self._stopped:
+                        self._watching.add(job.simulation_id)
+                    for offset, interaction in enumerate(interactions):
+                        self._emit_interaction(job, interaction, job.sequence + offset, names)
+
+                try:
+                    (ExchangeJob.query
+                     .filter(ExchangeJob.id.in_([job.id for job, _ in rows]))
+                     .update({'relayed': True}, synchronize_session=False))
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    raise
+
+                for simulation_id in {job.simulation_id for job, _ in rows}:
+                    self._check_budget(simulation_id)
+
+            self._relay_failures()
+
+            if self._watching:
+                ended = (db.session.query(Simulation.id, Simulation.status)
+                         .filter(Simulation.id.in_(self._watching), Simulation.status != 'running')
+                         .all())
+                for simulation_id, status in ended:
+                    message = self._end_message(simulation_id)
+                    self.forget(simulation_id)
+                    self.socketio.emit('simulation_ended', {
+                        'simulation_id': simulation_id,
+                        'status': status,
+                        'message': message
+                    })
+            return len(rows)
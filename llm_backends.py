@@ -0,0 +1,225 @@
+import os
+import json
+import logging
+from openai import OpenAI
+import llm_cassette
+
+logger = logging.getLogger(__name__)
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")  # e.g. http://127.0.0.1:8008/v1 for stub_llm_server.py
+# Extra OpenAI-compatible endpoints as JSON, e.g.
+# {"local": {"base_url": "http://127.0.0.1:8008/v1", "models": ["stub-small"]},
+#  "other": {"base_url": "https://...", "api_key_env": "OTHER_API_KEY", "models": ["model-a"]}}
+# Models no backend lists go to the default endpoint (OPENAI_BASE_URL / OPENAI_API_KEY).
+LLM_BACKENDS = os.environ.get("LLM_BACKENDS", "{}")
+
+LARGE_MODEL = os.environ.get("LLM_MODEL", "gpt-4")
+SMALL_MODEL = os.environ.get("LLM_SMALL_MODEL") or None  # Unset: every request uses LARGE_MODEL
+ROUTE_EARLY_EXCHANGES = int(os.environ.get("LLM_ROUTE_EARLY_EXCHANGES", 2))  # Opening exchanges of a pair on the small model
+ROUTE_MAX_ERROR_RATE = float(os.environ.get("LLM_ROUTE_MAX_ERROR_RATE", 0.3))  # Avoid a model failing more often than this
+ROUTE_LATENCY_FACTOR = float(os.environ.get("LLM_ROUTE_LATENCY_FACTOR", 1.0))  # Small model must stay this much faster
+STATS_WEIGHT = 0.2  # Weight of the newest call in the moving averages
+STATS_MIN_CALLS = 5  # Calls before a model's stats can override the routing rules
+PROBE_INTERVAL = 10  # Every Nth health override is skipped so the avoided model's stats stay current
+
+
+class LLMBackend:
+    """One OpenAI-compatible endpoint: the hosted API, another provider, or stub_llm_server.py."""
+
+    def __init__(self, name, base_url=None, api_key=None, models=()):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.models = tuple(models)
+        # Built up front: clients are shared by every greenthread and must not be created mid-call
+        self.client = self.create_client() if llm_cassette.MODE != 'replay' else None
+
+    def create_client(self):
+        """Build the client, wrapped for cassette recording when LLM_CASSETTE_MODE is record."""
+        # Retries are owned by llm_retry_policy so every attempt goes through the rate limiter.
+        # Local endpoints do not check the key, but the client refuses to start without one.
+        client = OpenAI(api_key=self.api_key or "unused", base_url=self.base_url, max_retries=0)
+        if llm_cassette.MODE == 'record':
+            return llm_cassette.CassetteClient('record', inner=client)
+        return client
+
+
+class LLMBackends:
+    """The configured endpoints and which of them serves each model."""
+
+    def __init__(self, config=LLM_BACKENDS):
+        self.default = LLMBackend('default', OPENAI_BASE_URL, OPENAI_API_KEY)
+        self.backends = {}
+        self._override = None
+        # Offline: one cassette answers every backend, no credentials or network needed
+        self._replay = llm_cassette.CassetteClient('replay') if llm_cassette.MODE == 'replay' else None
+        try:
+            for name, options in json.loads(config or "{}").items():
+                api_key = options.get('api_key') or os.environ.get(options.get('api_key_env', ''))
+                self.backends[name] = LLMBackend(name, options.get('base_url'), api_key, options.get('models', ()))
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid LLM_BACKENDS: {str(e)}")
+
+    def backend(self, model):
+        for backend in self.backends.values():
+            if model in backend.models:
+                return backend
+        return self.default
+
+    def client(self, model):
+        """The client that sends requests for `model`."""
+        if self._override is not None:
+            return self._override
+        if self._replay is not None:
+            return self._replay
+        return self.backend(model).client
+
+    def set_client(self, client):
+        """Send every request through `client` (e.g. a cassette); None restores the backends."""
+        self._override = client
+
+    def get_stats(self):
+        clients = [('override', self._override), ('replay', self._replay)]
+        clients += [(backend.name, backend.client) for backend in (self.default, *self.backends.values())]
+        return {
+            'backends': {
+                backend.name: {'base_url': backend.base_url, 'models': list(backend.models) or None}
+                for backend in (self.default, *self.backends.values())
+            },
+            'cassettes': {name: client.get_stats() for name, client in clients
+                          if client is not None and hasattr(client, 'get_stats')}
+        }
+
+
+class ModelStats:
+    """Moving averages of one model's call latency and error rate."""
+    __slots__ = ('calls', 'errors', 'latency', 'error_rate')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = None
+        self.error_rate = 0.0
+
+    def record(self, latency=None, failed=False):
+        self.calls += 1
+        self.errors += int(failed)
+        self.error_rate += STATS_WEIGHT * (float(failed) - self.error_rate)
+        if latency is not None and not failed:
+            self.latency = latency if self.latency is None else self.latency + STATS_WEIGHT * (latency - self.latency)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 3)
+        }
+
+
+class ModelRouter:
+    """Picks the model for each request: a small model for routine exchanges, the large one where it matters.
+
+    Without a small model every request uses the large one. Otherwise the
+    final exchange (or round) of a conversation and requests marked
+    `designated` use the large model; a pair's first `early_exchanges`
+    exchanges and pairs without known conflicts use the small one, and the
+    rest use the large one. The rules are then checked against each model's
+    recent health: a model whose error rate is above `max_error_rate` is
+    swapped for the other when that one is doing better, and the small model
+    is only used while its average latency stays below `latency_factor`
+    times the large model's. Every PROBE_INTERVAL-th override is skipped so
+    an avoided model keeps getting the occasional call and can recover.
+
+    Health overrides are off while a cassette records or replays
+    (`adaptive=False`): routing then depends only on each request's
+    position in its conversation, so a replayed run sends the same model for
+    the same request as the recording did.
+    """
+
+    def __init__(self, large_model=LARGE_MODEL, small_model=SMALL_MODEL, early_exchanges=ROUTE_EARLY_EXCHANGES,
+                 max_error_rate=ROUTE_MAX_ERROR_RATE, latency_factor=ROUTE_LATENCY_FACTOR,
+                 adaptive=llm_cassette.MODE == 'off'):
+        self.large_model = large_model
+        self.small_model = small_model if small_model != large_model else None
+        self.early_exchanges = early_exchanges
+        self.max_error_rate = max_error_rate
+        self.latency_factor = latency_factor
+        self.adaptive = adaptive
+        self._models = {}  # model -> ModelStats
+        self._overrides = 0
+        self.stats = {
+            'large': 0,
+            'small': 0,
+            'health_overrides': 0,
+            'probes': 0
+        }
+
+    def _model_stats(self, model):
+        stats = self._models.get(model)
+        if stats is None:
+            stats = self._models[model] = ModelStats()
+        return stats
+
+    def _healthy(self, model):
+        stats = self._models.get(model)
+        return stats is None or stats.calls < STATS_MIN_CALLS or stats.error_rate <= self.max_error_rate
+
+    def _small_is_faster(self):
+        small, large = self._models.get(self.small_model), self._models.get(self.large_model)
+        if small is None or large is None or small.latency is None or large.latency is None \
+                or min(small.calls, large.calls) < STATS_MIN_CALLS:
+            return True
+        return small.latency < large.latency * self.latency_factor
+
+    def _should_avoid(self, model, other):
+        if model == self.small_model and not self._small_is_faster():
+            return True
+        return not self._healthy(model) and self._model_stats(other).error_rate < self._model_stats(model).error_rate
+
+    def route(self, depth=0, count=1, max_depth=None, conflicts=(), designated=False):
+        """The model the routing rules pick for a request, before health overrides; records nothing."""
+        if not self.small_model:
+            return self.large_model
+        final = max_depth is not None and depth + count >= max_depth
+        if designated or final:
+            return self.large_model
+        if depth < self.early_exchanges or not conflicts:
+            return self.small_model
+        return self.large_model
+
+    def choose(self, depth=0, count=1, max_depth=None, conflicts=(), designated=False):
+        """Model for a request generating exchanges `depth` to `depth + count - 1` of a conversation."""
+        model = self.route(depth, count, max_depth, conflicts, designated)
+        if not self.small_model:
+            self.stats['large'] += 1
+            return model
+
+        other = self.small_model if model == self.large_model else self.large_model
+        if self.adaptive and self._should_avoid(model, other):
+            self._overrides += 1
+            if self._overrides % PROBE_INTERVAL:
+                model = other
+                self.stats['health_overrides'] += 1
+            else:
+                self.stats['probes'] += 1
+        self.stats['large' if model == self.large_model else 'small'] += 1
+        return model
+
+    def record(self, model, latency=None, failed=False):
+        """Feed a finished provider call into the model's health stats."""
+        self._model_stats(model).record(latency, failed)
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'large_model': self.large_model,
+            'small_model': self.small_model,
+            'adaptive': self.adaptive,
+            'models': {model: stats.to_dict() for model, stats in self._models.items()}
+        }
+
+
+llm_backends = LLMBackends()
+model_router = ModelRouter()
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from database import db
+from models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 10000))
+TTL = int(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))  # seconds, 0 keeps entries until evicted
+DEFAULT_POLICY = os.environ.get("LLM_CACHE_POLICY", "bypass")
+
+# Wall-clock stamps in rendered conversation history differ on every run
+_TIMESTAMP_LINE = re.compile(r'^\[\d{2}:\d{2}:\d{2}\]$')
+
+
+def normalize_prompt(text):
+    """Strip indentation, blank lines and history timestamps so equivalent prompts hash alike."""
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not _TIMESTAMP_LINE.match(line))
+
+
+def build_completion(content, model=None, prompt_tokens=None, completion_tokens=None, finish_reason='stop'):
+    """Minimal stand-in for an OpenAI chat completion carrying stored content."""
+    prompt_tokens = prompt_tokens or 0
+    completion_tokens = completion_tokens or 0
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        ),
+        model=model
+    )
+
+
+def completion_text(response):
+    """The generated text of a completion, whether returned as content or as a forced tool call."""
+    if not response.choices:
+        return ''
+    message = response.choices[0].message
+    tool_calls = getattr(message, 'tool_calls', None)
+    if tool_calls:
+        return tool_calls[0].function.arguments or ''
+    return message.content or ''
+
+
+class LLMCache:
+    """Content-addressed, database-backed cache of validated LLM responses.
+
+    Entries are keyed by a hash of model, temperature and the normalized
+    messages, expire after `ttl` seconds and are evicted least recently used
+    once the table grows past `max_entries`. Each simulation picks a policy:
+    'cache_first' reads and records, 'record_only' records without reading
+    (to seed a baseline run) and 'bypass' leaves the cache alone.
+    """
+    POLICIES = ('cache_first', 'record_only', 'bypass')
+    EVICT_EVERY = 50  # stores between eviction sweeps
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, default_policy=DEFAULT_POLICY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.default_policy = default_policy if default_policy in self.POLICIES else 'bypass'
+        self._policies = {}
+        self._stores_since_evict = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'expired': 0,
+            'evicted': 0,
+            'errors': 0
+        }
+
+    def set_policy(self, simulation_id, policy):
+        self._policies[simulation_id] = policy if policy in self.POLICIES else self.default_policy
+
+    def forget(self, simulation_id):
+        self._policies.pop(simulation_id, None)
+
+    def policy(self, simulation_id):
+        return self._policies.get(simulation_id, self.default_policy)
+
+    def make_key(self, model, temperature, messages):
+        payload = json.dumps({
+            'model': model,
+            'temperature': temperature,
+            'messages': [[message['role'], normalize_prompt(message['content'])] for message in messages]
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def lookup(self, simulation_id, model, temperature, messages):
+        """Return a cached completion for a cache-first simulation, or None.
+
+        Must be called inside an application context.
+        """
+        if self.policy(simulation_id) != 'cache_first':
+            return None
+
+        key = self.make_key(model, temperature, messages)
+        try:
+            entry = LLMCacheEntry.query.filter_by(key=key).first()
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            now = datetime.utcnow()
+            if self.ttl and entry.created_at < now - timedelta(seconds=self.ttl):
+                db.session.delete(entry)
+                db.session.commit()
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_used_at = now
+            response = build_completion(entry.response, entry.model, entry.prompt_tokens, entry.completion_tokens)
+            response.from_cache = True
+            db.session.commit()
+            self.stats['hits'] += 1
+            return response
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            self.stats['errors'] += 1
+            logger.error(f"Error reading LLM cache: {str(e)}")
+            return None
+
+    def store(self, simulation_id, model, temperature, messages, response):
+        """Record a response that parsed and validated, so malformed output is never replayed.
+
+        Must be called inside an application context.
+        """
+        if self.policy(simulation_id) == 'bypass' or getattr(response, 'from_cache', False):
+            return
+
+        usage = getattr(response, 'usage', None)
+        try:
+            db.session.add(LLMCacheEntry(
+                key=self.make_key(model, temperature, messages),
+                model=model,
+                response=completion_text(response),
+                prompt_tokens=getattr(usage, 'prompt_tokens', None),
+                completion_tokens=getattr(usage, 'completion_tokens', None)
+            ))
+            db.session.commit()
+            self.stats['stores'] += 1
+        except IntegrityError:
+            # Another worker stored the same prompt first
+            db.session.rollback()
+            return
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            self.stats['errors'] += 1
+            logger.error(f"Error writing LLM cache: {str(e)}")
+            return
+
+        self._stores_since_evict += 1
+        if self._stores_since_evict >= self.EVICT_EVERY:
+            self._stores_since_evict = 0
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones beyond `max_entries`."""
+        try:
+            if self.ttl:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+                self.stats['expired'] += (LLMCacheEntry.query.filter(LLMCacheEntry.created_at < cutoff)
+                                          .delete(synchronize_session=False))
+            excess = LLMCacheEntry.query.count() - self.max_entries
+            if excess > 0:
+                # Trim to 90% so eviction does not run on every store at the cap
+                excess += self.max_entries // 10
+                oldest = (db.session.query(LLMCacheEntry.id)
+                          .order_by(LLMCacheEntry.last_used_at)
+                          .limit(excess)
+                          .subquery())
+                self.stats['evicted'] += (LLMCacheEntry.query.filter(LLMCacheEntry.id.in_(db.select(oldest.c.id)))
+                                          .delete(synchronize_session=False))
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            self.stats['errors'] += 1
+            logger.error(f"Error evicting LLM cache entries: {str(e)}")
+
+    def get_stats(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'default_policy': self.default_policy
+        }
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,157 @@
+import os
+import gzip
+import json
+import time
+import logging
+from types import SimpleNamespace
+import eventlet
+from llm_cache import LLMCache, build_completion, completion_text
+
+logger = logging.getLogger(__name__)
+
+MODE = os.environ.get("LLM_CASSETTE_MODE", "off")  # off, record or replay
+PATH = os.environ.get("LLM_CASSETTE_PATH", "llm_cassette.jsonl.gz")
+LATENCY = os.environ.get("LLM_CASSETTE_LATENCY", "recorded")  # recorded, none, or fixed seconds
+
+_writers = {}  # path -> open cassette file shared by every recording client
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _writer(path):
+    """The one open file recordings to `path` are appended to, so a .gz cassette stays a single gzip stream."""
+    cassette = _writers.get(path)
+    if cassette is None:
+        cassette = _writers[path] = _open(path, 'a')
+    return cassette
+
+
+def close():
+    """Close every cassette being recorded; call before the process exits."""
+    for path, cassette in list(_writers.items()):
+        try:
+            cassette.close()
+        except OSError as e:
+            logger.error(f"Error closing cassette {path}: {str(e)}")
+    _writers.clear()
+
+
+class CassetteMissError(LookupError):
+    """A replayed request has no recording; the cassette does not match this run, so the simulation is stopped."""
+
+
+class CassetteClient:
+    """Drop-in for the OpenAI client's `chat.completions.create` that records or replays calls.
+
+    Record mode forwards to the real client and appends each request key,
+    response and latency to a JSON-lines cassette (gzipped for a .gz path)
+    through one writer per path that is flushed after every call and closed
+    by `close()` at shutdown.
+    Replay mode serves responses from the cassette without network access,
+    sleeping the recorded latency, none, or a fixed delay. Requests are keyed
+    like the response cache (model, temperature, normalized messages), so
+    replay does not depend on the order in which pairs are scheduled; repeated
+    identical requests are served their recordings in turn.
+    """
+    supports_streaming = False  # Calls are recorded and replayed whole
+
+    def __init__(self, mode, inner=None, path=PATH, latency=LATENCY):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Invalid cassette mode '{mode}'")
+        if mode == 'record' and inner is None:
+            raise ValueError("Record mode needs a client to forward requests to")
+        self.mode = mode
+        self.inner = inner
+        self.path = path
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=self)
+        self._keys = LLMCache(default_policy='bypass')
+        self._recordings = {}
+        self._cursors = {}
+        self.stats = {
+            'recorded': 0,
+            'replayed': 0,
+            'missed': 0
+        }
+        if mode == 'replay':
+            self._load()
+
+    @property
+    def is_replay(self):
+        return self.mode == 'replay'
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette {self.path} not found")
+        count = 0
+        with _open(self.path, 'r') as cassette:
+            try:
+                for line in cassette:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    self._recordings.setdefault(record['key'], []).append(record)
+                    count += 1
+            except (EOFError, ValueError) as e:
+                # A recording process that was killed leaves a truncated last entry
+                logger.warning(f"Cassette {self.path} ends early, keeping {count} complete recordings: {str(e)}")
+        logger.info(f"Loaded {count} recorded LLM calls ({len(self._recordings)} distinct) from {self.path}")
+
+    def _replay_delay(self, record):
+        if self.latency == 'recorded':
+            return record.get('latency', 0.0)
+        if self.latency == 'none':
+            return 0.0
+        return float(self.latency)
+
+    def create(self, model=None, messages=None, temperature=None, **kwargs):
+        key = self._keys.make_key(model, temperature, messages)
+
+        if self.mode == 'replay':
+            recordings = self._recordings.get(key)
+            if not recordings:
+                self.stats['missed'] += 1
+                raise CassetteMissError(f"No recorded response for request {key[:12]} in {self.path}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            record = recordings[cursor % len(recordings)]
+            delay = self._replay_delay(record)
+            if delay > 0:
+                eventlet.sleep(delay)
+            self.stats['replayed'] += 1
+            return build_completion(record['content'], record.get('model'),
+                                    record.get('prompt_tokens'), record.get('completion_tokens'))
+
+        started = time.monotonic()
+        response = self.inner.chat.completions.create(model=model, messages=messages,
+                                                      temperature=temperature, **kwargs)
+        latency = time.monotonic() - started
+        usage = getattr(response, 'usage', None)
+        record = {
+            'key': key,
+            'model': getattr(response, 'model', model),
+            'content': completion_text(response),
+            'latency': round(latency, 4),
+            'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'completion_tokens': getattr(usage, 'completion_tokens', None)
+        }
+        try:
+            cassette = _writer(self.path)
+            cassette.write(json.dumps(record, separators=(',', ':')) + "\n")
+            cassette.flush()
+            self.stats['recorded'] += 1
+        except OSError as e:
+            logger.error(f"Error writing cassette {self.path}: {str(e)}")
+        return response
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'mode': self.mode,
+            'path': self.path,
+            'latency': self.latency
+        }
@@ -0,0 +1,142 @@
+import os
+import time
+import heapq
+import logging
+import itertools
+from contextlib import contextmanager
+from eventlet.event import Event
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+
+
+class _Waiter:
+    __slots__ = ('key', 'event', 'enqueued_at', 'cancelled')
+
+    def __init__(self, key):
+        self.key = key
+        self.event = Event()
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+
+
+class LLMGovernor:
+    """Process-wide admission control for in-flight LLM calls.
+
+    At most `max_in_flight` calls run at once across every simulation. When the
+    cap is reached, callers queue and slots are handed out by weighted fair
+    queuing: each simulation's requests get virtual finish tags spaced by
+    1/weight, so a marathon run cannot starve short ones and a simulation with
+    priority 2 gets roughly twice the share of one with priority 1.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self._queue = []  # Heap of (finish_tag, seq, waiter)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._weights = {}
+        self._stats = {}
+
+    def _key_stats(self, key):
+        if key not in self._stats:
+            self._stats[key] = {
+                'waiting': 0,
+                'in_flight': 0,
+                'granted': 0,
+                'total_wait': 0.0,
+                'max_wait': 0.0
+            }
+        return self._stats[key]
+
+    def set_weight(self, simulation_id, weight):
+        """Set the fair-share weight (priority) of a simulation."""
+        self._weights[simulation_id] = max(0.1, float(weight))
+
+    def forget(self, simulation_id):
+        """Drop scheduling state for a finished simulation."""
+        self._weights.pop(simulation_id, None)
+        self._last_finish.pop(simulation_id, None)
+        stats = self._stats.get(simulation_id)
+        if stats and not stats['waiting'] and not stats['in_flight']:
+            del self._stats[simulation_id]
+
+    def _grant(self, key, waited):
+        self.in_flight += 1
+        stats = self._key_stats(key)
+        stats['in_flight'] += 1
+        stats['granted'] += 1
+        stats['total_wait'] += waited
+        stats['max_wait'] = max(stats['max_wait'], waited)
+
+    def _dispatch(self):
+        while self._queue and self.in_flight < self.max_in_flight:
+            finish_tag, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            self._key_stats(waiter.key)['waiting'] -= 1
+            self._virtual_time = max(self._virtual_time, finish_tag)
+            self._grant(waiter.key, time.monotonic() - waiter.enqueued_at)
+            waiter.event.send()
+
+    def acquire(self, simulation_id=None):
+        """Block until the caller may start an LLM call."""
+        if self.in_flight < self.max_in_flight and not self._queue:
+            self._grant(simulation_id, 0.0)
+            return
+
+        weight = self._weights.get(simulation_id, 1.0)
+        finish_tag = max(self._virtual_time, self._last_finish.get(simulation_id, 0.0)) + 1.0 / weight
+        self._last_finish[simulation_id] = finish_tag
+
+        waiter = _Waiter(simulation_id)
+        heapq.heappush(self._queue, (finish_tag, next(self._seq), waiter))
+        self._key_stats(simulation_id)['waiting'] += 1
+        self._dispatch()
+        try:
+            waiter.event.wait()
+        except BaseException:
+            # Killed while queued (e.g. simulation stopped): give back a slot we were granted
+            if waiter.event.ready():
+                self.release(simulation_id)
+            else:
+                waiter.cancelled = True
+                self._key_stats(simulation_id)['waiting'] -= 1
+            raise
+
+    def release(self, simulation_id=None):
+        self.in_flight -= 1
+        self._key_stats(simulation_id)['in_flight'] -= 1
+        self._dispatch()
+
+    @contextmanager
+    def slot(self, simulation_id=None):
+        self.acquire(simulation_id)
+        try:
+            yield
+        finally:
+            self.release(simulation_id)
+
+    def get_stats(self):
+        simulations = {}
+        for key, stats in self._stats.items():
+            simulations[str(key)] = {
+                'waiting': stats['waiting'],
+                'in_flight': stats['in_flight'],
+                'granted': stats['granted'],
+                'avg_wait': stats['total_wait'] / stats['granted'] if stats['granted'] else 0.0,
+                'max_wait': stats['max_wait'],
+                'weight': self._weights.get(key, 1.0)
+            }
+        return {
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self.in_flight,
+            'queue_depth': sum(1 for _, _, waiter in self._queue if not waiter.cancelled),
+            'simulations': simulations
+        }
+
+
+llm_governor = LLMGovernor(MAX_IN_FLIGHT)
@@ -0,0 +1,290 @@
+import os
+import json
+import logging
+import eventlet
+from datetime import datetime
+from sqlalchemy import func, insert
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from models import LLMCall, Simulation, Scenario, SimulationCheckpoint, Persona
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get("LLM_LEDGER_BATCH_SIZE", 100))
+FLUSH_INTERVAL = float(os.environ.get("LLM_LEDGER_FLUSH_INTERVAL", 2.0))  # seconds
+
+# USD per million (prompt, completion) tokens; LLM_PRICING takes the same JSON shape
+DEFAULT_PRICING = {
+    'gpt-4': (30.0, 60.0),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-3.5-turbo': (0.5, 1.5)
+}
+
+
+def load_pricing():
+    pricing = dict(DEFAULT_PRICING)
+    try:
+        pricing.update({model: tuple(prices) for model, prices in
+                        json.loads(os.environ.get("LLM_PRICING", "{}")).items()})
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.warning(f"Ignoring invalid LLM_PRICING: {str(e)}")
+    return pricing
+
+
+class CallUsage:
+    """Usage of one logical LLM request, accumulated over its retry attempts."""
+    __slots__ = ('model', 'attempts', 'prompt_tokens', 'completion_tokens', 'latency', 'cache_status')
+
+    def __init__(self, model):
+        self.model = model
+        self.attempts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency = 0.0
+        self.cache_status = 'off'
+
+    def add(self, response, latency=0.0, cache_status='off'):
+        """Count an attempt's completion; every attempt that got a reply is billed, parsable or not."""
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+        self.model = getattr(response, 'model', None) or self.model
+        self.latency += latency
+        self.cache_status = cache_status
+
+
+class LLMLedger:
+    """Write-behind ledger of LLM calls with cost accounting and aggregates.
+
+    One LLMCall row per logical request (all of its retry attempts), buffered
+    and written in multi-row inserts like InteractionWriter. Aggregates are
+    computed in SQL over the ledger, per simulation, scenario, depth, persona
+    or model.
+    """
+    DIMENSIONS = ('simulation', 'scenario', 'depth', 'persona', 'model')
+
+    def __init__(self, app=None, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, pricing=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pricing = pricing or load_pricing()
+        self._buffer = []
+        self._timer = None
+        self._spent = {}  # simulation_id -> [tokens, cost] recorded by this process, for budgets
+        self.stats = {
+            'recorded': 0,
+            'rows': 0,
+            'flushes': 0,
+            'errors': 0,
+            'unpriced': 0
+        }
+
+    def init_app(self, app):
+        self.app = app
+
+    def price(self, model, prompt_tokens, completion_tokens):
+        """USD cost of the tokens, or None if the model has no pricing (longest prefix match)."""
+        if not model:
+            return None
+        prices = self.pricing.get(model)
+        if prices is None:
+            matches = [name for name in self.pricing if model.startswith(name)]
+            if not matches:
+                return None
+            prices = self.pricing[max(matches, key=len)]
+        return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+    def record(self, usage, simulation_id=None, kind='interaction', initiator_id=None, receiver_id=None,
+               failed=False):
+        """Buffer a ledger row for a finished request."""
+        if usage.attempts == 0:
+            return
+        cost = 0.0 if usage.cache_status == 'hit' else self.price(usage.model, usage.prompt_tokens,
+                                                                  usage.completion_tokens)
+        if cost is None:
+            self.stats['unpriced'] += 1
+        self.stats['recorded'] += 1
+        if simulation_id in self._spent:
+            spent = self._spent[simulation_id]
+            spent[0] += usage.prompt_tokens + usage.completion_tokens
+            spent[1] += cost or 0.0
+        self._buffer.append({
+            'simulation_id': simulation_id,
+            'initiator_id': initiator_id,
+            'receiver_id': receiver_id,
+            'kind': kind,
+            'model': usage.model,
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens,
+            'latency_ms': int(usage.latency * 1000),
+            'retries': usage.attempts - 1,
+            'cache_status': usage.cache_status,
+            'cost': cost,
+            'failed': failed,
+            'created_at': datetime.utcnow()
+        })
+        if len(self._buffer) >= self.batch_size:
+            self._cancel_timer()
+            eventlet.spawn_n(self.flush)
+        elif self._timer is None:
+            self._timer = eventlet.spawn_after(self.flush_interval, self.flush)
+
+    def track(self, simulation_id, tokens=0, cost=0.0):
+        """Keep running totals of a simulation's recorded calls, starting from what it already spent."""
+        self._spent[simulation_id] = [tokens, cost]
+
+    def spent(self, simulation_id):
+        """(tokens, cost) recorded for a tracked simulation."""
+        tokens, cost = self._spent.get(simulation_id, (0, 0.0))
+        return tokens, cost
+
+    def forget(self, simulation_id):
+        self._spent.pop(simulation_id, None)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def flush(self):
+        """Write every buffered row in a single multi-row insert."""
+        self._cancel_timer()
+        if not self._buffer:
+            return
+
+        batch, self._buffer = self._buffer, []
+        try:
+            with self.app.app_context():
+                try:
+                    db.session.execute(insert(LLMCall), batch)
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    raise
+        except SQLAlchemyError as e:
+            # Accounting must never take a simulation down; the rows are dropped
+            self.stats['errors'] += 1
+            logger.error(f"Error writing {len(batch)} LLM ledger rows: {str(e)}")
+            return
+        self.stats['rows'] += len(batch)
+        self.stats['flushes'] += 1
+
+    def shutdown(self):
+        """Flush whatever is still buffered; call before the process exits."""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing LLM ledger on shutdown: {str(e)}")
+
+    @staticmethod
+    def _measures():
+        return (
+            func.count(LLMCall.id).label('calls'),
+            func.coalesce(func.sum(LLMCall.prompt_tokens), 0).label('prompt_tokens'),
+            func.coalesce(func.sum(LLMCall.completion_tokens), 0).label('completion_tokens'),
+            func.coalesce(func.sum(LLMCall.cost), 0.0).label('cost'),
+            func.avg(LLMCall.latency_ms).label('avg_latency_ms'),
+            func.coalesce(func.sum(LLMCall.retries), 0).label('retries'),
+            func.count(LLMCall.id).filter(LLMCall.cache_status == 'hit').label('cache_hits'),
+            func.count(LLMCall.id).filter(LLMCall.failed.is_(True)).label('failed')
+        )
+
+    @staticmethod
+    def _row(row, **extra):
+        return {
+            **extra,
+            'calls': row.calls,
+            'prompt_tokens': int(row.prompt_tokens),
+            'completion_tokens': int(row.completion_tokens),
+            'total_tokens': int(row.prompt_tokens) + int(row.completion_tokens),
+            'cost': round(float(row.cost), 6),
+            'avg_latency_ms': round(float(row.avg_latency_ms or 0), 1),
+            'retries': int(row.retries),
+            'cache_hits': row.cache_hits,
+            'failed': row.failed
+        }
+
+    def totals(self, simulation_id=None):
+        """Ledger totals, for one simulation or overall. Must be called inside an application context."""
+        query = db.session.query(*self._measures())
+        if simulation_id is not None:
+            query = query.filter(LLMCall.simulation_id == simulation_id)
+        return self._row(query.one())
+
+    def seconds_per_completion_token(self, model, min_calls=20):
+        """Observed provider seconds per generated token for a model, or None without enough history.
+
+        Must be called inside an application context.
+        """
+        calls, latency_ms, completion_tokens = (
+            db.session.query(func.count(LLMCall.id), func.sum(LLMCall.latency_ms), func.sum(LLMCall.completion_tokens))
+            .filter(LLMCall.model.like(f"{model}%"), LLMCall.cache_status != 'hit', LLMCall.failed.is_(False),
+                    LLMCall.completion_tokens > 0)
+            .one())
+        if calls < min_calls or not completion_tokens:
+            return None
+        return latency_ms / 1000 / completion_tokens
+
+    def breakdown(self, by, simulation_id=None, limit=20):
+        """Aggregates grouped by one of DIMENSIONS, most expensive first.
+
+        Persona rows count each pairwise call for both of its personas. Must
+        be called inside an application context.
+        """
+        if by not in self.DIMENSIONS:
+            raise ValueError(f"Unknown usage dimension '{by}', expected one of {', '.join(self.DIMENSIONS)}")
+
+        if by == 'persona':
+            merged = {}
+            for column in (LLMCall.initiator_id, LLMCall.receiver_id):
+                query = (db.session.query(Persona.id, Persona.name, *self._measures())
+                         .join(Persona, Persona.id == column))
+                if simulation_id is not None:
+                    query = query.filter(LLMCall.simulation_id == simulation_id)
+                for row in query.group_by(Persona.id, Persona.name):
+                    entry = self._row(row, id=row.id, name=row.name)
+                    if row.id in merged:
+                        previous = merged[row.id]
+                        calls = previous['calls'] + entry['calls']
+                        entry['avg_latency_ms'] = round((previous['avg_latency_ms'] * previous['calls']
+                                                         + entry['avg_latency_ms'] * entry['calls']) / calls, 1)
+                        for field in ('calls', 'prompt_tokens', 'completion_tokens', 'total_tokens',
+                                      'retries', 'cache_hits', 'failed'):
+                            entry[field] += previous[field]
+                        entry['cost'] = round(previous['cost'] + entry['cost'], 6)
+                    merged[row.id] = entry
+            return sorted(merged.values(), key=lambda entry: entry['cost'], reverse=True)[:limit]
+
+        if by == 'simulation':
+            keys = (Simulation.id, Simulation.name)
+            query = db.session.query(*keys, *self._measures()).join(Simulation, Simulation.id == LLMCall.simulation_id)
+        elif by == 'scenario':
+            keys = (Scenario.id, Scenario.name)
+            query = (db.session.query(*keys, *self._measures())
+                     .join(Simulation, Simulation.id == LLMCall.simulation_id)
+                     .join(Scenario, Scenario.id == Simulation.scenario_id))
+        elif by == 'depth':
+            keys = (SimulationCheckpoint.conversation_depth,)
+            query = (db.session.query(*keys, *self._measures())
+                     .join(SimulationCheckpoint, SimulationCheckpoint.simulation_id == LLMCall.simulation_id))
+        else:
+            keys = (LLMCall.model,)
+            query = db.session.query(*keys, *self._measures())
+        if simulation_id is not None:
+            query = query.filter(LLMCall.simulation_id == simulation_id)
+        rows = query.group_by(*keys).order_by(func.coalesce(func.sum(LLMCall.cost), 0.0).desc()).limit(limit)
+        if len(keys) == 2:
+            return [self._row(row, id=row[0], name=row[1]) for row in rows]
+        return [self._row(row, name=row[0]) for row in rows]
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'buffered': len(self._buffer)
+        }
+
+
+llm_ledger = LLMLedger()
@@ -1,9 +1,15 @@
 import eventlet
 eventlet.monkey_patch()
 
+import os
 import signal
 import sys
-from app import app, socketio, logger
+import atexit
+from app import app, socketio, logger, init_db, job_event_relay
+from interaction_writer import interaction_writer
+from llm_ledger import llm_ledger
+import llm_cassette
+import job_queue
 from flask_cors import CORS
 
 # Configure CORS
@@ -17,10 +23,16 @@ CORS(app, resources={
 
 def signal_handler(sig, frame):
     logger.info('Shutting down application...')
+    interaction_writer.shutdown()
+    llm_ledger.shutdown()
+    llm_cassette.close()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
+atexit.register(interaction_writer.shutdown)
+atexit.register(llm_ledger.shutdown)
+atexit.register(llm_cassette.close)
 
 @app.errorhandler(400)
 def bad_request_error(error):
@@ -50,6 +62,15 @@ def internal_server_error(error):
 if __name__ == "__main__":
     logger.info('Starting application server...')
     try:
+        init_db()
+        
+        # Resume interrupted simulations in the serving process only, not the reloader watcher
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            from simulation_manager import resume_running_simulations
+            eventlet.spawn(resume_running_simulations, app, socketio)
+            if job_queue.is_distributed():
+                job_event_relay.start()
+        
         socketio.run(
             app,
             host="0.0.0.0",
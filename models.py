@@ -66,3 +66,69 @@ class Scenario(db.Model):
     max_participants = db.Column(db.Integer)
     duration_minutes = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SimulationCheckpoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    simulation_id = db.Column(db.Integer, db.ForeignKey('simulation.id'), unique=True, nullable=False)
+    persona_ids = db.Column(JSON)  # Sorted roster, defines the pair-depth array layout
+    conversation_depth = db.Column(db.String(32))
+    conversation_mode = db.Column(db.String(16), default='pairwise')
+    exchanges_per_call = db.Column(db.Integer, default=1)
+    cache_policy = db.Column(db.String(16))  # LLM response cache policy, see LLMCache.POLICIES
+    parallelism = db.Column(db.Integer, default=1)
+    priority = db.Column(db.Integer, default=1)
+    custom_context = db.Column(db.Text)
+    budget = db.Column(JSON)  # SimulationBudget limits, null when unlimited
+    pair_depths = db.Column(db.LargeBinary)  # Packed upper-triangular depth array from PairScheduler
+    pair_metrics = db.Column(JSON)  # Running outcome aggregates for started pairs
+    exchange_count = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    simulation = db.relationship('Simulation', backref=db.backref('checkpoint', uselist=False))
+
+class ExchangeJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    simulation_id = db.Column(db.Integer, db.ForeignKey('simulation.id'), nullable=False, index=True)
+    initiator_id = db.Column(db.Integer, db.ForeignKey('persona.id'), nullable=False)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('persona.id'), nullable=False)
+    sequence = db.Column(db.Integer, nullable=False, default=1)  # Exchange number within the pair
+    exchanges = db.Column(db.Integer, default=1)  # Exchanges generated by the job, stored from interaction_id on
+    status = db.Column(db.String(20), nullable=False, default='pending')  # ['pending', 'claimed', 'done', 'failed', 'cancelled']
+    attempts = db.Column(db.Integer, default=0)
+    claimed_by = db.Column(db.String(128))
+    claimed_at = db.Column(db.DateTime)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)  # Not claimable before this (retry backoff)
+    completed_at = db.Column(db.DateTime)
+    interaction_id = db.Column(db.Integer, db.ForeignKey('interaction.id'))
+    error = db.Column(db.Text)
+    relayed = db.Column(db.Boolean, default=False)  # Set once the web process has emitted its events
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_exchange_job_status_id', 'status', 'id'),
+    )
+
+class LLMCacheEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of model, temperature and normalized messages
+    model = db.Column(db.String(64))
+    response = db.Column(db.Text, nullable=False)  # Raw completion content that passed validation
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class LLMCall(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    simulation_id = db.Column(db.Integer, db.ForeignKey('simulation.id'), index=True)
+    initiator_id = db.Column(db.Integer, db.ForeignKey('persona.id'))  # Unset for group rounds
+    receiver_id = db.Column(db.Integer, db.ForeignKey('persona.id'))
+    kind = db.Column(db.String(16))  # ['interaction', 'group_round']
+    model = db.Column(db.String(64))
+    prompt_tokens = db.Column(db.Integer, default=0)  # Summed over every attempt
+    completion_tokens = db.Column(db.Integer, default=0)
+    latency_ms = db.Column(db.Integer)  # Time spent waiting on the provider, all attempts
+    retries = db.Column(db.Integer, default=0)
+    cache_status = db.Column(db.String(8))  # ['hit', 'miss', 'off']
+    cost = db.Column(db.Float)  # USD from LLM_PRICING, null for unpriced models
+    failed = db.Column(db.Boolean, default=False)  # Retry budget exhausted without a usable reply
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
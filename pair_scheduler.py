@@ -0,0 +1,178 @@
+import heapq
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+
+class PairScheduler:
+    """Track conversation depth per persona pair and hand out the next pair to run.
+
+    Depths are stored in a flat upper-triangular array (two bytes per pair), so a
+    503-persona roster needs ~250KB instead of a dict of tuples. Pairs that have not
+    started yet are walked with a cursor in roster order; started pairs that are idle
+    live in a heap keyed by depth. Selecting, advancing and releasing a pair are all
+    O(log n), and completion is a running counter.
+    """
+
+    def __init__(self, persona_ids, max_depth):
+        self.persona_ids = sorted(set(persona_ids))
+        self.index = {persona_id: i for i, persona_id in enumerate(self.persona_ids)}
+        self.size = len(self.persona_ids)
+        self.total_pairs = self.size * (self.size - 1) // 2
+        self.max_depth = max_depth
+        self.depths = array('H', bytes(2 * self.total_pairs))
+        self.started_count = 0
+        self.completed_count = 0
+        self.exchange_count = 0
+        self.in_flight = set()
+        self.abandoned = set()  # Pairs given up on after the provider rejected their request
+        self._cursor = (0, 1)  # Next never-started pair in roster order
+        self._fresh = []  # Heap of (i, j) for unstarted pairs handed back without progress
+        self._ongoing = []  # Heap of (-depth, i, j) for idle started pairs
+
+    def to_bytes(self):
+        """Pack the depth array for checkpointing."""
+        return self.depths.tobytes()
+
+    def restore(self, depth_bytes=None, exchange_counts=None):
+        """Rebuild scheduling state from a checkpoint and/or persisted exchange counts.
+
+        `exchange_counts` maps (persona_id, persona_id) to the number of exchanges
+        already stored for that pair; it wins over the checkpoint where larger, so
+        exchanges written after the last checkpoint are not repeated.
+        """
+        if self.in_flight:
+            raise ValueError("Cannot restore scheduler state while pairs are in flight")
+
+        if depth_bytes:
+            depths = array('H')
+            depths.frombytes(depth_bytes)
+            if len(depths) != self.total_pairs:
+                raise ValueError(f"Checkpoint has {len(depths)} pairs, roster has {self.total_pairs}")
+            self.depths = depths
+        for (persona_a, persona_b), count in (exchange_counts or {}).items():
+            if persona_a not in self.index or persona_b not in self.index or persona_a == persona_b:
+                continue
+            i, j = self._positions(persona_a, persona_b)
+            idx = self._pair_index(i, j)
+            self.depths[idx] = max(self.depths[idx], min(count, self.max_depth))
+
+        self.started_count = self.completed_count = self.exchange_count = 0
+        self.abandoned = set()
+        self._cursor = (0, 1)
+        self._fresh = []
+        self._ongoing = []
+        idx = 0
+        for i in range(self.size):
+            for j in range(i + 1, self.size):
+                current = self.depths[idx]
+                idx += 1
+                if not current:
+                    continue
+                current = min(current, self.max_depth)
+                self.started_count += 1
+                self.exchange_count += current
+                if current >= self.max_depth:
+                    self.completed_count += 1
+                else:
+                    self._ongoing.append((-current, i, j))
+        heapq.heapify(self._ongoing)
+
+    def _pair_index(self, i, j):
+        """Position of pair (i, j), i < j, in the triangular depth array."""
+        return i * (2 * self.size - i - 1) // 2 + (j - i - 1)
+
+    def _positions(self, persona_a, persona_b):
+        i, j = self.index[persona_a], self.index[persona_b]
+        return (i, j) if i < j else (j, i)
+
+    def _next_from_cursor(self):
+        i, j = self._cursor
+        while i < self.size - 1:
+            next_j = j + 1
+            self._cursor = (i, next_j) if next_j < self.size else (i + 1, i + 2)
+            if self.depths[self._pair_index(i, j)] == 0:
+                return i, j
+            i, j = self._cursor
+        return None
+
+    @property
+    def is_complete(self):
+        return self.completed_count >= self.total_pairs
+
+    @property
+    def remaining_pairs(self):
+        return self.total_pairs - self.completed_count
+
+    def depth(self, persona_a, persona_b):
+        """Current depth of the conversation between two personas."""
+        i, j = self._positions(persona_a, persona_b)
+        return self.depths[self._pair_index(i, j)]
+
+    def is_pair_complete(self, persona_a, persona_b):
+        return self.depth(persona_a, persona_b) >= self.max_depth
+
+    def acquire(self):
+        """Take the next idle pair, preferring unstarted pairs, then the deepest ongoing one.
+
+        Returns a (persona_id, persona_id) tuple, or None if every remaining pair is
+        in flight or complete.
+        """
+        if self._fresh:
+            i, j = heapq.heappop(self._fresh)
+        else:
+            pair = self._next_from_cursor()
+            if pair is not None:
+                i, j = pair
+            elif self._ongoing:
+                _, i, j = heapq.heappop(self._ongoing)
+            else:
+                return None
+
+        self.in_flight.add((i, j))
+        return self.persona_ids[i], self.persona_ids[j]
+
+    def advance(self, persona_a, persona_b, exchanges=1):
+        """Record completed exchanges for a pair, clamped to the target depth.
+
+        Returns the number of exchanges actually counted.
+        """
+        i, j = self._positions(persona_a, persona_b)
+        idx = self._pair_index(i, j)
+        current = self.depths[idx]
+        counted = max(0, min(exchanges, self.max_depth - current))
+        if not counted:
+            return 0
+
+        if current == 0:
+            self.started_count += 1
+        self.depths[idx] = current + counted
+        self.exchange_count += counted
+        if current + counted >= self.max_depth:
+            self.completed_count += 1
+        return counted
+
+    def release(self, persona_a, persona_b):
+        """Hand an acquired pair back so it can be scheduled again unless complete."""
+        i, j = self._positions(persona_a, persona_b)
+        if (i, j) not in self.in_flight:
+            return
+        self.in_flight.discard((i, j))
+
+        current = self.depths[self._pair_index(i, j)]
+        if current >= self.max_depth:
+            return
+        if current == 0:
+            heapq.heappush(self._fresh, (i, j))
+        else:
+            heapq.heappush(self._ongoing, (-current, i, j))
+
+    def abandon(self, persona_a, persona_b):
+        """Stop scheduling a pair that cannot be generated; it counts as finished at its current depth."""
+        i, j = self._positions(persona_a, persona_b)
+        self.in_flight.discard((i, j))
+        if (i, j) in self.abandoned or self.depths[self._pair_index(i, j)] >= self.max_depth:
+            return
+        self.abandoned.add((i, j))
+        self.completed_count += 1
@@ -0,0 +1,186 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_FRAGMENTS = 4096  # cached persona/context fragments before the cache is reset
+
+INTERACTION_JSON_FORMAT = """{
+    "dialogue": "Format as: [Name]: [Message]\\n[Name]: [Response]",
+    "sentiment": "positive/neutral/negative",
+    "outcome": {
+        "resolution_status": "resolved/partially_resolved/unresolved",
+        "agreement_level": "full/partial/none",
+        "key_points": ["List of main points discussed"],
+        "tension_points": ["List of areas where conflict or disagreement occurred"],
+        "relationship_impact": "strengthened/strained/unchanged"
+    },
+    "analysis": {
+        "interaction_quality": "1-10 score",
+        "communication_effectiveness": "1-10 score",
+        "conflict_intensity": "1-10 score",
+        "resolution_quality": "1-10 score"
+    }
+}"""
+
+GROUP_ROUND_JSON_FORMAT = """{
+    "turns": [
+        {
+            "speaker": "Participant name",
+            "addressee": "Participant name, or everyone",
+            "message": "What the speaker says",
+            "sentiment": "positive/neutral/negative"
+        }
+    ],
+    "sentiment": "positive/neutral/negative",
+    "outcome": {
+        "resolution_status": "resolved/partially_resolved/unresolved",
+        "agreement_level": "full/partial/none",
+        "key_points": ["List of main points discussed"],
+        "tension_points": ["List of areas where conflict or disagreement occurred"],
+        "relationship_impact": "strengthened/strained/unchanged"
+    },
+    "analysis": {
+        "interaction_quality": "1-10 score",
+        "communication_effectiveness": "1-10 score",
+        "conflict_intensity": "1-10 score",
+        "resolution_quality": "1-10 score"
+    }
+}"""
+
+INTERACTION_SYSTEM = """You are a persona interaction simulator. Generate natural dialogue between two personas within the given scenario context, maintaining conversation continuity and relationship development. Always respond with valid JSON that includes detailed interaction analysis.
+
+Consider these aspects in the interaction:
+1. Natural development of tension points based on identified conflicts
+2. Realistic personality clashes and their manifestation
+3. Impact of different communication styles on understanding
+4. Progressive relationship development or strain
+5. Resolution attempts and their effectiveness"""
+
+GROUP_SYSTEM = """You are a group interaction simulator. Generate natural multi-party dialogue between personas within the given scenario context, maintaining conversation continuity and group dynamics. Always respond with valid JSON that includes detailed interaction analysis.
+
+Consider these aspects in the round:
+1. Every participant speaks at least once, in a natural order for the discussion
+2. Natural development of tension points based on identified conflicts
+3. Realistic personality clashes and coalitions between participants
+4. Impact of different communication styles on the group's understanding
+5. Progress towards, or away from, a shared resolution
+
+Return a JSON object with the following structure, using the exact participant names:
+""" + GROUP_ROUND_JSON_FORMAT
+
+PERSONA_FIELDS = (
+    ('Personality', 'personality'),
+    ('Interests', 'interests'),
+    ('Goals', 'goals'),
+    ('Behavior Pattern', 'behavior_pattern'),
+    ('Interaction Style', 'interaction_style'),
+    ('Communication Preference', 'communication_preference')
+)
+
+
+class PromptCompiler:
+    """Builds LLM messages from cached fragments, most stable text first.
+
+    Instructions and the response format live in the system message, which is
+    identical for every call of a kind; the scenario context follows, then the
+    persona blocks, then the per-pair conflicts and finally the conversation
+    history, which changes on every exchange. Keeping that order maximises the
+    prefix that provider-side prompt caching can reuse. Persona and context
+    fragments are rendered once and reused until the underlying fields change.
+    """
+
+    def __init__(self, max_fragments=MAX_FRAGMENTS):
+        self.max_fragments = max_fragments
+        self._personas = {}  # (role, persona id) -> (field values, rendered block)
+        self._contexts = {}  # context text -> rendered block
+        self._systems = {}  # exchange count -> system message
+        self.stats = {
+            'fragment_hits': 0,
+            'fragment_renders': 0
+        }
+
+    def _remember(self, cache, key, value):
+        if len(cache) >= self.max_fragments:
+            cache.clear()
+        cache[key] = value
+        self.stats['fragment_renders'] += 1
+        return value
+
+    def persona_block(self, persona, role):
+        """Render a persona's block under `role` (Initiator, Receiver, Participant), cached."""
+        values = (persona.name,) + tuple(getattr(persona, field) for _, field in PERSONA_FIELDS)
+        key = (role, persona.id)
+        cached = self._personas.get(key)
+        if cached is not None and cached[0] == values:
+            self.stats['fragment_hits'] += 1
+            return cached[1]
+        lines = [f"{role}: {persona.name}"]
+        lines.extend(f"{label}: {value}" for (label, _), value in zip(PERSONA_FIELDS, values[1:]))
+        return self._remember(self._personas, key, (values, "\n".join(lines)))[1]
+
+    def context_block(self, context):
+        cached = self._contexts.get(context)
+        if cached is not None:
+            self.stats['fragment_hits'] += 1
+            return cached
+        return self._remember(self._contexts, context, f"Context: {context}")
+
+    def interaction_system(self, count):
+        """System message with instructions and the response format for `count` exchanges."""
+        system = self._systems.get(count)
+        if system is not None:
+            return system
+        if count == 1:
+            response_format = f"Return a JSON object with the following structure:\n{INTERACTION_JSON_FORMAT}"
+        else:
+            response_format = (f"Generate the next {count} consecutive exchanges of this conversation. Each exchange "
+                               f"continues directly from the previous one and gets its own outcome and analysis.\n\n"
+                               f"Return a JSON object with exactly {count} items in \"exchanges\", in order:\n"
+                               f"{{\n\"exchanges\": [\n{INTERACTION_JSON_FORMAT}\n]\n}}")
+        system = self._systems[count] = f"{INTERACTION_SYSTEM}\n\n{response_format}"
+        return system
+
+    @staticmethod
+    def conflicts_block(conflicts, empty=""):
+        return "Identified Potential Conflicts:\n" + ("\n".join(f"- {conflict}" for conflict in conflicts) or empty)
+
+    def interaction_messages(self, initiator, receiver, context, conflicts, history="", count=1):
+        """Messages for `count` consecutive exchanges between two personas."""
+        prompt = "\n\n".join(part for part in (
+            self.context_block(context),
+            self.persona_block(initiator, 'Initiator'),
+            self.persona_block(receiver, 'Receiver'),
+            self.conflicts_block(conflicts),
+            history.strip(),
+            "Generate a detailed dialogue interaction between the initiator and the receiver."
+        ) if part)
+        return [
+            {"role": "system", "content": self.interaction_system(count)},
+            {"role": "user", "content": prompt}
+        ]
+
+    def group_messages(self, participants, context, conflicts, history="", round_number=1, total_rounds=1):
+        """Messages for one round of a group conversation."""
+        prompt = "\n\n".join(part for part in (
+            self.context_block(context),
+            *(self.persona_block(persona, 'Participant') for persona in participants),
+            self.conflicts_block(conflicts, empty="- None identified"),
+            history.strip(),
+            f"Generate round {round_number} of {total_rounds} of a group conversation between these participants."
+        ) if part)
+        return [
+            {"role": "system", "content": GROUP_SYSTEM},
+            {"role": "user", "content": prompt}
+        ]
+
+    def get_stats(self):
+        lookups = self.stats['fragment_hits'] + self.stats['fragment_renders']
+        return {
+            **self.stats,
+            'fragment_hit_rate': self.stats['fragment_hits'] / lookups if lookups else 0.0,
+            'cached_personas': len(self._personas),
+            'cached_contexts': len(self._contexts)
+        }
+
+
+prompt_compiler = PromptCompiler()
@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+import eventlet
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 500))
+TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 10000))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously from a per-minute quota.
+
+    The bucket holds at most `burst_seconds` worth of quota. A single request
+    larger than the capacity is admitted once the bucket is full and leaves it
+    in debt, so oversized prompts are slowed down rather than blocked forever.
+    """
+
+    def __init__(self, per_minute, burst_seconds=10):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be consumed."""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def adjust(self, amount):
+        """Refund (positive) or charge (negative) quota after the real cost is known."""
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        self.level = min(self.level, 0.0)
+
+    def set_rate_factor(self, factor):
+        self.rate = self.per_minute * factor / 60.0
+
+
+class LLMRateLimiter:
+    """Process-wide pacing of LLM calls against requests- and tokens-per-minute quotas.
+
+    Every caller acquires from the same buckets, so concurrent simulations share
+    the provider quota instead of each sleeping a fixed interval. Observed 429s
+    halve the effective rate and pause callers for the Retry-After interval;
+    successful calls restore the rate additively.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, burst_seconds=10,
+                 min_rate_factor=0.1, recovery_step=0.05, default_pause=5):
+        self.requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute > 0 else None
+        self.min_rate_factor = min_rate_factor
+        self.recovery_step = recovery_step
+        self.default_pause = default_pause
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self.stats = {
+            'acquired': 0,
+            'waited_seconds': 0.0,
+            'rate_limited': 0
+        }
+
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    def _set_rate_factor(self, factor):
+        self.rate_factor = factor
+        for bucket in self._buckets():
+            bucket.set_rate_factor(factor)
+
+    def acquire(self, estimated_tokens=0):
+        """Block the calling greenthread until a request of `estimated_tokens` may be sent.
+
+        Returns the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            wait = max(
+                self.paused_until - now,
+                self.requests.wait_time(1, now) if self.requests else 0.0,
+                self.tokens.wait_time(estimated_tokens, now) if self.tokens else 0.0
+            )
+            if wait <= 0:
+                if self.requests:
+                    self.requests.consume(1, now)
+                if self.tokens:
+                    self.tokens.consume(estimated_tokens, now)
+                self.stats['acquired'] += 1
+                self.stats['waited_seconds'] += waited
+                return waited
+            eventlet.sleep(wait)
+            waited += wait
+
+    def record_success(self, actual_tokens=None, estimated_tokens=0):
+        """Settle the token estimate against real usage and recover the rate."""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+        if self.rate_factor < 1.0:
+            self._set_rate_factor(min(1.0, self.rate_factor + self.recovery_step))
+
+    def record_rate_limited(self, retry_after=None):
+        """Back off after a 429: halve the rate and pause callers for Retry-After."""
+        self.stats['rate_limited'] += 1
+        self._set_rate_factor(max(self.min_rate_factor, self.rate_factor * 0.5))
+        for bucket in self._buckets():
+            bucket.drain()
+
+        pause = retry_after if retry_after is not None else self.default_pause
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        logger.warning(f"LLM rate limit hit, pausing {pause:.1f}s "
+                       f"(rate now {self.rate_factor * 100:.0f}% of quota)")
+
+    def retry_delay(self, default):
+        """Delay before retrying a failed call: the remaining pause if rate limited, else `default`."""
+        remaining = self.paused_until - time.monotonic()
+        return remaining if remaining > 0 else default
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'rate_factor': self.rate_factor,
+            'paused_for': max(0.0, self.paused_until - time.monotonic())
+        }
+
+
+llm_rate_limiter = LLMRateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
@@ -0,0 +1,183 @@
+import os
+import time
+import random
+import logging
+import eventlet
+from openai import (APIConnectionError, APITimeoutError, AuthenticationError, BadRequestError,
+                    ConflictError, InternalServerError, NotFoundError, PermissionDeniedError,
+                    RateLimitError, UnprocessableEntityError)
+from rate_limiter import llm_rate_limiter
+from llm_cassette import CassetteMissError
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = int(os.environ.get("LLM_RETRY_ATTEMPTS", 3))  # calls per exchange, including the first
+BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", 1.0))  # seconds
+MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", 30.0))  # seconds
+MAX_ELAPSED = float(os.environ.get("LLM_RETRY_MAX_ELAPSED", 120.0))  # seconds spent on one exchange
+BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", 5))  # consecutive provider failures
+BREAKER_RESET = float(os.environ.get("LLM_BREAKER_RESET", 30.0))  # seconds before probing again
+SEED = os.environ.get("SIMULATION_SEED")  # fixes retry jitter for reproducible benchmark runs
+
+# The provider is struggling; the same request may succeed later
+TRANSIENT_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError, ConflictError)
+# Every request will fail the same way until configuration changes; a replayed
+# run that misses its cassette no longer matches the recording
+FATAL_ERRORS = (AuthenticationError, PermissionDeniedError, NotFoundError, CassetteMissError)
+# This request will fail the same way however often it is sent
+PERMANENT_ERRORS = (BadRequestError, UnprocessableEntityError)
+
+
+def is_fatal(error):
+    """Errors that mean no LLM call can succeed, e.g. a bad API key, unknown model or cassette miss."""
+    return isinstance(error, FATAL_ERRORS)
+
+
+def is_permanent(error):
+    """Errors the provider will return for this exact request however often it is sent."""
+    return isinstance(error, PERMANENT_ERRORS)
+
+
+def is_retryable(error):
+    """Everything but fatal and permanent errors is worth another attempt.
+
+    Besides transient provider errors this covers malformed model output (which
+    can surface as any parsing error), database hiccups and errors nobody
+    anticipated; callers count repeated failures against their error budget.
+    """
+    return not isinstance(error, FATAL_ERRORS + PERMANENT_ERRORS)
+
+
+def is_provider_failure(error):
+    """Errors that indicate the provider itself is degraded (rate limits are paced separately)."""
+    return isinstance(error, TRANSIENT_ERRORS) and not isinstance(error, RateLimitError)
+
+
+class CircuitBreaker:
+    """Shared breaker that holds every LLM caller while the provider is degraded.
+
+    After `failure_threshold` consecutive provider failures the breaker opens and
+    callers wait instead of spending retries. Once `reset_timeout` has passed one
+    caller is let through as a probe; its success closes the breaker, its failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.stats = {
+            'trips': 0,
+            'waited_seconds': 0.0
+        }
+
+    def before_call(self):
+        """Block until a call may be sent; returns the seconds spent waiting."""
+        waited = 0.0
+        while self.state != 'closed':
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.probe_started = now
+                logger.info("LLM circuit half-open, sending probe request")
+                break
+            if self.state == 'half_open' and now - self.probe_started >= self.reset_timeout:
+                # The probe was cancelled or is hanging; let another caller try
+                self.probe_started = now
+                break
+            pause = min(1.0, max(0.1, self.opened_at + self.reset_timeout - now))
+            eventlet.sleep(pause)
+            waited += pause
+        self.stats['waited_seconds'] += waited
+        return waited
+
+    def record_success(self):
+        if self.state != 'closed':
+            logger.info("LLM circuit closed, provider recovered")
+        self.state = 'closed'
+        self.failures = 0
+
+    def record_failure(self, error):
+        if not is_provider_failure(error):
+            return
+        self.failures += 1
+        if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+            self.stats['trips'] += 1
+            logger.warning(f"LLM circuit open after {self.failures} consecutive provider failures, "
+                           f"holding calls for {self.reset_timeout:.0f}s: {str(error)}")
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'open_for': (max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+                         if self.state == 'open' else 0.0)
+        }
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter.
+
+    One policy call covers one exchange: at most `max_attempts` calls and
+    `max_elapsed` seconds, retrying only errors that `is_retryable` accepts.
+    """
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY,
+                 max_elapsed=MAX_ELAPSED, seed=SEED):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.random = random.Random(seed)
+        self.stats = {
+            'calls': 0,
+            'retries': 0,
+            'exhausted': 0,
+            'not_retryable': 0
+        }
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, description="LLM call"):
+        """Run `fn` under the retry budget and return its result, re-raising the last error."""
+        self.stats['calls'] += 1
+        started = time.monotonic()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    self.stats['not_retryable'] += 1
+                    logger.error(f"{description} failed with non-retryable error: {str(e)}")
+                    raise
+
+                # Wait out an active rate-limit pause rather than guessing shorter
+                delay = max(self.backoff(attempt), llm_rate_limiter.retry_delay(0))
+                if attempt >= self.max_attempts or time.monotonic() - started + delay > self.max_elapsed:
+                    self.stats['exhausted'] += 1
+                    logger.error(f"{description} failed after {attempt} attempts: {str(e)}")
+                    raise
+
+                self.stats['retries'] += 1
+                logger.warning(f"{description} failed (attempt {attempt}/{self.max_attempts}), "
+                               f"retrying in {delay:.1f}s: {str(e)}")
+                eventlet.sleep(delay)
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'max_attempts': self.max_attempts,
+            'max_elapsed': self.max_elapsed
+        }
+
+
+llm_circuit_breaker = CircuitBreaker()
+llm_retry_policy = RetryPolicy()
@@ -0,0 +1,85 @@
+class SimulationBudget:
+    """Optional caps on a simulation's LLM tokens, dollars, wall-clock seconds and exchanges.
+
+    Unset limits are not enforced. Exchanges count rounds in group mode, like
+    the conversation depth does.
+    """
+    LIMITS = (
+        ('max_tokens', 'tokens'),
+        ('max_cost', 'cost'),
+        ('max_seconds', 'seconds'),
+        ('max_exchanges', 'exchanges')
+    )
+
+    def __init__(self, max_tokens=None, max_cost=None, max_seconds=None, max_exchanges=None):
+        self.limits = {
+            'max_tokens': max_tokens,
+            'max_cost': max_cost,
+            'max_seconds': max_seconds,
+            'max_exchanges': max_exchanges
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a budget from request or checkpoint data; raises ValueError for a malformed limit."""
+        if not data:
+            return cls()
+        if not isinstance(data, dict):
+            raise ValueError("Budget must be an object")
+        limits = {}
+        for name, _ in cls.LIMITS:
+            value = data.get(name)
+            if value is None or value == '':
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid budget {name}: {value}")
+            if value <= 0:
+                raise ValueError(f"Budget {name} must be positive")
+            if name in ('max_tokens', 'max_exchanges'):
+                value = int(value)
+            limits[name] = value
+        return cls(**limits)
+
+    def to_dict(self):
+        """The set limits, or None when the budget is unlimited (for checkpoints)."""
+        return {name: value for name, value in self.limits.items() if value is not None} or None
+
+    def __bool__(self):
+        return any(value is not None for value in self.limits.values())
+
+    def status(self, tokens, cost, seconds, exchanges):
+        """Spent and remaining amounts for every set limit, plus the first limit reached (or None)."""
+        spent = {
+            'tokens': tokens,
+            'cost': round(cost, 6),
+            'seconds': round(seconds, 1),
+            'exchanges': exchanges
+        }
+        remaining = {}
+        exceeded = None
+        for name, measure in self.LIMITS:
+            limit = self.limits[name]
+            if limit is None:
+                continue
+            remaining[measure] = max(0, round(limit - spent[measure], 6))
+            if exceeded is None and spent[measure] >= limit:
+                exceeded = name
+        return {
+            'limits': self.to_dict(),
+            'spent': spent,
+            'remaining': remaining,
+            'exceeded': exceeded
+        }
+
+    def check_estimate(self, estimate):
+        """Descriptions of the limits a pre-flight estimate would exceed; empty if it fits."""
+        violations = []
+        for name, measure in self.LIMITS:
+            limit = self.limits[name]
+            expected = estimate.get('total_tokens' if measure == 'tokens' else measure)
+            if limit is not None and expected is not None and expected > limit:
+                violations.append(f"{measure} {expected:,.2f} > {limit:,.2f}" if measure == 'cost'
+                                  else f"{measure} {expected:,.0f} > {limit:,.0f}")
+        return violations
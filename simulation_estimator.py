@@ -0,0 +1,157 @@
+import logging
+from models import Persona
+from snapshots import PersonaSnapshot, ScenarioSnapshot
+from conflict_matrix import ConflictMatrix
+from prompt_compiler import prompt_compiler
+from chat_request import EXPECTED_COMPLETION_TOKENS, estimate_tokens
+from llm_backends import model_router
+from conversation_history import HISTORY_TOKEN_BUDGET
+from llm_ledger import llm_ledger
+from llm_governor import llm_governor
+from rate_limiter import llm_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_PAIRS = 25  # Pairs whose prompts are compiled to size a pairwise run
+HISTORY_ENTRY_TOKENS = EXPECTED_COMPLETION_TOKENS // 2  # Prompt history added per previous exchange
+GROUP_HISTORY_ROUNDS = 4  # Rounds of previous turns a group prompt carries at most
+SECONDS_PER_COMPLETION_TOKEN = 0.025  # Generation speed assumed until the ledger has enough history
+CALL_OVERHEAD_SECONDS = 1.0  # Per-call time to first token
+
+
+def _sample_pairs(personas, limit=SAMPLE_PAIRS):
+    """Up to `limit` pairs spread evenly over the roster's pair list."""
+    pairs = [(a, b) for i, a in enumerate(personas) for b in personas[i + 1:]] if len(personas) <= 100 else None
+    if pairs is not None:
+        step = max(1, len(pairs) // limit)
+        return pairs[::step][:limit]
+    # Large rosters: pair persona i with a persona half the roster away
+    step = max(1, len(personas) // limit)
+    return [(personas[i], personas[(i + len(personas) // 2) % len(personas)])
+            for i in range(0, len(personas), step)][:limit]
+
+
+def _add_calls(by_model, model, calls, prompt_tokens, completion_tokens):
+    usage = by_model.setdefault(model, {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+    usage['calls'] += calls
+    usage['prompt_tokens'] += prompt_tokens
+    usage['completion_tokens'] += completion_tokens
+
+
+def estimate_duration(by_model, total_tokens, concurrency):
+    """Expected wall-clock seconds for the calls, and which limit sets it.
+
+    `by_model` maps each model to its calls and completion tokens. The run
+    takes as long as the slowest of: per-call latency spread over the
+    concurrent calls, the requests-per-minute limit and the tokens-per-minute
+    limit. Latency per generated token comes from the ledger when it has
+    enough history for the model.
+    """
+    calls = sum(usage['calls'] for usage in by_model.values())
+    if not calls:
+        return 0.0, None
+    busy = sum(usage['calls'] * CALL_OVERHEAD_SECONDS
+               + (llm_ledger.seconds_per_completion_token(model) or SECONDS_PER_COMPLETION_TOKEN)
+               * usage['completion_tokens']
+               for model, usage in by_model.items())
+    bounds = {'latency': busy / max(1, concurrency)}
+    if llm_rate_limiter.requests:
+        bounds['requests_per_minute'] = calls / llm_rate_limiter.requests.per_minute * 60
+    if llm_rate_limiter.tokens:
+        bounds['tokens_per_minute'] = total_tokens / llm_rate_limiter.tokens.per_minute * 60
+    bottleneck = max(bounds, key=bounds.get)
+    return bounds[bottleneck], bottleneck
+
+
+def estimate_simulation(persona_ids, conversation_depth, scenario=None, custom_context=None,
+                        conversation_mode='pairwise', exchanges_per_call=1, parallelism=1):
+    """Expected exchanges, LLM calls, tokens, cost and duration of a simulation before it starts.
+
+    Prompt sizes come from compiling real prompts for a sample of pairs (or the
+    whole roster in group mode); history grows by HISTORY_ENTRY_TOKENS per
+    previous exchange up to the history budget, and every exchange is assumed
+    to produce EXPECTED_COMPLETION_TOKENS. Each call is assigned the model
+    `model_router` picks for its position in the conversation (its rules, not
+    its health overrides) and priced and timed for that model. Duration
+    follows from the configured rate limits and the pairs generated
+    concurrently (see estimate_duration). Must be called inside an
+    application context.
+    """
+    from simulation_manager import SimulationManager, build_interaction_context
+
+    max_depth = SimulationManager.DEPTH_RANGES.get(conversation_depth, SimulationManager.DEPTH_RANGES['medium'])[1]
+    exchanges_per_call = max(1, min(int(exchanges_per_call), SimulationManager.MAX_EXCHANGES_PER_CALL))
+    personas = [PersonaSnapshot.from_model(persona) for persona in
+                Persona.query.filter(Persona.id.in_(persona_ids)).order_by(Persona.id).all()]
+    scenario = ScenarioSnapshot.from_model(scenario) if scenario is not None else None
+    context = build_interaction_context("", scenario, custom_context)
+    count = len(personas)
+    estimate = {
+        'mode': conversation_mode,
+        'personas': count,
+        'max_depth': max_depth,
+        'pairs': count * (count - 1) // 2
+    }
+
+    by_model = {}
+    if count < 2:
+        exchanges = 0
+    elif conversation_mode == 'group':
+        conflict_matrix = ConflictMatrix(personas)
+        conflicts = [f"{a.name} / {b.name}: {conflict}"
+                     for i, a in enumerate(personas) for b in personas[i + 1:]
+                     for conflict in conflict_matrix.conflicts(a, b)]
+        base = estimate_tokens(prompt_compiler.group_messages(personas, context, conflicts, "", 1, max_depth), 0)
+        exchanges = max_depth
+        for rounds in range(max_depth):
+            _add_calls(by_model, model_router.route(rounds, 1, max_depth, conflicts), 1,
+                       base + min(rounds, GROUP_HISTORY_ROUNDS) * HISTORY_ENTRY_TOKENS, EXPECTED_COMPLETION_TOKENS)
+    else:
+        conflict_matrix = ConflictMatrix(personas)
+        sample = _sample_pairs(personas)
+        scale = estimate['pairs'] / len(sample)  # Each sampled pair stands for this many
+        exchanges = estimate['pairs'] * max_depth
+        for a, b in sample:
+            conflicts = conflict_matrix.conflicts(a, b)
+            base = estimate_tokens(prompt_compiler.interaction_messages(
+                a, b, context, conflicts, "", exchanges_per_call), 0)
+            # Calls of one pair start after 0, K, 2K, ... exchanges of history
+            for depth in range(0, max_depth, exchanges_per_call):
+                chunk = min(exchanges_per_call, max_depth - depth)
+                _add_calls(by_model, model_router.route(depth, chunk, max_depth, conflicts), scale,
+                           scale * (base + min(HISTORY_TOKEN_BUDGET, depth * HISTORY_ENTRY_TOKENS)),
+                           scale * chunk * EXPECTED_COMPLETION_TOKENS)
+
+    models = {}
+    for model, usage in by_model.items():
+        models[model] = {
+            'calls': round(usage['calls']),
+            'prompt_tokens': int(usage['prompt_tokens']),
+            'completion_tokens': int(usage['completion_tokens'])
+        }
+        models[model]['cost'] = llm_ledger.price(model, models[model]['prompt_tokens'],
+                                                 models[model]['completion_tokens'])
+    calls = sum(usage['calls'] for usage in models.values())
+    prompt_tokens = sum(usage['prompt_tokens'] for usage in models.values())
+    completion_tokens = sum(usage['completion_tokens'] for usage in models.values())
+    costs = [usage['cost'] for usage in models.values()]
+    cost = None if None in costs else sum(costs)
+    # Group rounds build on each other and run one at a time
+    concurrency = 1 if conversation_mode == 'group' else min(int(parallelism), estimate['pairs'],
+                                                             llm_governor.max_in_flight)
+    seconds, bottleneck = estimate_duration(by_model, prompt_tokens + completion_tokens, concurrency)
+    for usage in models.values():
+        usage['cost'] = round(usage['cost'], 4) if usage['cost'] is not None else None
+    estimate.update({
+        'models': models,
+        'exchanges': exchanges,
+        'calls': calls,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'cost': round(cost, 4) if cost is not None else None,
+        'concurrency': max(1, concurrency),
+        'seconds': round(seconds, 1),
+        'bottleneck': bottleneck
+    })
+    return estimate
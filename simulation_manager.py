@@ -1,9 +1,23 @@
 import random
 from datetime import datetime
 import eventlet
+from eventlet.event import Event
 from database import db
-from models import Simulation, Interaction, Persona
-from chat_request import generate_interaction
+from models import Simulation, Interaction, Persona, SimulationCheckpoint, ExchangeJob
+from chat_request import generate_interactions, generate_group_round, MAX_EXCHANGES_PER_CALL, STREAMING
+from rate_limiter import llm_rate_limiter
+from llm_governor import llm_governor
+from llm_cache import llm_cache
+from llm_ledger import llm_ledger
+from retry_policy import is_fatal, is_permanent, is_retryable
+from simulation_registry import simulation_registry
+from interaction_writer import interaction_writer, InteractionWriteError
+from pair_scheduler import PairScheduler
+from snapshots import PersonaSnapshot, ScenarioSnapshot
+from conflict_matrix import ConflictMatrix
+from conversation_history import ConversationHistory
+from simulation_budget import SimulationBudget
+from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 import time
 import logging
@@ -12,9 +26,76 @@ from flask_socketio import SocketIO
 
 logger = logging.getLogger(__name__)
 
+
+def build_interaction_metadata(interaction_data):
+    """Normalise generated interaction data into the stored interaction_metadata shape."""
+    outcome = interaction_data.get('outcome', {})
+    analysis = interaction_data.get('analysis', {})
+    return {
+        'outcome': {
+            'resolution_status': outcome.get('resolution_status', 'unknown'),
+            'agreement_level': outcome.get('agreement_level', 'none'),
+            'key_points': outcome.get('key_points', []),
+            'tension_points': outcome.get('tension_points', []),
+            'relationship_impact': outcome.get('relationship_impact', 'unchanged')
+        },
+        'analysis': {
+            'interaction_quality': analysis.get('interaction_quality', '5'),
+            'communication_effectiveness': analysis.get('communication_effectiveness', '5'),
+            'conflict_intensity': analysis.get('conflict_intensity', '5'),
+            'resolution_quality': analysis.get('resolution_quality', '5')
+        },
+        'sentiment': interaction_data.get('sentiment', 'neutral')
+    }
+
+
+def record_pair_outcome(pair_metrics, pair_key, interaction_data):
+    """Fold an exchange outcome into `pair_metrics[pair_key]` and return the pair's aggregate metrics."""
+    metrics = pair_metrics.setdefault(pair_key, {
+        'exchanges': 0,
+        'quality_total': 0.0,
+        'positive': 0,
+        'resolved': 0
+    })
+    analysis = interaction_data.get('analysis', {})
+    outcome = interaction_data.get('outcome', {})
+    
+    metrics['exchanges'] += 1
+    metrics['quality_total'] += float(analysis.get('interaction_quality', 0))
+    if outcome.get('relationship_impact') == 'strengthened':
+        metrics['positive'] += 1
+    if outcome.get('resolution_status') == 'resolved':
+        metrics['resolved'] += 1
+    
+    return {
+        'avg_interaction_quality': metrics['quality_total'] / metrics['exchanges'],
+        'positive_interactions': metrics['positive'],
+        'resolution_rate': metrics['resolved'] / metrics['exchanges']
+    }
+
+
+def build_interaction_context(simulation_name, scenario, custom_context=None):
+    """Generate context for interaction based on scenario and custom context."""
+    if not scenario:
+        base_context = f"Current simulation: {simulation_name}"
+    else:
+        base_context = f"Scenario: {scenario.name}\n{scenario.context}\n"
+        
+    # Add custom context if available
+    if custom_context:
+        base_context = f"{base_context}\nCustom Context:\n{custom_context}"
+        
+    return f"{base_context}\nCurrent simulation: {simulation_name}"
+
+
 class SimulationManager:
-    MAX_RETRIES = 3
-    RETRY_DELAY = 5  # seconds
+    RETRY_DELAY = 5  # seconds to hold a worker slot after a failed exchange, unless rate limited
+    MAX_PARALLELISM = 16  # Upper bound on concurrently running conversation pairs
+    MAX_PRIORITY = 10  # Upper bound on the fair-share weight of a simulation
+    CHECKPOINT_INTERVAL = 30  # seconds between scheduler checkpoints
+    CHECKPOINT_EXCHANGES = 25  # exchanges between scheduler checkpoints
+    MAX_EXCHANGES_PER_CALL = MAX_EXCHANGES_PER_CALL  # Upper bound on exchanges generated per LLM call
+    CONVERSATION_MODES = ('pairwise', 'group')  # group: the whole roster speaks in one round per LLM call
     
     # Define depth ranges
     DEPTH_RANGES = {
@@ -26,10 +107,14 @@ class SimulationManager:
         'marathon': (51, 100)
     }
     
-    def __init__(self, simulation_id, persona_ids=None, socketio=None, app=None, conversation_depth='medium'):
+    def __init__(self, simulation_id, persona_ids=None, socketio=None, app=None, conversation_depth='medium',
+                 parallelism=1, priority=1, conversation_mode='pairwise', exchanges_per_call=1,
+                 cache_policy=None, budget=None):
         self.simulation_id = simulation_id
         self.is_running = False
+        self.is_paused = False
         self.greenthread = None
+        self.started_at = None
         self.error_count = 0
         self.max_errors = 5
         self.simulation = None
@@ -37,8 +122,45 @@ class SimulationManager:
         self.selected_persona_ids = persona_ids or []
         self.socketio = socketio or SocketIO()
         self.app = app or current_app
-        self.conversation_pairs = {}  # Track ongoing conversations
-        self.completed_pairs = set()  # Track completed conversation pairs
+        self.scheduler = None  # Pair depths and selection, built when the simulation starts
+        self.personas = {}  # Session-detached persona snapshots keyed by id, loaded at start
+        self.conflict_matrix = None  # Pairwise conflicts of the roster, compiled at start
+        self.history = ConversationHistory()  # Rolling summary and recent exchanges per pair for prompts
+        self.scenario = None  # Session-detached scenario snapshot, loaded at start
+        self.simulation_name = None
+        self.pair_metrics = {}  # Running outcome aggregates per pair, checkpointed with the scheduler
+        self.group_rounds = 0  # Completed rounds in group mode, where the depth counts rounds
+        self.pool = None
+        self._checkpointing = False
+        self._last_checkpoint_at = time.monotonic()
+        self._last_checkpoint_exchanges = 0
+        self._pair_finished = eventlet.queue.LightQueue()
+        self._resumed = Event()
+        self._llm_calls = set()  # Worker greenthreads currently waiting on the LLM
+        
+        # Validate and set parallelism (number of pairs generated concurrently)
+        try:
+            parallelism = int(parallelism)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid parallelism '{parallelism}', defaulting to 1")
+            parallelism = 1
+        self.parallelism = max(1, min(parallelism, self.MAX_PARALLELISM))
+        
+        # Validate and set priority (fair-share weight for LLM call admission)
+        try:
+            priority = int(priority)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid priority '{priority}', defaulting to 1")
+            priority = 1
+        self.priority = max(1, min(priority, self.MAX_PRIORITY))
+        
+        # Validate and set exchanges per call (consecutive exchanges of a pair generated in one request)
+        try:
+            exchanges_per_call = int(exchanges_per_call)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid exchanges per call '{exchanges_per_call}', defaulting to 1")
+            exchanges_per_call = 1
+        self.exchanges_per_call = max(1, min(exchanges_per_call, self.MAX_EXCHANGES_PER_CALL))
         
         # Validate and set conversation depth
         if conversation_depth not in self.DEPTH_RANGES:
@@ -46,8 +168,25 @@ class SimulationManager:
             conversation_depth = 'medium'
         self.conversation_depth = conversation_depth
         
+        # Validate and set conversation mode
+        if conversation_mode not in self.CONVERSATION_MODES:
+            logger.warning(f"Invalid conversation mode '{conversation_mode}', defaulting to 'pairwise'")
+            conversation_mode = 'pairwise'
+        self.conversation_mode = conversation_mode
+        
+        # Validate and set the LLM response cache policy
+        if cache_policy is None:
+            cache_policy = llm_cache.default_policy
+        if cache_policy not in llm_cache.POLICIES:
+            logger.warning(f"Invalid cache policy '{cache_policy}', defaulting to '{llm_cache.default_policy}'")
+            cache_policy = llm_cache.default_policy
+        self.cache_policy = cache_policy
+        
+        # Optional token, spend, time and exchange limits, enforced after every exchange
+        self.budget = budget if isinstance(budget, SimulationBudget) else SimulationBudget.from_dict(budget)
+        
         logger.info(f"Initializing simulation with conversation depth: {conversation_depth} "
-                   f"(range: {self.DEPTH_RANGES[conversation_depth]})")
+                   f"(range: {self.DEPTH_RANGES[conversation_depth]}), parallelism: {self.parallelism}")
         self._load_simulation()
 
     def _load_simulation(self):
@@ -81,15 +220,13 @@ class SimulationManager:
     def _should_continue_conversation(self, initiator_id, receiver_id):
         """Determine if the current conversation should continue with strict validation."""
         pair_key = tuple(sorted([initiator_id, receiver_id]))
-        current_depth = self.conversation_pairs.get(pair_key, 0)
+        current_depth = self.scheduler.depth(initiator_id, receiver_id)
         min_depth = self._get_min_depth()
         max_depth = self._get_max_depth()
         
         # Strict validation: Immediately return False if max depth reached or exceeded
         if current_depth >= max_depth:
-            if pair_key not in self.completed_pairs:
-                self.completed_pairs.add(pair_key)
-                logger.info(f"Conversation pair {pair_key} completed with target depth {max_depth}")
+            logger.info(f"Conversation pair {pair_key} already completed with target depth {max_depth}")
             return False
         
         # Log current conversation status
@@ -101,360 +238,614 @@ class SimulationManager:
         logger.info(f"Continuing conversation {pair_key}: {remaining} exchanges remaining")
         return True
     
-    def _update_conversation_count(self, initiator_id, receiver_id):
+    def _update_conversation_count(self, initiator_id, receiver_id, exchanges=1):
         """Update the conversation count with strict validation and enhanced logging."""
         pair_key = tuple(sorted([initiator_id, receiver_id]))
         max_depth = self._get_max_depth()
 
         # Prevent incrementing beyond max depth
-        if pair_key in self.conversation_pairs:
-            current_depth = self.conversation_pairs[pair_key]
-            if current_depth >= max_depth:
-                logger.warning(f"Attempted to increment conversation {pair_key} beyond max depth {max_depth}")
-                return False
-            
-            # Increment conversation count
-            self.conversation_pairs[pair_key] += 1
-            current_depth = self.conversation_pairs[pair_key]
-            
-            # Log progress
+        if not self.scheduler.advance(initiator_id, receiver_id, exchanges):
+            logger.warning(f"Attempted to increment conversation {pair_key} beyond max depth {max_depth}")
+            return False
+        
+        current_depth = self.scheduler.depth(initiator_id, receiver_id)
+        if current_depth == exchanges:
+            logger.info(f"Started new conversation pair {pair_key} ({current_depth}/{max_depth} exchanges)")
+        else:
             progress_percentage = (current_depth / max_depth) * 100
             logger.info(f"Conversation progress for pair {pair_key}: "
                        f"{current_depth}/{max_depth} exchanges ({progress_percentage:.1f}%)")
-            
-            # Mark as complete if max depth reached
-            if current_depth >= max_depth:
-                if pair_key not in self.completed_pairs:
-                    self.completed_pairs.add(pair_key)
-                    logger.info(f"Conversation pair {pair_key} completed with target depth {max_depth}")
-        else:
-            # Initialize new conversation
-            self.conversation_pairs[pair_key] = 1
-            logger.info(f"Started new conversation pair {pair_key} (1/{max_depth} exchanges)")
+        
+        if current_depth >= max_depth:
+            logger.info(f"Conversation pair {pair_key} completed with target depth {max_depth}")
         
         return True
 
-    def _generate_interaction_with_retry(self, initiator, receiver, context, retry_count=0):
-        """Generate interaction with retry mechanism and depth validation."""
-        try:
-            with self.app.app_context():
-                # Validate conversation depth before generating
-                pair_key = tuple(sorted([initiator.id, receiver.id]))
-                current_depth = self.conversation_pairs.get(pair_key, 0)
-                max_depth = self._get_max_depth()
-                
-                if current_depth >= max_depth:
-                    logger.warning(f"Attempted to generate interaction for completed conversation {pair_key}")
-                    return None
-                
-                # Refresh simulation object
-                self.simulation = db.session.merge(self.simulation)
-                
-                # Emit status update with depth information
-                self.socketio.emit('generating_interaction', {
-                    'simulation_id': self.simulation_id,
-                    'initiator': initiator.name,
-                    'receiver': receiver.name,
-                    'conversation_depth': f"{current_depth + 1}/{max_depth}"
-                })
-                
-                # Generate interaction
-                interaction_data = generate_interaction(
-                    initiator, 
-                    receiver, 
-                    context,
-                    simulation_id=self.simulation_id
-                )
-                
-                # Create and save interaction with enhanced data
-                interaction = Interaction()
-                interaction.simulation_id = self.simulation_id
-                interaction.initiator_id = initiator.id
-                interaction.receiver_id = receiver.id
-                interaction.content = str(interaction_data['dialogue'])
-                interaction.interaction_metadata = {
-                    'outcome': {
-                        'resolution_status': interaction_data.get('outcome', {}).get('resolution_status', 'unknown'),
-                        'agreement_level': interaction_data.get('outcome', {}).get('agreement_level', 'none'),
-                        'key_points': interaction_data.get('outcome', {}).get('key_points', []),
-                        'tension_points': interaction_data.get('outcome', {}).get('tension_points', []),
-                        'relationship_impact': interaction_data.get('outcome', {}).get('relationship_impact', 'unchanged')
-                    },
-                    'analysis': {
-                        'interaction_quality': interaction_data.get('analysis', {}).get('interaction_quality', '5'),
-                        'communication_effectiveness': interaction_data.get('analysis', {}).get('communication_effectiveness', '5'),
-                        'conflict_intensity': interaction_data.get('analysis', {}).get('conflict_intensity', '5'),
-                        'resolution_quality': interaction_data.get('analysis', {}).get('resolution_quality', '5')
-                    },
-                    'sentiment': interaction_data.get('sentiment', 'neutral')
-                }
+    def _interaction_loop(self):
+        """Main dispatch loop scheduling independent conversation pairs onto a green pool."""
+        self.pool = eventlet.GreenPool(self.parallelism)
+        if self.conversation_mode == 'group':
+            return self._group_loop()
+        while self.is_running:
+            try:
+                # Hold dispatching while paused
+                if self.is_paused:
+                    self._resumed.wait()
+                    continue
                 
-                db.session.add(interaction)
-                db.session.commit()
+                if len(self.personas) < 2:
+                    raise ValueError("Insufficient personas for interaction")
                 
-                # Track conversation outcomes and progression
-                pair_key = tuple(sorted([initiator.id, receiver.id]))
-                if not hasattr(self, 'conversation_outcomes'):
-                    self.conversation_outcomes = {}
+                if self._check_budget(emit=False):
+                    break
                 
-                if pair_key not in self.conversation_outcomes:
-                    self.conversation_outcomes[pair_key] = []
+                # Log detailed conversation state
+                logger.info(f"Current conversation state - "
+                          f"Active: {self.scheduler.started_count}, "
+                          f"In flight: {len(self.scheduler.in_flight)}/{self.parallelism}, "
+                          f"Completed: {self.scheduler.completed_count}, "
+                          f"Target depth: {self.scheduler.max_depth}, "
+                          f"Total pairs possible: {self.scheduler.total_pairs}")
                 
-                outcome_entry = {
-                    'depth': self.conversation_pairs.get(pair_key, 0) + 1,
-                    'outcome': interaction_data.get('outcome', {}),
-                    'analysis': interaction_data.get('analysis', {}),
-                    'timestamp': datetime.utcnow()
-                }
+                # Select conversation pair based on depth settings, skipping pairs in flight
+                initiator, receiver = self._select_conversation_pair(self.personas)
                 
-                self.conversation_outcomes[pair_key].append(outcome_entry)
+                if initiator is None or receiver is None:
+                    if not self.scheduler.in_flight:
+                        abandoned = len(self.scheduler.abandoned)
+                        logger.info(f"All conversations have reached their target depth ({abandoned} abandoned)")
+                        self.end_simulation(f"Conversations completed, {abandoned} pair(s) abandoned after rejected requests"
+                                            if abandoned else "All conversations completed successfully")
+                        break
+                    
+                    # Every remaining pair is in flight; wait for one to finish before re-selecting
+                    self._pair_finished.get()
+                    continue
                 
-                # Calculate aggregate metrics for the conversation
-                current_outcomes = self.conversation_outcomes[pair_key]
-                aggregate_metrics = {
-                    'avg_interaction_quality': sum(float(o['analysis'].get('interaction_quality', 0)) 
-                                               for o in current_outcomes) / len(current_outcomes),
-                    'avg_communication_effectiveness': sum(float(o['analysis'].get('communication_effectiveness', 0))
-                                                      for o in current_outcomes) / len(current_outcomes),
-                    'avg_conflict_intensity': sum(float(o['analysis'].get('conflict_intensity', 0))
-                                              for o in current_outcomes) / len(current_outcomes),
-                    'avg_resolution_quality': sum(float(o['analysis'].get('resolution_quality', 0))
-                                              for o in current_outcomes) / len(current_outcomes),
-                    'resolution_rate': sum(1 for o in current_outcomes 
-                                      if o['outcome'].get('resolution_status') == 'resolved') / len(current_outcomes),
-                    'relationship_progression': {
-                        'strengthened': sum(1 for o in current_outcomes 
-                                        if o['outcome'].get('relationship_impact') == 'strengthened'),
-                        'unchanged': sum(1 for o in current_outcomes 
-                                    if o['outcome'].get('relationship_impact') == 'unchanged'),
-                        'strained': sum(1 for o in current_outcomes 
-                                   if o['outcome'].get('relationship_impact') == 'strained')
-                    }
-                }
+                # Wait for a free worker slot; every finished exchange posts to the queue
+                while not self.pool.free():
+                    self._pair_finished.get()
+                if self.is_paused or not self.is_running:
+                    self.scheduler.release(initiator.id, receiver.id)
+                    continue
+                self.pool.spawn_n(self._run_exchange, initiator, receiver)
                 
-                # Calculate relationship trend
-                relationship_scores = [1 if o['outcome'].get('relationship_impact') == 'strengthened'
-                                    else -1 if o['outcome'].get('relationship_impact') == 'strained'
-                                    else 0 for o in current_outcomes]
-                relationship_trend = sum(relationship_scores)
+            except Exception as e:
+                self.error_count += 1
+                logger.error(f"Error in interaction loop (attempt {self.error_count}): {str(e)}")
                 
-                aggregate_metrics['relationship_trend'] = (
-                    'improving' if relationship_trend > 0
-                    else 'deteriorating' if relationship_trend < 0
-                    else 'stable'
-                )
+                if self.error_count >= self.max_errors:
+                    logger.error("Maximum error count reached, stopping simulation")
+                    self.end_simulation("Maximum error count reached")
+                    break
                 
-                # Emit new interaction event with enhanced data
-                self.socketio.emit('new_interaction', {
+                self.socketio.emit('simulation_warning', {
                     'simulation_id': self.simulation_id,
-                    'interaction': {
-                        'initiator': initiator.name,
-                        'receiver': receiver.name,
-                        'content': interaction_data['dialogue'],
-                        'timestamp': interaction.timestamp.isoformat(),
-                        'sentiment': interaction_data.get('sentiment', 'neutral'),
-                        'outcome': interaction_data.get('outcome', {}),
-                        'analysis': interaction_data.get('analysis', {}),
-                        'conversation_depth': f"{self.conversation_pairs.get(pair_key, 0) + 1}/{self._get_max_depth()}",
-                        'aggregate_metrics': aggregate_metrics
-                    }
+                    'message': f'Error generating interaction (attempt {self.error_count})'
                 })
-                
-                return interaction
-            
-        except Exception as e:
-            logger.error(f"Error generating interaction (attempt {retry_count + 1}): {str(e)}")
-            if retry_count < self.MAX_RETRIES:
-                eventlet.sleep(self.RETRY_DELAY)
-                return self._generate_interaction_with_retry(initiator, receiver, context, retry_count + 1)
-            raise
-
-    def _interaction_loop(self):
-        """Main interaction loop with enhanced conversation depth tracking and validation."""
+                eventlet.sleep(llm_rate_limiter.retry_delay(self.RETRY_DELAY))
+    
+    def _group_loop(self):
+        """Dispatch loop for group mode: rounds run one after another, each on a pool worker."""
+        participants = [self.personas[persona_id] for persona_id in sorted(self.personas)]
+        max_rounds = self._get_max_depth()
         while self.is_running:
             try:
-                with self.app.app_context():
-                    # Reset error count on successful iteration
-                    if self.error_count > 0:
-                        self.error_count = 0
-                    
-                    # Get selected personas
-                    selected_personas = (
-                        Persona.query.filter(Persona.id.in_(self.selected_persona_ids)).all()
-                        if self.selected_persona_ids
-                        else Persona.query.all()
-                    )
-                    
-                    if len(selected_personas) < 2:
-                        raise ValueError("Insufficient personas for interaction")
-                    
-                    # Log detailed conversation state
-                    logger.info(f"Current conversation state - "
-                              f"Active: {len(self.conversation_pairs)}, "
-                              f"Completed: {len(self.completed_pairs)}, "
-                              f"Target depth: {self._get_max_depth()}, "
-                              f"Total pairs possible: {len(selected_personas) * (len(selected_personas) - 1) // 2}")
-                    
-                    # Select conversation pair based on depth settings
-                    initiator, receiver = self._select_conversation_pair(selected_personas)
-                    
-                    # Check if all conversations are complete
-                    if initiator is None or receiver is None:
-                        logger.info("All conversations have reached their target depth")
-                        self.end_simulation("All conversations completed successfully")
-                        break
-                    
-                    # Validate conversation continuation
-                    pair_key = tuple(sorted([initiator.id, receiver.id]))
-                    if not self._should_continue_conversation(initiator.id, receiver.id):
-                        logger.info(f"Skipping completed conversation pair {pair_key}")
-                        continue
-                    
-                    # Generate interaction context
-                    context = self._generate_interaction_context(initiator, receiver)
-                    
-                    # Generate interaction with retries
-                    self._generate_interaction_with_retry(initiator, receiver, context)
-                    
-                    # Update conversation count with validation
-                    self._update_conversation_count(initiator.id, receiver.id)
-                    
-                    # Verify completion state
-                    all_pairs = set(tuple(sorted([p1.id, p2.id])) 
-                                  for i, p1 in enumerate(selected_personas) 
-                                  for p2 in selected_personas[i+1:])
-                    
-                    if len(self.completed_pairs) == len(all_pairs):
-                        logger.info("All conversation pairs have completed their target depth")
-                        self.end_simulation("All conversations completed successfully")
-                        break
-                    
-                # Add delay between interactions
-                eventlet.sleep(10)
+                if self.is_paused:
+                    self._resumed.wait()
+                    continue
+                
+                if len(participants) < 2:
+                    raise ValueError("Insufficient personas for interaction")
+                
+                if self._check_budget(emit=False):
+                    break
+                
+                if self.group_rounds >= max_rounds:
+                    logger.info("All group rounds have been completed")
+                    self.end_simulation("All group rounds completed successfully")
+                    break
+                
+                # Each round builds on the previous one, so only one is in flight at a time
+                self.pool.spawn_n(self._run_group_round, participants, max_rounds)
+                self._pair_finished.get()
                 
             except Exception as e:
                 self.error_count += 1
-                logger.error(f"Error in interaction loop (attempt {self.error_count}): {str(e)}")
+                logger.error(f"Error in group loop (attempt {self.error_count}): {str(e)}")
                 
                 if self.error_count >= self.max_errors:
                     logger.error("Maximum error count reached, stopping simulation")
                     self.end_simulation("Maximum error count reached")
                     break
                 
-                self.socketio.emit('simulation_warning', {
-                    'simulation_id': self.simulation_id,
-                    'message': f'Error generating interaction (attempt {self.error_count})'
-                })
-                eventlet.sleep(self.RETRY_DELAY)
+                eventlet.sleep(llm_rate_limiter.retry_delay(self.RETRY_DELAY))
     
-    def _generate_interaction_with_retry(self, initiator, receiver, context, retry_count=0):
-        """Generate interaction with retry mechanism."""
+    def _run_group_round(self, participants, max_rounds):
+        """Generate, store and announce one group round on a pool worker."""
+        round_number = self.group_rounds + 1
+        delay = 0
         try:
             with self.app.app_context():
-                # Refresh simulation object
-                self.simulation = db.session.merge(self.simulation)
-                
-                # Emit status update
                 self.socketio.emit('generating_interaction', {
                     'simulation_id': self.simulation_id,
-                    'initiator': initiator.name,
-                    'receiver': receiver.name,
-                    'conversation_depth': f"{self.conversation_pairs.get(tuple(sorted([initiator.id, receiver.id])), 0) + 1}/{self._get_max_depth()}"
+                    'initiator': participants[0].name,
+                    'receiver': 'group',
+                    'conversation_depth': f"{round_number}/{max_rounds}"
                 })
                 
-                # Pass simulation_id to maintain conversation context
-                interaction_data = generate_interaction(
+                context = build_interaction_context(self.simulation_name, self.scenario, self.custom_context)
+                current = eventlet.getcurrent()
+                self._llm_calls.add(current)
+                try:
+                    round_data = generate_group_round(
+                        participants,
+                        context,
+                        simulation_id=self.simulation_id,
+                        round_number=round_number,
+                        total_rounds=max_rounds,
+                        conflict_matrix=self.conflict_matrix
+                    )
+                finally:
+                    self._llm_calls.discard(current)
+                
+                # One Interaction row per speaker turn, all sharing the round's outcome and analysis
+                metadata = build_interaction_metadata(round_data)
+                timestamp = datetime.utcnow()
+                turns = round_data['turns']
+                pending = []
+                for index, turn in enumerate(turns):
+                    receiver = turn['addressee'] or self._group_receiver(participants, turns, index)
+                    pending.append((turn, receiver, interaction_writer.add({
+                        'simulation_id': self.simulation_id,
+                        'initiator_id': turn['speaker'].id,
+                        'receiver_id': receiver.id,
+                        'content': f"{turn['speaker'].name}: {turn['message']}",
+                        'timestamp': timestamp,
+                        'interaction_metadata': {
+                            **metadata,
+                            'sentiment': turn['sentiment'],
+                            'conversation_mode': 'group',
+                            'group_round': round_number,
+                            'turn': index + 1
+                        }
+                    })))
+                
+                aggregate_metrics = record_pair_outcome(self.pair_metrics, 'group', round_data)
+                for turn, receiver, written in pending:
+                    self.socketio.emit('new_interaction', {
+                        'simulation_id': self.simulation_id,
+                        'interaction': {
+                            'id': written.wait(),
+                            'initiator': turn['speaker'].name,
+                            'receiver': receiver.name,
+                            'content': turn['message'],
+                            'timestamp': timestamp.isoformat(),
+                            'sentiment': turn['sentiment'],
+                            'outcome': round_data.get('outcome', {}),
+                            'analysis': round_data.get('analysis', {}),
+                            'conversation_depth': f"{round_number}/{max_rounds}",
+                            'aggregate_metrics': aggregate_metrics
+                        }
+                    })
+            
+            self.group_rounds = round_number
+            logger.info(f"Group round {round_number}/{max_rounds} completed with {len(turns)} turns")
+            self._maybe_checkpoint()
+            self._check_budget()
+            self.error_count = 0
+            
+        except Exception as e:
+            if is_fatal(e):
+                logger.error(f"LLM requests cannot succeed, stopping simulation: {str(e)}")
+                self._handle_simulation_error(f"LLM requests cannot succeed: {str(e)}")
+                return
+            
+            self.error_count += 1
+            delay = llm_rate_limiter.retry_delay(self.RETRY_DELAY)
+            logger.error(f"Error in group round {round_number} (attempt {self.error_count}): {str(e)}")
+            
+            if self.error_count >= self.max_errors or not is_retryable(e):
+                self.end_simulation("Maximum error count reached" if is_retryable(e)
+                                    else f"Group round could not be generated: {str(e)}")
+                return
+            
+            self.socketio.emit('simulation_warning', {
+                'simulation_id': self.simulation_id,
+                'message': f'Error generating group round (attempt {self.error_count})'
+            })
+        finally:
+            if self.is_running and delay:
+                eventlet.sleep(delay)
+            self._pair_finished.put(round_number)
+    
+    def _group_receiver(self, participants, turns, index):
+        """Receiver for a turn addressed to everyone: the previous speaker, else the next participant."""
+        speaker = turns[index]['speaker']
+        for previous in reversed(turns[:index]):
+            if previous['speaker'] is not speaker:
+                return previous['speaker']
+        position = participants.index(speaker)
+        return participants[(position + 1) % len(participants)]
+    
+    def _run_exchange(self, initiator, receiver):
+        """Generate a single exchange for a pair on a pool worker."""
+        pair_key = tuple(sorted([initiator.id, receiver.id]))
+        delay = 0
+        try:
+            # Validate conversation continuation
+            if not self._should_continue_conversation(initiator.id, receiver.id):
+                logger.info(f"Skipping completed conversation pair {pair_key}")
+                return
+            
+            # Generate interaction context
+            context = self._generate_interaction_context(initiator, receiver)
+            
+            # Generate interaction; retries happen inside under the shared per-exchange budget
+            generated = self._generate_interaction(initiator, receiver, context)
+            
+            # Update conversation count with validation
+            self._update_conversation_count(initiator.id, receiver.id, generated)
+            self._maybe_checkpoint()
+            self._check_budget()
+            
+            # Reset error count on successful exchange
+            if self.error_count > 0:
+                self.error_count = 0
+                
+        except Exception as e:
+            if is_fatal(e):
+                logger.error(f"LLM requests cannot succeed, stopping simulation: {str(e)}")
+                self._handle_simulation_error(f"LLM requests cannot succeed: {str(e)}")
+                return
+            abandoned = is_permanent(e)
+            if abandoned:
+                # The provider rejects this exact request; do not spend another budget on this pair
+                logger.error(f"Abandoning pair {pair_key} after the provider rejected its request: {str(e)}")
+                self.scheduler.abandon(initiator.id, receiver.id)
+            
+            self.error_count += 1
+            delay = llm_rate_limiter.retry_delay(self.RETRY_DELAY)
+            logger.error(f"Error in exchange for pair {pair_key} (attempt {self.error_count}): {str(e)}")
+            
+            if self.error_count >= self.max_errors:
+                logger.error("Maximum error count reached, stopping simulation")
+                self.end_simulation("Maximum error count reached")
+                return
+            
+            self.socketio.emit('simulation_warning', {
+                'simulation_id': self.simulation_id,
+                'message': (f'Skipping the rest of the conversation between {initiator.name} and {receiver.name}: '
+                            f'the request was rejected' if abandoned
+                            else f'Error generating interaction (attempt {self.error_count})')
+            })
+        finally:
+            # Back off this worker slot after a failure before handing the pair back
+            if self.is_running and delay:
+                eventlet.sleep(delay)
+            self.scheduler.release(initiator.id, receiver.id)
+            self._pair_finished.put(pair_key)
+    
+    def _generate_interaction(self, initiator, receiver, context):
+        """Generate, store and announce the pair's next exchange(s); returns how many were generated."""
+        with self.app.app_context():
+            depth = self.scheduler.depth(initiator.id, receiver.id)
+            max_depth = self._get_max_depth()
+            count = max(1, min(self.exchanges_per_call, max_depth - depth))
+            
+            # Emit status update
+            self.socketio.emit('generating_interaction', {
+                'simulation_id': self.simulation_id,
+                'initiator': initiator.name,
+                'receiver': receiver.name,
+                'conversation_depth': f"{depth + 1}/{max_depth}"
+            })
+            
+            # Pass simulation_id to maintain conversation context; the call is
+            # cancellable so stop/pause can abort it without paying for the result
+            on_delta = None
+            if STREAMING:
+                def on_delta(stream_id, index, text):
+                    self.socketio.emit('interaction_delta', {
+                        'simulation_id': self.simulation_id,
+                        'stream_id': stream_id,
+                        'initiator': initiator.name,
+                        'receiver': receiver.name,
+                        'conversation_depth': f"{depth + index + 1}/{max_depth}",
+                        'exchange': index,
+                        'delta': text
+                    })
+            
+            current = eventlet.getcurrent()
+            self._llm_calls.add(current)
+            try:
+                exchanges = generate_interactions(
                     initiator, 
                     receiver, 
                     context,
-                    simulation_id=self.simulation_id
+                    simulation_id=self.simulation_id,
+                    count=count,
+                    on_delta=on_delta,
+                    conflict_matrix=self.conflict_matrix,
+                    history=self.history.recent(initiator.id, receiver.id),
+                    history_summary=self.history.summary(initiator.id, receiver.id),
+                    depth=depth,
+                    max_depth=max_depth
                 )
-                
-                # Create and save interaction with enhanced data
-                interaction = Interaction()
-                interaction.simulation_id = self.simulation_id
-                interaction.initiator_id = initiator.id
-                interaction.receiver_id = receiver.id
-                interaction.content = str(interaction_data['dialogue'])
-                interaction.interaction_metadata = {
-                    'outcome': {
-                        'resolution_status': interaction_data.get('outcome', {}).get('resolution_status', 'unknown'),
-                        'agreement_level': interaction_data.get('outcome', {}).get('agreement_level', 'none'),
-                        'key_points': interaction_data.get('outcome', {}).get('key_points', []),
-                        'tension_points': interaction_data.get('outcome', {}).get('tension_points', []),
-                        'relationship_impact': interaction_data.get('outcome', {}).get('relationship_impact', 'unchanged')
-                    },
-                    'analysis': {
-                        'interaction_quality': interaction_data.get('analysis', {}).get('interaction_quality', '5'),
-                        'communication_effectiveness': interaction_data.get('analysis', {}).get('communication_effectiveness', '5'),
-                        'conflict_intensity': interaction_data.get('analysis', {}).get('conflict_intensity', '5'),
-                        'resolution_quality': interaction_data.get('analysis', {}).get('resolution_quality', '5')
-                    },
-                    'sentiment': interaction_data.get('sentiment', 'neutral')
-                }
-                
-                db.session.add(interaction)
-                db.session.commit()
-                
-                # Track conversation outcomes
-                pair_key = tuple(sorted([initiator.id, receiver.id]))
-                if not hasattr(self, 'conversation_outcomes'):
-                    self.conversation_outcomes = {}
-                
-                if pair_key not in self.conversation_outcomes:
-                    self.conversation_outcomes[pair_key] = []
-                
-                self.conversation_outcomes[pair_key].append({
-                    'depth': self.conversation_pairs.get(pair_key, 0) + 1,
-                    'outcome': interaction_data.get('outcome', {}),
-                    'analysis': interaction_data.get('analysis', {})
+            finally:
+                self._llm_calls.discard(current)
+            
+            # Buffer interactions with enhanced data for the batched writer, one row per exchange
+            timestamp = datetime.utcnow()
+            written_metadata = [build_interaction_metadata(interaction_data) for interaction_data in exchanges]
+            written = [
+                interaction_writer.add({
+                    'simulation_id': self.simulation_id,
+                    'initiator_id': initiator.id,
+                    'receiver_id': receiver.id,
+                    'content': str(interaction_data['dialogue']),
+                    'timestamp': timestamp,
+                    'interaction_metadata': metadata
                 })
+                for interaction_data, metadata in zip(exchanges, written_metadata)
+            ]
+            
+            pair_key = tuple(sorted([initiator.id, receiver.id]))
+            for offset, (interaction_data, event) in enumerate(zip(exchanges, written)):
+                # Wait for the batched commit so the pair's next exchange sees this one in its history
+                try:
+                    interaction_id = event.wait()
+                except InteractionWriteError:
+                    if offset == 0:
+                        raise
+                    # Earlier exchanges of the reply are stored; the pair continues from them
+                    logger.warning(f"Keeping {offset} of {len(exchanges)} exchanges for pair {pair_key}, "
+                                   f"the rest could not be stored")
+                    return offset
+                self.history.append(initiator, receiver, str(interaction_data['dialogue']), timestamp,
+                                    written_metadata[offset])
                 
-                # Calculate aggregate metrics for the conversation
-                current_outcomes = self.conversation_outcomes[pair_key]
-                aggregate_metrics = {
-                    'avg_interaction_quality': sum(float(o['analysis'].get('interaction_quality', 0)) 
-                                                 for o in current_outcomes) / len(current_outcomes),
-                    'positive_interactions': sum(1 for o in current_outcomes 
-                                              if o['analysis'].get('relationship_impact') == 'positive'),
-                    'resolution_rate': sum(1 for o in current_outcomes 
-                                        if o['outcome'].get('resolution_status') == 'resolved') / len(current_outcomes)
-                }
+                # Track conversation outcomes and calculate aggregate metrics for the conversation
+                aggregate_metrics = self._record_outcome(pair_key, interaction_data)
                 
                 # Emit new interaction event with enhanced data
                 self.socketio.emit('new_interaction', {
                     'simulation_id': self.simulation_id,
                     'interaction': {
+                        'id': interaction_id,
                         'initiator': initiator.name,
                         'receiver': receiver.name,
                         'content': interaction_data['dialogue'],
-                        'timestamp': interaction.timestamp.isoformat(),
+                        'timestamp': timestamp.isoformat(),
                         'sentiment': interaction_data.get('sentiment', 'neutral'),
                         'outcome': interaction_data.get('outcome', {}),
                         'analysis': interaction_data.get('analysis', {}),
-                        'conversation_depth': f"{self.conversation_pairs.get(pair_key, 0) + 1}/{self._get_max_depth()}",
+                        'conversation_depth': f"{depth + offset + 1}/{max_depth}",
                         'aggregate_metrics': aggregate_metrics
                     }
                 })
-            
-        except Exception as e:
-            logger.error(f"Error generating interaction (attempt {retry_count + 1}): {str(e)}")
-            if retry_count < self.MAX_RETRIES:
-                eventlet.sleep(self.RETRY_DELAY)
-                return self._generate_interaction_with_retry(initiator, receiver, context, retry_count + 1)
-            raise
+            return len(exchanges)
+    
+    def budget_status(self):
+        """Spent and remaining budget, or None when the simulation has no budget."""
+        if not self.budget:
+            return None
+        tokens, cost = llm_ledger.spent(self.simulation_id)
+        elapsed = (datetime.utcnow() - self.started_at).total_seconds() if self.started_at else 0.0
+        return self.budget.status(tokens, cost, elapsed, self._completed_units())
+    
+    def _check_budget(self, emit=True):
+        """Report the remaining budget and stop the simulation once a limit is reached."""
+        status = self.budget_status()
+        if status is None or not self.is_running:
+            return False
+        if emit or status['exceeded']:
+            self.socketio.emit('budget_update', {'simulation_id': self.simulation_id, **status})
+        if status['exceeded']:
+            logger.warning(f"Simulation {self.simulation_id} reached its budget: {status['exceeded']} "
+                           f"(spent {status['spent']})")
+            self.end_simulation(f"Budget limit reached ({status['exceeded']})")
+            return True
+        return False
+    
+    def _record_outcome(self, pair_key, interaction_data):
+        """Fold an exchange outcome into the pair's running aggregates and return its metrics."""
+        return record_pair_outcome(self.pair_metrics, pair_key, interaction_data)
+    
+    def _completed_units(self):
+        """Completed exchanges, or completed rounds in group mode."""
+        if self.conversation_mode == 'group':
+            return self.group_rounds
+        return self.scheduler.exchange_count if self.scheduler else 0
+    
+    def _maybe_checkpoint(self):
+        """Checkpoint when enough time or exchanges have passed since the last one."""
+        if (self._completed_units() - self._last_checkpoint_exchanges >= self.CHECKPOINT_EXCHANGES or
+                time.monotonic() - self._last_checkpoint_at >= self.CHECKPOINT_INTERVAL):
+            self.save_checkpoint()
+    
+    def save_checkpoint(self):
+        """Persist scheduler state so the simulation can resume after a process restart."""
+        if not self.is_running or self._checkpointing:
+            return
+        
+        # Capture state before any database I/O lets other workers run
+        pair_depths = self.scheduler.to_bytes() if self.scheduler else None
+        pair_metrics = {
+            key if isinstance(key, str) else f"{key[0]}-{key[1]}": dict(metrics)
+            for key, metrics in self.pair_metrics.items()
+        }
+        exchange_count = self._completed_units()
+        self._last_checkpoint_at = time.monotonic()
+        self._last_checkpoint_exchanges = exchange_count
+        
+        self._checkpointing = True
+        try:
+            with self.app.app_context():
+                checkpoint = (SimulationCheckpoint.query.filter_by(simulation_id=self.simulation_id).first()
+                              or SimulationCheckpoint(simulation_id=self.simulation_id))
+                checkpoint.persona_ids = sorted(self.personas)
+                checkpoint.conversation_depth = self.conversation_depth
+                checkpoint.conversation_mode = self.conversation_mode
+                checkpoint.exchanges_per_call = self.exchanges_per_call
+                checkpoint.cache_policy = self.cache_policy
+                checkpoint.parallelism = self.parallelism
+                checkpoint.priority = self.priority
+                checkpoint.custom_context = self.custom_context
+                checkpoint.budget = self.budget.to_dict()
+                checkpoint.pair_depths = pair_depths
+                checkpoint.pair_metrics = pair_metrics
+                checkpoint.exchange_count = exchange_count
+                checkpoint.updated_at = datetime.utcnow()
+                db.session.add(checkpoint)
+                db.session.commit()
+                logger.info(f"Checkpointed simulation {self.simulation_id} at {exchange_count} exchanges")
+        except SQLAlchemyError as e:
+            logger.error(f"Error checkpointing simulation {self.simulation_id}: {str(e)}")
+        finally:
+            self._checkpointing = False
+    
+    def _restore_checkpoint(self, checkpoint):
+        """Restore scheduler state from a checkpoint, reconciled against stored exchanges.
+
+        Must be called inside an application context.
+        """
+        if self.conversation_mode == 'group':
+            self._restore_group_checkpoint(checkpoint)
+            return
+        
+        exchange_counts = {}
+        rows = (db.session.query(Interaction.initiator_id, Interaction.receiver_id, func.count(Interaction.id))
+                .filter(Interaction.simulation_id == self.simulation_id)
+                .group_by(Interaction.initiator_id, Interaction.receiver_id))
+        for initiator_id, receiver_id, count in rows:
+            pair_key = tuple(sorted([initiator_id, receiver_id]))
+            exchange_counts[pair_key] = exchange_counts.get(pair_key, 0) + count
+        
+        self.scheduler.restore(checkpoint.get('pair_depths'), exchange_counts)
+        self.history.seed(self.simulation_id, self.personas)
+        self.pair_metrics = {
+            tuple(int(persona_id) for persona_id in key.split('-')): metrics
+            for key, metrics in (checkpoint.get('pair_metrics') or {}).items()
+        }
+        self._last_checkpoint_exchanges = self.scheduler.exchange_count
+        logger.info(f"Restored simulation {self.simulation_id} from checkpoint: "
+                   f"{self.scheduler.exchange_count} exchanges, "
+                   f"{self.scheduler.completed_count}/{self.scheduler.total_pairs} pairs complete")
+    
+    def _restore_group_checkpoint(self, checkpoint):
+        """Restore the completed round count, taking rounds stored after the checkpoint into account."""
+        rounds = checkpoint.get('exchange_count') or 0
+        last = (Interaction.query.filter_by(simulation_id=self.simulation_id)
+                .order_by(Interaction.id.desc()).first())
+        if last and last.interaction_metadata:
+            rounds = max(rounds, last.interaction_metadata.get('group_round') or 0)
+        self.group_rounds = min(rounds, self._get_max_depth())
+        self.pair_metrics = dict(checkpoint.get('pair_metrics') or {})
+        self._last_checkpoint_exchanges = self.group_rounds
+        logger.info(f"Restored group simulation {self.simulation_id} from checkpoint: "
+                   f"{self.group_rounds} rounds completed")
+    
+    def _stop_workers(self):
+        """Kill the dispatcher and pool workers, except the calling greenthread."""
+        current = eventlet.getcurrent()
+        if self.greenthread and self.greenthread is not current:
+            eventlet.kill(self.greenthread)
+        if self.pool:
+            for worker in list(self.pool.coroutines_running):
+                if worker is not current:
+                    eventlet.kill(worker)
+    
+    def pause(self):
+        """Pause dispatching and cancel in-flight LLM requests; their pairs are retried on resume."""
+        if not self.is_running or self.is_paused:
+            return False
+        
+        self.is_paused = True
+        self._resumed = Event()
+        current = eventlet.getcurrent()
+        for worker in list(self._llm_calls):
+            if worker is not current:
+                eventlet.kill(worker)
+        
+        self.save_checkpoint()
+        logger.info(f"Paused simulation {self.simulation_id}")
+        self.socketio.emit('simulation_paused', {
+            'simulation_id': self.simulation_id,
+            'status': 'paused',
+            'message': 'Simulation paused'
+        })
+        return True
+    
+    def resume(self):
+        """Resume dispatching after a pause."""
+        if not self.is_running or not self.is_paused:
+            return False
+        
+        self.is_paused = False
+        self._resumed.send()
+        
+        logger.info(f"Resumed simulation {self.simulation_id}")
+        self.socketio.emit('simulation_resumed', {
+            'simulation_id': self.simulation_id,
+            'status': 'running',
+            'message': 'Simulation resumed'
+        })
+        return True
+    
+    def get_progress(self):
+        """Summarise the live state of the simulation."""
+        progress = {
+            'simulation_id': self.simulation_id,
+            'name': self.simulation_name,
+            'status': 'paused' if self.is_paused else 'running' if self.is_running else 'stopped',
+            'conversation_depth': self.conversation_depth,
+            'conversation_mode': self.conversation_mode,
+            'exchanges_per_call': self.exchanges_per_call,
+            'cache_policy': self.cache_policy,
+            'parallelism': self.parallelism,
+            'priority': self.priority,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'error_count': self.error_count,
+            'budget': self.budget_status()
+        }
+        if self.conversation_mode == 'group':
+            max_rounds = self._get_max_depth()
+            progress.update({
+                'participants': len(self.personas),
+                'completed_rounds': self.group_rounds,
+                'target_rounds': max_rounds,
+                'progress': self.group_rounds / max_rounds * 100
+            })
+        elif self.scheduler:
+            target_exchanges = self.scheduler.total_pairs * self.scheduler.max_depth
+            progress.update({
+                'total_pairs': self.scheduler.total_pairs,
+                'started_pairs': self.scheduler.started_count,
+                'completed_pairs': self.scheduler.completed_count,
+                'abandoned_pairs': len(self.scheduler.abandoned),
+                'in_flight': len(self.scheduler.in_flight),
+                'exchanges': self.scheduler.exchange_count,
+                'target_exchanges': target_exchanges,
+                'progress': self.scheduler.exchange_count / target_exchanges * 100 if target_exchanges else 0.0
+            })
+        return progress
     
     def _handle_simulation_error(self, error_message):
         """Handle simulation errors consistently."""
         self.is_running = False
-        if self.greenthread:
-            self.greenthread.kill()
+        self._stop_workers()
+        llm_governor.forget(self.simulation_id)
+        llm_cache.forget(self.simulation_id)
+        llm_ledger.forget(self.simulation_id)
+        simulation_registry.unregister(self.simulation_id)
         
         try:
             with self.app.app_context():
                 if not self.simulation:
                     self._load_simulation()
                 
+                self.simulation = db.session.merge(self.simulation)
                 sim = self.simulation
                 sim.status = 'error'
                 db.session.commit()
@@ -470,13 +861,17 @@ class SimulationManager:
         """End simulation with proper cleanup."""
         try:
             self.is_running = False
-            if self.greenthread:
-                self.greenthread.kill()
+            self._stop_workers()
+            llm_governor.forget(self.simulation_id)
+            llm_cache.forget(self.simulation_id)
+            llm_ledger.forget(self.simulation_id)
+            simulation_registry.unregister(self.simulation_id)
             
             with self.app.app_context():
                 if not self.simulation:
                     self._load_simulation()
                     
+                self.simulation = db.session.merge(self.simulation)
                 sim = self.simulation
                 sim.status = 'completed'
                 sim.end_time = datetime.utcnow()
@@ -516,11 +911,16 @@ class SimulationManager:
             logger.error(f"Database error validating personas: {str(e)}")
             raise
             
-    def start_simulation(self, conversation_depth='medium'):
-        """Start the simulation with improved error handling."""
+    def start_simulation(self, conversation_depth=None, checkpoint=None):
+        """Start the simulation with improved error handling.
+
+        When `checkpoint` (a dict of SimulationCheckpoint fields) is given, the
+        simulation resumes from it instead of starting from scratch.
+        """
         try:
-            # Set conversation depth
-            self.conversation_depth = conversation_depth
+            # Override conversation depth only when explicitly requested
+            if conversation_depth is not None:
+                self.conversation_depth = conversation_depth
             
             # Validate simulation state
             if self.is_running:
@@ -532,13 +932,32 @@ class SimulationManager:
             with self.app.app_context():
                 if not self.simulation:
                     self._load_simulation()
+                
+                # Snapshot personas and scenario once, then build the pair scheduler for the roster
+                self._load_snapshots()
+                if self.conversation_mode == 'pairwise':
+                    self.scheduler = PairScheduler(self.personas.keys(), self._get_max_depth())
+                    self.history.clear()
+                llm_governor.set_weight(self.simulation_id, self.priority)
+                llm_cache.set_policy(self.simulation_id, self.cache_policy)
+                if checkpoint is not None:
+                    self._restore_checkpoint(checkpoint)
+                if self.budget:
+                    # Count what earlier runs of a resumed simulation already spent
+                    spent = llm_ledger.totals(self.simulation_id) if checkpoint is not None else None
+                    llm_ledger.track(self.simulation_id, *((spent['total_tokens'], spent['cost']) if spent else ()))
                     
                 # Update simulation state
+                self.simulation = db.session.merge(self.simulation)
                 sim = self.simulation
                 sim.status = 'running'
-                sim.start_time = datetime.utcnow()
+                if checkpoint is None or not sim.start_time:
+                    sim.start_time = datetime.utcnow()
                 db.session.commit()
+                self.started_at = sim.start_time
                 self.is_running = True
+                simulation_registry.register(self)
+                self.save_checkpoint()
                 
                 logger.info(f"Starting simulation: {sim.name} (ID: {self.simulation_id})")
                 
@@ -546,8 +965,10 @@ class SimulationManager:
                 self.socketio.emit('simulation_started', {
                     'simulation_id': self.simulation_id,
                     'status': 'running',
-                    'message': 'Simulation started successfully',
-                    'conversation_depth': self.conversation_depth
+                    'message': ('Simulation resumed from checkpoint' if checkpoint is not None
+                                else 'Simulation started successfully'),
+                    'conversation_depth': self.conversation_depth,
+                    'conversation_mode': self.conversation_mode
                 })
                 
                 # Start interaction loop
@@ -563,44 +984,93 @@ class SimulationManager:
             logger.error(f"Unexpected error starting simulation: {str(e)}")
             self._handle_simulation_error("Unexpected error occurred")
     
+    def _load_snapshots(self):
+        """Load session-detached persona and scenario snapshots for the hot loop.
+
+        Must be called inside an application context.
+        """
+        self.simulation = db.session.merge(self.simulation)
+        self.simulation_name = self.simulation.name
+        scenario = self.simulation.scenario
+        self.scenario = ScenarioSnapshot.from_model(scenario) if scenario else None
+        
+        personas = (
+            Persona.query.filter(Persona.id.in_(self.selected_persona_ids)).all()
+            if self.selected_persona_ids
+            else Persona.query.all()
+        )
+        self.personas = {persona.id: PersonaSnapshot.from_model(persona) for persona in personas}
+        self.conflict_matrix = ConflictMatrix(self.personas.values())
+        logger.info(f"Loaded {len(self.personas)} persona snapshots for simulation {self.simulation_id}")
+    
     def _generate_interaction_context(self, initiator, receiver):
         """Generate context for interaction based on scenario and custom context."""
-        with self.app.app_context():
-            # Refresh simulation object to ensure it's bound to session
-            self.simulation = db.session.merge(self.simulation)
-            scenario = self.simulation.scenario
-            
-            if not scenario:
-                base_context = f"Current simulation: {self.simulation.name}"
-            else:
-                base_context = f"Scenario: {scenario.name}\n{scenario.context}\n"
-                
-            # Add custom context if available
-            if self.custom_context:
-                base_context = f"{base_context}\nCustom Context:\n{self.custom_context}"
-                
-            return f"{base_context}\nCurrent simulation: {self.simulation.name}"
-
-    def _select_conversation_pair(self, personas):
-        # Create all possible pairs
-        possible_pairs = []
-        for i in range(len(personas)):
-            for j in range(i + 1, len(personas)):
-                pair_key = tuple(sorted([personas[i].id, personas[j].id]))
-                if pair_key not in self.completed_pairs:
-                    # Prioritize ongoing conversations that haven't reached max depth
-                    current_depth = self.conversation_pairs.get(pair_key, 0)
-                    max_depth = self._get_max_depth()
-                    if current_depth < max_depth:
-                        possible_pairs.append((personas[i], personas[j], current_depth))
+        return build_interaction_context(self.simulation_name, self.scenario, self.custom_context)
 
-        if not possible_pairs:
+    def _select_conversation_pair(self, personas_by_id):
+        """Take the next idle pair from the scheduler and resolve it to persona objects."""
+        pair = self.scheduler.acquire()
+        if pair is None:
             logger.info("No available conversation pairs found")
             return None, None
-
-        # Sort pairs by current depth (prioritize ongoing conversations)
-        possible_pairs.sort(key=lambda x: (-x[2] if x[2] > 0 else float('-inf')))
-        initiator, receiver, _ = possible_pairs[0]
         
+        initiator_id, receiver_id = pair
+        if initiator_id not in personas_by_id or receiver_id not in personas_by_id:
+            self.scheduler.release(initiator_id, receiver_id)
+            raise ValueError(f"Persona pair {pair} is no longer available")
+        
+        initiator, receiver = personas_by_id[initiator_id], personas_by_id[receiver_id]
         logger.info(f"Selected conversation pair: {initiator.name} and {receiver.name}")
-        return initiator, receiver
\ No newline at end of file
+        return initiator, receiver
+
+
+def resume_running_simulations(app, socketio):
+    """Resume simulations left in 'running' status by a previous process from their checkpoints."""
+    with app.app_context():
+        checkpoints = []
+        for simulation in Simulation.query.filter_by(status='running').all():
+            if simulation_registry.get(simulation.id):
+                continue
+            if ExchangeJob.query.filter_by(simulation_id=simulation.id).first():
+                continue  # Run by distributed workers, which pick up where they left off
+            checkpoint = simulation.checkpoint
+            if not checkpoint:
+                logger.warning(f"Simulation {simulation.id} was left running without a checkpoint, "
+                               f"cannot resume")
+                continue
+            checkpoints.append({
+                'simulation_id': simulation.id,
+                'persona_ids': checkpoint.persona_ids,
+                'conversation_depth': checkpoint.conversation_depth,
+                'conversation_mode': checkpoint.conversation_mode or 'pairwise',
+                'exchanges_per_call': checkpoint.exchanges_per_call or 1,
+                'cache_policy': checkpoint.cache_policy,
+                'parallelism': checkpoint.parallelism,
+                'priority': checkpoint.priority,
+                'custom_context': checkpoint.custom_context,
+                'budget': checkpoint.budget,
+                'pair_depths': checkpoint.pair_depths,
+                'pair_metrics': checkpoint.pair_metrics,
+                'exchange_count': checkpoint.exchange_count
+            })
+    
+    for checkpoint in checkpoints:
+        try:
+            manager = SimulationManager(
+                checkpoint['simulation_id'],
+                persona_ids=checkpoint['persona_ids'],
+                socketio=socketio,
+                app=app,
+                conversation_depth=checkpoint['conversation_depth'],
+                parallelism=checkpoint['parallelism'],
+                priority=checkpoint['priority'],
+                conversation_mode=checkpoint['conversation_mode'],
+                exchanges_per_call=checkpoint['exchanges_per_call'],
+                cache_policy=checkpoint['cache_policy'],
+                budget=checkpoint['budget']
+            )
+            manager.custom_context = checkpoint['custom_context']
+            manager.start_simulation(checkpoint=checkpoint)
+            logger.info(f"Resumed simulation {checkpoint['simulation_id']} from checkpoint")
+        except Exception as e:
+            logger.error(f"Error resuming simulation {checkpoint['simulation_id']}: {str(e)}")
@@ -0,0 +1,34 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationRegistry:
+    """In-process registry of live SimulationManager instances keyed by simulation id.
+
+    Routes use it to reach the greenthreads of a running simulation instead of
+    building a fresh manager that has no handle on them.
+    """
+
+    def __init__(self):
+        self._managers = {}
+
+    def register(self, manager):
+        self._managers[manager.simulation_id] = manager
+        logger.info(f"Registered live simulation {manager.simulation_id}")
+
+    def unregister(self, simulation_id):
+        if self._managers.pop(simulation_id, None) is not None:
+            logger.info(f"Unregistered simulation {simulation_id}")
+
+    def get(self, simulation_id):
+        return self._managers.get(simulation_id)
+
+    def list(self):
+        return list(self._managers.values())
+
+    def __len__(self):
+        return len(self._managers)
+
+
+simulation_registry = SimulationRegistry()
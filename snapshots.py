@@ -0,0 +1,44 @@
+from models import Persona, Scenario
+
+PERSONA_FIELDS = tuple(column.key for column in Persona.__table__.columns)
+SCENARIO_FIELDS = tuple(column.key for column in Scenario.__table__.columns)
+
+
+class _Snapshot:
+    """Immutable, session-detached copy of a model row.
+
+    Snapshots are plain value objects: reading an attribute never touches the
+    database session, and they can be shared freely between greenthreads.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, **values):
+        for field in self._fields:
+            object.__setattr__(self, field, values.get(field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} id={self.id}>"
+
+    @classmethod
+    def from_model(cls, instance):
+        return cls(**{field: getattr(instance, field) for field in cls._fields})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self._fields}
+
+
+class PersonaSnapshot(_Snapshot):
+    __slots__ = PERSONA_FIELDS
+    _fields = PERSONA_FIELDS
+
+
+class ScenarioSnapshot(_Snapshot):
+    __slots__ = SCENARIO_FIELDS
+    _fields = SCENARIO_FIELDS
@@ -414,6 +414,110 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    function readBudget() {
+        const budgetValue = id => parseFloat(document.getElementById(id)?.value) || null;
+        const maxMinutes = budgetValue('budget-max-minutes');
+        return {
+            max_cost: budgetValue('budget-max-cost'),
+            max_tokens: budgetValue('budget-max-tokens'),
+            max_seconds: maxMinutes ? maxMinutes * 60 : null,
+            max_exchanges: budgetValue('budget-max-exchanges')
+        };
+    }
+
+    function formatDuration(seconds) {
+        if (seconds < 60) return `${Math.round(seconds)} s`;
+        if (seconds < 3600) return `${Math.round(seconds / 60)} min`;
+        const hours = Math.floor(seconds / 3600);
+        return `${hours} h ${Math.round((seconds % 3600) / 60)} min`;
+    }
+
+    const bottleneckLabels = {
+        'latency': 'LLM response time',
+        'requests_per_minute': 'requests-per-minute limit',
+        'tokens_per_minute': 'tokens-per-minute limit'
+    };
+    let estimateTimer = null;
+
+    function renderEstimate(estimate) {
+        const estimateBox = document.getElementById('simulation-estimate');
+        const warning = document.getElementById('estimate-warning');
+        if (!estimateBox) return;
+
+        document.getElementById('estimate-exchanges').textContent = estimate.exchanges.toLocaleString();
+        document.getElementById('estimate-calls').textContent = estimate.calls.toLocaleString();
+        document.getElementById('estimate-tokens').textContent = estimate.total_tokens.toLocaleString();
+        document.getElementById('estimate-cost').textContent =
+            estimate.cost !== null ? `$${estimate.cost.toFixed(2)}` : 'unpriced model';
+        document.getElementById('estimate-duration').textContent = estimate.bottleneck
+            ? `${formatDuration(estimate.seconds)} (bound by ${bottleneckLabels[estimate.bottleneck] || estimate.bottleneck}, ` +
+              `${estimate.concurrency} concurrent)`
+            : '-';
+
+        const warnings = [];
+        if (estimate.budget_violations.length) {
+            warnings.push(`Exceeds budget: ${estimate.budget_violations.join('; ')}`);
+        }
+        if (estimate.seconds > 86400) {
+            warnings.push('Expected to run for more than a day');
+        }
+        if (warning) {
+            warning.textContent = warnings.join('. ');
+            warning.style.display = warnings.length ? 'block' : 'none';
+        }
+        estimateBox.style.display = 'block';
+    }
+
+    function updateEstimate() {
+        // Debounced so typing in the numeric fields does not send a request per keystroke
+        clearTimeout(estimateTimer);
+        estimateTimer = setTimeout(function() {
+            const selectedPersonas = Array.from(document.querySelectorAll('.persona-checkbox:checked'))
+                .map(checkbox => parseInt(checkbox.value));
+            const estimateBox = document.getElementById('simulation-estimate');
+            if (selectedPersonas.length < 2) {
+                if (estimateBox) estimateBox.style.display = 'none';
+                return;
+            }
+
+            fetch('/simulation/estimate', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    scenario_id: parseInt(scenarioSelect?.value) || null,
+                    personas: selectedPersonas,
+                    custom_context: customContextInput?.value,
+                    conversation_depth: conversationDepthSelect?.value || 'medium',
+                    conversation_mode: document.getElementById('conversation-mode')?.value || 'pairwise',
+                    exchanges_per_call: parseInt(document.getElementById('exchanges-per-call')?.value) || 1,
+                    parallelism: parseInt(document.getElementById('parallelism')?.value) || 1,
+                    budget: readBudget()
+                })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                renderEstimate(data);
+            })
+            .catch(error => {
+                console.error('Error estimating simulation:', error);
+            });
+        }, 400);
+    }
+
+    ['conversation-depth', 'conversation-mode', 'exchanges-per-call', 'parallelism', 'scenario',
+     'budget-max-cost', 'budget-max-tokens', 'budget-max-minutes', 'budget-max-exchanges'].forEach(id => {
+        const input = document.getElementById(id);
+        if (input) input.addEventListener('change', updateEstimate);
+    });
+    document.querySelectorAll('.persona-checkbox').forEach(checkbox => {
+        checkbox.addEventListener('change', updateEstimate);
+    });
+
     if (scenarioSelect) {
         scenarioSelect.addEventListener('change', function() {
             const selectedOption = this.options[this.selectedIndex];
@@ -434,6 +538,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     checkbox.checked = !checkbox.checked;
                     updateParticipantCount();
                     updatePersonaPreviews();
+                    updateEstimate();
                 }
             }
         });
@@ -455,6 +560,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 .map(checkbox => parseInt(checkbox.value));
             const customContext = customContextInput?.value;
             const conversationDepth = conversationDepthSelect?.value || 'medium';
+            const parallelism = parseInt(document.getElementById('parallelism')?.value) || 1;
+            const priority = parseInt(document.getElementById('priority')?.value) || 1;
+            const conversationMode = document.getElementById('conversation-mode')?.value || 'pairwise';
+            const exchangesPerCall = parseInt(document.getElementById('exchanges-per-call')?.value) || 1;
+            const cachePolicy = document.getElementById('cache-policy')?.value || 'bypass';
+            const budget = readBudget();
             
             if (name && scenarioId && updateParticipantCount()) {
                 showLoading(true);
@@ -476,7 +587,13 @@ document.addEventListener('DOMContentLoaded', function() {
                         scenario_id: parseInt(scenarioId),
                         personas: selectedPersonas,
                         custom_context: combinedContext,
-                        conversation_depth: conversationDepth  // Include conversation depth in request
+                        conversation_depth: conversationDepth,  // Include conversation depth in request
+                        parallelism: parallelism,
+                        priority: priority,
+                        conversation_mode: conversationMode,
+                        exchanges_per_call: exchangesPerCall,
+                        cache_policy: cachePolicy,
+                        budget: budget
                     })
                 })
                 .then(response => response.json())
@@ -50,8 +50,66 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    // Preview exchanges while their dialogue streams in; the scored interaction replaces them
+    function streamKey(initiator, receiver) {
+        return `${initiator}\u0000${receiver}`;
+    }
+
+    socket.on('interaction_delta', function(data) {
+        const streamingFeed = document.getElementById('streaming-feed');
+        if (!streamingFeed) return;
+
+        const key = streamKey(data.initiator, data.receiver);
+        // A new stream for the pair means the previous attempt failed; drop its partial text
+        streamingFeed.querySelectorAll('.interaction-item').forEach(function(element) {
+            if (element.dataset.streamKey === key && element.dataset.streamId !== data.stream_id) {
+                element.remove();
+            }
+        });
+
+        let preview = Array.from(streamingFeed.children).find(function(element) {
+            return element.dataset.streamId === data.stream_id && element.dataset.exchange === String(data.exchange);
+        });
+        if (!preview) {
+            preview = document.createElement('div');
+            preview.className = 'interaction-item mb-3';
+            preview.dataset.streamKey = key;
+            preview.dataset.streamId = data.stream_id;
+            preview.dataset.exchange = String(data.exchange);
+
+            const headerDiv = document.createElement('div');
+            headerDiv.className = 'd-flex justify-content-between align-items-start mb-2';
+            const participantsSpan = document.createElement('span');
+            participantsSpan.className = 'fw-bold';
+            participantsSpan.textContent = `${data.initiator} → ${data.receiver}`;
+            const depthBadge = document.createElement('span');
+            depthBadge.className = 'badge bg-secondary';
+            depthBadge.textContent = `Generating ${data.conversation_depth}`;
+            headerDiv.appendChild(participantsSpan);
+            headerDiv.appendChild(depthBadge);
+
+            const contentDiv = document.createElement('div');
+            contentDiv.className = 'interaction-content';
+
+            preview.appendChild(headerDiv);
+            preview.appendChild(contentDiv);
+            streamingFeed.appendChild(preview);
+        }
+        preview.querySelector('.interaction-content').textContent += data.delta;
+    });
+
     socket.on('new_interaction', function(data) {
         const interaction = data.interaction;
+
+        // Exchanges are announced in order, so the pair's first preview is the one completed
+        const streamingFeed = document.getElementById('streaming-feed');
+        if (streamingFeed) {
+            const key = streamKey(interaction.initiator, interaction.receiver);
+            const preview = Array.from(streamingFeed.children).find(function(element) {
+                return element.dataset.streamKey === key;
+            });
+            if (preview) preview.remove();
+        }
         
         // Update conversation depth display
         if (interaction.conversation_depth) {
@@ -84,6 +142,35 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    socket.on('budget_update', function(data) {
+        const budgetStatus = document.getElementById('budget-status');
+        if (!budgetStatus) return;
+        const remaining = data.remaining || {};
+        const parts = [];
+        if ('cost' in remaining) parts.push(`$${remaining.cost.toFixed(2)} left`);
+        if ('tokens' in remaining) parts.push(`${Math.round(remaining.tokens).toLocaleString()} tokens left`);
+        if ('seconds' in remaining) parts.push(`${Math.ceil(remaining.seconds / 60)} min left`);
+        if ('exchanges' in remaining) parts.push(`${Math.round(remaining.exchanges)} exchanges left`);
+        budgetStatus.style.display = 'block';
+        budgetStatus.className = `small mt-2 ${data.exceeded ? 'text-danger' : 'text-muted'}`;
+        budgetStatus.textContent = `Budget: ${parts.join(', ')} (spent $${data.spent.cost.toFixed(2)}, ` +
+            `${data.spent.tokens.toLocaleString()} tokens)`;
+    });
+    
+    socket.on('simulation_paused', function(data) {
+        if (document.getElementById('simulation-status')) {
+            document.getElementById('simulation-status').className = 'alert alert-warning';
+            document.getElementById('simulation-status').textContent = data.message;
+        }
+    });
+    
+    socket.on('simulation_resumed', function(data) {
+        if (document.getElementById('simulation-status')) {
+            document.getElementById('simulation-status').className = 'alert alert-info';
+            document.getElementById('simulation-status').textContent = data.message;
+        }
+    });
+    
     socket.on('simulation_ended', function(data) {
         console.log('Simulation ended:', data);
         if (document.getElementById('simulation-status')) {
@@ -0,0 +1,123 @@
+_END = object()  # Marks the closing quote of a string
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class DialogueStreamParser:
+    """Incremental JSON scanner that yields the text of `field` string values as it arrives.
+
+    Feed it the streamed completion chunk by chunk; `feed` returns a list of
+    (index, text) pieces, where `index` counts the matching values seen so far,
+    i.e. the exchange number in an {"exchanges": [...]} response. Only `field`
+    keys of an exchange object count: the top-level object, or an object
+    directly inside the top-level `list_field` array; a nested
+    {"outcome": {"dialogue": ...}} is ignored. The scanner only tracks
+    strings, keys and nesting, so it never has to buffer more than an
+    unfinished escape sequence; the complete text is still parsed with
+    json.loads once the stream ends.
+    """
+
+    def __init__(self, field='dialogue', list_field='exchanges'):
+        self.field = field
+        self.list_field = list_field
+        self.index = -1
+        self._stack = []  # '{' or '[' for each open container
+        self._keys = []  # Key each open container is the value of (None for the root and array items)
+        self._expect_key = False
+        self._in_string = False
+        self._is_key = False
+        self._capturing = False
+        self._escape = None  # None, '' after a backslash, or the \\u digits collected so far
+        self._key = []
+        self._last_key = None
+        self._high_surrogate = None
+
+    def feed(self, text):
+        pieces = []
+        captured = []
+        for char in text:
+            if self._in_string:
+                decoded = self._string_char(char)
+                if decoded is None:
+                    continue
+                if decoded is _END:
+                    if captured:
+                        pieces.append((self.index, ''.join(captured)))
+                        captured = []
+                    continue
+                if self._is_key:
+                    self._key.append(decoded)
+                elif self._capturing:
+                    captured.append(decoded)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._is_key = bool(self._stack) and self._stack[-1] == '{' and self._expect_key
+                if self._is_key:
+                    self._key = []
+                else:
+                    self._capturing = self._last_key == self.field and self._at_exchange_level()
+                    if self._capturing:
+                        self.index += 1
+            elif char in '{[':
+                self._keys.append(self._last_key if self._stack[-1:] == ['{'] else None)
+                self._stack.append(char)
+                self._expect_key = char == '{'
+                self._last_key = None
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                    self._keys.pop()
+                self._expect_key = False
+            elif char == ',':
+                self._expect_key = self._stack[-1:] == ['{']
+                self._last_key = None
+            elif char == ':':
+                self._expect_key = False
+
+        if captured:
+            pieces.append((self.index, ''.join(captured)))
+        return pieces
+
+    def _at_exchange_level(self):
+        if self._stack == ['{']:
+            return True
+        return self._stack == ['{', '[', '{'] and self._keys[1] == self.list_field
+
+    def _string_char(self, char):
+        """Decode one character inside a string; None while an escape is incomplete."""
+        if self._escape is None:
+            if char == '\\':
+                self._escape = ''
+                return None
+            if char == '"':
+                self._in_string = False
+                if self._is_key:
+                    self._last_key = ''.join(self._key)
+                self._capturing = False
+                return _END
+            return char
+
+        if self._escape == '':
+            if char == 'u':
+                self._escape = 'u'
+                return None
+            self._escape = None
+            return _ESCAPES.get(char, char)
+
+        self._escape += char
+        if len(self._escape) < 5:
+            return None
+        digits, self._escape = self._escape[1:], None
+        try:
+            code = int(digits, 16)
+        except ValueError:
+            return ''
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return None
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
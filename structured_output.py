@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# json_schema: strict response_format (models with structured outputs, e.g. gpt-4o)
+# tools: a forced function call whose parameters are the schema (any tool-calling model, incl. gpt-4)
+# text: free-form JSON described in the prompt only (default; works with every compatible endpoint)
+OUTPUT_MODE = os.environ.get("LLM_OUTPUT_MODE", "text")
+
+SENTIMENT = {"type": "string", "enum": ["positive", "neutral", "negative"]}
+SCORE = {"type": "integer", "description": "1-10 score"}
+OUTCOME_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "resolution_status": {"type": "string", "enum": ["resolved", "partially_resolved", "unresolved"]},
+        "agreement_level": {"type": "string", "enum": ["full", "partial", "none"]},
+        "key_points": {"type": "array", "items": {"type": "string"}},
+        "tension_points": {"type": "array", "items": {"type": "string"}},
+        "relationship_impact": {"type": "string", "enum": ["strengthened", "strained", "unchanged"]}
+    },
+    "required": ["resolution_status", "agreement_level", "key_points", "tension_points", "relationship_impact"],
+    "additionalProperties": False
+}
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "interaction_quality": SCORE,
+        "communication_effectiveness": SCORE,
+        "conflict_intensity": SCORE,
+        "resolution_quality": SCORE
+    },
+    "required": ["interaction_quality", "communication_effectiveness", "conflict_intensity", "resolution_quality"],
+    "additionalProperties": False
+}
+EXCHANGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "dialogue": {"type": "string", "description": "One line per message, formatted as 'Name: Message'"},
+        "sentiment": SENTIMENT,
+        "outcome": OUTCOME_SCHEMA,
+        "analysis": ANALYSIS_SCHEMA
+    },
+    "required": ["dialogue", "sentiment", "outcome", "analysis"],
+    "additionalProperties": False
+}
+EXCHANGES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "exchanges": {"type": "array", "items": EXCHANGE_SCHEMA}
+    },
+    "required": ["exchanges"],
+    "additionalProperties": False
+}
+GROUP_ROUND_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "turns": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "speaker": {"type": "string"},
+                    "addressee": {"type": "string", "description": "Participant name, or everyone"},
+                    "message": {"type": "string"},
+                    "sentiment": SENTIMENT
+                },
+                "required": ["speaker", "addressee", "message", "sentiment"],
+                "additionalProperties": False
+            }
+        },
+        "sentiment": SENTIMENT,
+        "outcome": OUTCOME_SCHEMA,
+        "analysis": ANALYSIS_SCHEMA
+    },
+    "required": ["turns", "sentiment", "outcome", "analysis"],
+    "additionalProperties": False
+}
+
+_CODE_FENCE = re.compile(r'^```[a-zA-Z]*\s*|\s*```$')
+
+
+def repair_json(text):
+    """Best-effort fix of near-valid JSON; returns the repaired text.
+
+    Handles markdown code fences, prose around the object, raw newlines and
+    tabs inside strings, trailing commas, and output truncated mid-object
+    (open strings and containers are closed).
+    """
+    text = _CODE_FENCE.sub('', text.strip())
+    start = text.find('{')
+    if start == -1:
+        return text
+    end = text.rfind('}')
+    # Keep everything after the first brace when the output was cut off before closing
+    text = text[start:end + 1] if end > start and text.count('{') <= text.count('}') else text[start:]
+
+    repaired = []
+    stack = []
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == '\n':
+                char = '\\n'
+            elif char == '\t':
+                char = '\\t'
+            repaired.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            # Drop a trailing comma before the container closes
+            while repaired and repaired[-1].isspace():
+                repaired.pop()
+            if repaired and repaired[-1] == ',':
+                repaired.pop()
+            if stack:
+                stack.pop()
+        repaired.append(char)
+
+    if in_string:
+        if escape:
+            repaired.pop()
+        repaired.append('"')
+    while stack:
+        while repaired and (repaired[-1].isspace() or repaired[-1] in ',:'):
+            repaired.pop()
+        repaired.append(stack.pop())
+    return ''.join(repaired)
+
+
+class ResponseParser:
+    """Requests schema-constrained output and parses it, repairing near-valid JSON.
+
+    Every reply that fails `json.loads` is counted; repaired ones are used as-is
+    instead of paying for a regeneration, and only unrepairable ones raise.
+    """
+    MODES = ('json_schema', 'tools', 'text')
+
+    def __init__(self, mode=OUTPUT_MODE):
+        if mode not in self.MODES:
+            logger.warning(f"Unknown LLM output mode '{mode}', using 'text'")
+            mode = 'text'
+        self.mode = mode
+        self.stats = {
+            'parsed': 0,
+            'parse_failures': 0,
+            'repaired': 0,
+            'unrepairable': 0
+        }
+
+    def request_options(self, name, schema, description=""):
+        """Extra chat.completions arguments that constrain the reply to `schema`."""
+        if self.mode == 'json_schema':
+            return {
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": {"name": name, "strict": True, "schema": schema}
+                }
+            }
+        if self.mode == 'tools':
+            return {
+                "tools": [{
+                    "type": "function",
+                    "function": {"name": name, "description": description, "parameters": schema}
+                }],
+                "tool_choice": {"type": "function", "function": {"name": name}}
+            }
+        return {}
+
+    def parse(self, text):
+        """Parse a JSON reply, falling back to `repair_json`; raises the original error if that fails too."""
+        return self.parse_reply(text)[0]
+
+    def parse_reply(self, text):
+        """Like `parse`, but returns (data, repaired) so callers can tell a repaired reply from a clean one."""
+        try:
+            data = json.loads(text)
+            self.stats['parsed'] += 1
+            return data, False
+        except json.JSONDecodeError as e:
+            self.stats['parse_failures'] += 1
+            error = e
+
+        try:
+            data = json.loads(repair_json(text))
+        except json.JSONDecodeError:
+            self.stats['unrepairable'] += 1
+            logger.error(f"JSON parsing error: {str(error)}\nResponse text: {text}")
+            raise error
+        self.stats['repaired'] += 1
+        self.stats['parsed'] += 1
+        logger.warning(f"Repaired malformed JSON reply ({str(error)})")
+        return data, True
+
+    def get_stats(self):
+        attempts = self.stats['parsed'] + self.stats['unrepairable']
+        return {
+            **self.stats,
+            'mode': self.mode,
+            'failure_rate': self.stats['parse_failures'] / attempts if attempts else 0.0
+        }
+
+
+response_parser = ResponseParser()
@@ -0,0 +1,388 @@
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import re
+import json
+import time
+import uuid
+import random
+import logging
+import argparse
+from eventlet import wsgi
+from flask import Flask, Response, request, jsonify
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LATENCY_MS = float(os.environ.get("STUB_LLM_LATENCY_MS", 800))  # median response time
+LATENCY_SIGMA = float(os.environ.get("STUB_LLM_LATENCY_SIGMA", 0.5))  # lognormal spread, 0 for fixed
+RATE_LIMIT_RATE = float(os.environ.get("STUB_LLM_RATE_LIMIT_RATE", 0.0))  # chance a request starts a 429 burst
+RATE_LIMIT_BURST = float(os.environ.get("STUB_LLM_RATE_LIMIT_BURST", 5.0))  # seconds every request gets 429
+SERVER_ERROR_RATE = float(os.environ.get("STUB_LLM_SERVER_ERROR_RATE", 0.0))  # chance of a 500
+MALFORMED_RATE = float(os.environ.get("STUB_LLM_MALFORMED_RATE", 0.0))  # chance of a formatting glitch
+COMPLETION_TOKENS = int(os.environ.get("STUB_LLM_COMPLETION_TOKENS", 350))  # reported per exchange
+STREAM_CHUNK_CHARS = 16  # characters per streamed chunk
+FIRST_TOKEN_SHARE = 0.3  # share of the latency spent before the first streamed chunk
+
+PERSONA_ROLES = ('Initiator', 'Receiver', 'Participant')
+SENTIMENTS = ('positive', 'neutral', 'negative')
+RESOLUTIONS = ('resolved', 'partially_resolved', 'unresolved')
+AGREEMENTS = ('full', 'partial', 'none')
+IMPACTS = ('strengthened', 'unchanged', 'strained')
+
+
+def parse_personas(prompt):
+    """Read the persona blocks ("Initiator: name" followed by "Field: value" lines) from a prompt."""
+    personas = []
+    current = None
+    for line in prompt.splitlines():
+        line = line.strip()
+        if not line:
+            current = None
+            continue
+        field, _, value = line.partition(': ')
+        if field in PERSONA_ROLES:
+            current = {'role': field, 'name': value.strip()}
+            personas.append(current)
+        elif current is not None and value:
+            current[field.lower().replace(' ', '_')] = value.strip()
+    return personas
+
+
+def parse_conflicts(prompt):
+    """Bullet lines under "Identified Potential Conflicts:"."""
+    _, _, section = prompt.partition('Identified Potential Conflicts:')
+    conflicts = []
+    for line in section.splitlines()[1:]:
+        line = line.strip()
+        if not line.startswith('- '):
+            if conflicts or line:
+                break
+            continue
+        if line != '- None identified':
+            conflicts.append(line[2:])
+    return conflicts
+
+
+def first_item(value, default):
+    items = [item.strip() for item in (value or '').split(',') if item.strip()]
+    return items[0] if items else default
+
+
+class StubProfile:
+    """Latency, failure and token-count behaviour of the stub provider."""
+
+    def __init__(self, latency_ms=LATENCY_MS, latency_sigma=LATENCY_SIGMA, rate_limit_rate=RATE_LIMIT_RATE,
+                 rate_limit_burst=RATE_LIMIT_BURST, server_error_rate=SERVER_ERROR_RATE,
+                 malformed_rate=MALFORMED_RATE, completion_tokens=COMPLETION_TOKENS, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_burst = rate_limit_burst
+        self.server_error_rate = server_error_rate
+        self.malformed_rate = malformed_rate
+        self.completion_tokens = completion_tokens
+        self.random = random.Random(seed)
+        self.burst_until = 0.0
+        self.stats = {
+            'requests': 0,
+            'completed': 0,
+            'rate_limited': 0,
+            'server_errors': 0,
+            'malformed': 0
+        }
+
+    def latency(self):
+        """Seconds to hold the response, lognormal around the median."""
+        if self.latency_sigma <= 0:
+            return self.latency_ms / 1000
+        return self.random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000
+
+    def rate_limited_for(self):
+        """Seconds left in the current 429 burst, possibly starting a new one."""
+        now = time.monotonic()
+        if now >= self.burst_until and self.random.random() < self.rate_limit_rate:
+            self.burst_until = now + self.rate_limit_burst
+            logger.info(f"Starting {self.rate_limit_burst:.1f}s rate limit burst")
+        return max(0.0, self.burst_until - now)
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'latency_ms': self.latency_ms,
+            'latency_sigma': self.latency_sigma,
+            'rate_limit_rate': self.rate_limit_rate,
+            'server_error_rate': self.server_error_rate,
+            'malformed_rate': self.malformed_rate
+        }
+
+
+profile = StubProfile(seed=os.environ.get("STUB_LLM_SEED"))
+
+
+def build_exchange(initiator, receiver, conflicts, rng):
+    """One schema-valid exchange voiced from the two personas' fields."""
+    tension = len(conflicts) + rng.randint(0, 2)
+    sentiment = SENTIMENTS[min(2, tension // 2)]
+    interest = first_item(initiator.get('interests'), 'our work')
+    goal = first_item(receiver.get('goals'), 'making progress')
+    dialogue = (f"{initiator['name']}: I'd like to talk about {interest}, "
+                f"in my usual {initiator.get('interaction_style', 'neutral')} way.\n"
+                f"{receiver['name']}: Happy to, as long as it helps with {goal.lower()}.")
+    return {
+        'dialogue': dialogue,
+        'sentiment': sentiment,
+        'outcome': {
+            'resolution_status': RESOLUTIONS[min(2, tension // 2)],
+            'agreement_level': AGREEMENTS[min(2, tension // 2)],
+            'key_points': [interest, goal],
+            'tension_points': conflicts[:2],
+            'relationship_impact': IMPACTS[min(2, tension // 2)]
+        },
+        'analysis': {
+            'interaction_quality': rng.randint(5, 9),
+            'communication_effectiveness': rng.randint(4, 9),
+            'conflict_intensity': min(10, 2 + 2 * tension),
+            'resolution_quality': rng.randint(3, 8)
+        }
+    }
+
+
+def build_group_round(participants, conflicts, rng):
+    """One schema-valid group round in which every participant speaks once."""
+    tension = min(2, (len(conflicts) + rng.randint(0, 2)) // max(1, len(participants)))
+    turns = []
+    for index, speaker in enumerate(participants):
+        addressee = participants[index - 1]['name'] if index else 'everyone'
+        turns.append({
+            'speaker': speaker['name'],
+            'addressee': addressee,
+            'message': f"From where I stand, {first_item(speaker.get('goals'), 'progress').lower()} comes first.",
+            'sentiment': SENTIMENTS[rng.randint(0, 2)]
+        })
+    return {
+        'turns': turns,
+        'sentiment': SENTIMENTS[tension],
+        'outcome': {
+            'resolution_status': RESOLUTIONS[tension],
+            'agreement_level': AGREEMENTS[tension],
+            'key_points': [first_item(participant.get('interests'), 'the agenda') for participant in participants[:3]],
+            'tension_points': conflicts[:3],
+            'relationship_impact': IMPACTS[tension]
+        },
+        'analysis': {
+            'interaction_quality': rng.randint(5, 9),
+            'communication_effectiveness': rng.randint(4, 9),
+            'conflict_intensity': min(10, 2 + 3 * tension),
+            'resolution_quality': rng.randint(3, 8)
+        }
+    }
+
+
+def build_content(prompt, rng):
+    """Answer a chat_request prompt; returns (JSON text, exchanges generated)."""
+    personas = parse_personas(prompt)
+    conflicts = parse_conflicts(prompt)
+    participants = [persona for persona in personas if persona['role'] == 'Participant']
+    if participants:
+        return json.dumps(build_group_round(participants, conflicts, rng)), len(participants)
+
+    initiator = next((p for p in personas if p['role'] == 'Initiator'), {'name': 'Initiator'})
+    receiver = next((p for p in personas if p['role'] == 'Receiver'), {'name': 'Receiver'})
+    match = re.search(r'exactly (\d+) items in "exchanges"', prompt)
+    if not match:
+        return json.dumps(build_exchange(initiator, receiver, conflicts, rng)), 1
+    count = int(match.group(1))
+    exchanges = [build_exchange(initiator, receiver, conflicts, rng) for _ in range(count)]
+    return json.dumps({'exchanges': exchanges}), count
+
+
+def garble(content, rng):
+    """Corrupt a JSON reply the ways models do: truncation, code fences, trailing commas, chatter."""
+    glitch = rng.choice(('truncated', 'fenced', 'trailing_comma', 'chatter'))
+    if glitch == 'truncated':
+        return content[:rng.randint(1, max(1, len(content) - 1))]
+    if glitch == 'fenced':
+        return f"```json\n{content}\n```"
+    if glitch == 'trailing_comma':
+        return content[:-1] + ',}'
+    return f"Here is the interaction you asked for:\n{content}"
+
+
+def error_response(status, message, error_type, headers=None):
+    response = jsonify({'error': {'message': message, 'type': error_type, 'param': None, 'code': None}})
+    response.status_code = status
+    for name, value in (headers or {}).items():
+        response.headers[name] = value
+    return response
+
+
+stub_app = Flask(__name__)
+
+
+@stub_app.route("/v1/chat/completions", methods=["POST"])
+@stub_app.route("/chat/completions", methods=["POST"])
+def chat_completions():
+    profile.stats['requests'] += 1
+    body = request.get_json(silent=True) or {}
+    messages = body.get('messages') or []
+    if not messages:
+        return error_response(400, "'messages' is required", 'invalid_request_error')
+    model = body.get('model', 'stub')
+    latency = profile.latency()
+    stream = bool(body.get('stream'))
+
+    # Streams start after the time-to-first-token and spread the rest over the chunks
+    eventlet.sleep(latency * FIRST_TOKEN_SHARE if stream else latency)
+
+    retry_after = profile.rate_limited_for()
+    if retry_after > 0:
+        profile.stats['rate_limited'] += 1
+        return error_response(429, "Rate limit reached for requests", 'rate_limit_exceeded',
+                              {'retry-after-ms': str(int(retry_after * 1000))})
+    if profile.random.random() < profile.server_error_rate:
+        profile.stats['server_errors'] += 1
+        return error_response(500, "The server had an error while processing your request", 'server_error')
+
+    # Persona blocks are in the user message, the response format in the system message
+    prompt = "\n\n".join(message.get('content') or '' for message in messages)
+    content, exchanges = build_content(prompt, profile.random)
+    if profile.random.random() < profile.malformed_rate:
+        profile.stats['malformed'] += 1
+        content = garble(content, profile.random)
+    else:
+        profile.stats['completed'] += 1
+
+    prompt_tokens = sum(len(message.get('content') or '') for message in messages) // 4
+    completion_tokens = int(profile.completion_tokens * exchanges * profile.random.uniform(0.8, 1.2))
+    usage = {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens
+    }
+    completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:24]}"
+    # A forced function call returns the JSON as the call's arguments instead of as content
+    tool_name = forced_tool(body)
+    if stream:
+        include_usage = bool((body.get('stream_options') or {}).get('include_usage'))
+        return Response(stream_chunks(completion_id, model, content, usage if include_usage else None,
+                                      latency * (1 - FIRST_TOKEN_SHARE), tool_name),
+                        mimetype='text/event-stream')
+
+    message = {'role': 'assistant', 'content': content}
+    if tool_name:
+        message = {
+            'role': 'assistant',
+            'content': None,
+            'tool_calls': [{
+                'id': f"call_{uuid.uuid4().hex[:24]}",
+                'type': 'function',
+                'function': {'name': tool_name, 'arguments': content}
+            }]
+        }
+
+    return jsonify({
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': message,
+            'finish_reason': 'tool_calls' if tool_name else 'stop'
+        }],
+        'usage': usage
+    })
+
+
+def forced_tool(body):
+    """Name of the function a request forces the model to call, if any."""
+    tool_choice = body.get('tool_choice')
+    if isinstance(tool_choice, dict):
+        return (tool_choice.get('function') or {}).get('name')
+    tools = body.get('tools') or []
+    if tools and tool_choice != 'none':
+        return (tools[0].get('function') or {}).get('name')
+    return None
+
+
+def stream_chunks(completion_id, model, content, usage, duration, tool_name=None):
+    """Server-sent chat.completion.chunk events for `content`, spread over `duration` seconds."""
+    pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+    pause = duration / max(1, len(pieces))
+
+    def event(choices, chunk_usage=None):
+        chunk = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': choices
+        }
+        if chunk_usage is not None:
+            chunk['usage'] = chunk_usage
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    if tool_name:
+        yield event([{'index': 0, 'delta': {'role': 'assistant', 'content': None, 'tool_calls': [{
+            'index': 0,
+            'id': f"call_{uuid.uuid4().hex[:24]}",
+            'type': 'function',
+            'function': {'name': tool_name, 'arguments': ''}
+        }]}, 'finish_reason': None}])
+    else:
+        yield event([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+    for piece in pieces:
+        eventlet.sleep(pause)
+        if tool_name:
+            delta = {'tool_calls': [{'index': 0, 'function': {'arguments': piece}}]}
+        else:
+            delta = {'content': piece}
+        yield event([{'index': 0, 'delta': delta, 'finish_reason': None}])
+    yield event([{'index': 0, 'delta': {}, 'finish_reason': 'tool_calls' if tool_name else 'stop'}])
+    if usage is not None:
+        yield event([], usage)
+    yield "data: [DONE]\n\n"
+
+
+@stub_app.route("/stats")
+def stats():
+    return jsonify(profile.get_stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve an OpenAI-compatible chat.completions stub for load testing. "
+                    "Point the app at it with OPENAI_BASE_URL=http://HOST:PORT/v1 "
+                    "(OPENAI_API_KEY must be set but is not checked)."
+    )
+    parser.add_argument("--host", default=os.environ.get("STUB_LLM_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("STUB_LLM_PORT", 8008)))
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS, help="median response time")
+    parser.add_argument("--latency-sigma", type=float, default=LATENCY_SIGMA,
+                        help="lognormal spread of response times, 0 for fixed latency")
+    parser.add_argument("--rate-limit-rate", type=float, default=RATE_LIMIT_RATE,
+                        help="chance that a request starts a burst of 429s")
+    parser.add_argument("--rate-limit-burst", type=float, default=RATE_LIMIT_BURST,
+                        help="seconds a 429 burst lasts")
+    parser.add_argument("--server-error-rate", type=float, default=SERVER_ERROR_RATE)
+    parser.add_argument("--malformed-rate", type=float, default=MALFORMED_RATE,
+                        help="chance of returning truncated JSON")
+    parser.add_argument("--completion-tokens", type=int, default=COMPLETION_TOKENS,
+                        help="completion tokens reported per exchange")
+    parser.add_argument("--seed", default=os.environ.get("STUB_LLM_SEED"))
+    args = parser.parse_args()
+
+    profile = StubProfile(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        rate_limit_rate=args.rate_limit_rate,
+        rate_limit_burst=args.rate_limit_burst,
+        server_error_rate=args.server_error_rate,
+        malformed_rate=args.malformed_rate,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed
+    )
+    logger.info(f"Stub LLM server listening on http://{args.host}:{args.port}/v1 ({profile.get_stats()})")
+    wsgi.server(eventlet.listen((args.host, args.port)), stub_app, log_output=False)
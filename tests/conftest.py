@@ -0,0 +1,18 @@
+import os
+import pytest
+
+# chat_request imports the Flask app, which needs a database URL to start
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+@pytest.fixture
+def app_context():
+    """Application context on a fresh in-memory database."""
+    from app import app
+    from database import db
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,57 @@
+import random
+from types import SimpleNamespace
+from conflict_matrix import ConflictMatrix
+from chat_request import analyze_potential_conflicts
+
+BEHAVIORS = ['proactive', 'reactive', 'balanced', 'analytical', 'creative']
+STYLES = ['formal', 'casual', 'enthusiastic', 'reserved', 'neutral']
+COMMUNICATION = ['direct', 'diplomatic', 'detailed', 'concise', 'storytelling']
+TRAITS = ['ambitious', 'driven', 'logical', 'methodical', 'cooperative', 'innovative', 'calm', 'Assertive']
+GOALS = ['lead', 'control', 'grow', 'learn', 'manage', 'team', 'ship', 'Decide']
+
+
+def _persona(persona_id, rng, **fields):
+    persona = SimpleNamespace(
+        id=persona_id,
+        name=f"P{persona_id}",
+        behavior_pattern=rng.choice(BEHAVIORS),
+        interaction_style=rng.choice(STYLES),
+        communication_preference=rng.choice(COMMUNICATION),
+        personality=" ".join(rng.sample(TRAITS, 2)),
+        goals=" ".join(rng.sample(GOALS, rng.randint(1, 3)))
+    )
+    for name, value in fields.items():
+        setattr(persona, name, value)
+    return persona
+
+
+def _assert_matches_reference(matrix, personas):
+    for a in personas:
+        for b in personas:
+            if a is not b:
+                assert matrix.conflicts(a, b) == analyze_potential_conflicts(a, b), (a, b)
+
+
+def test_matches_reference_for_every_pair():
+    rng = random.Random(42)
+    personas = [_persona(i, rng) for i in range(1, 41)]
+    _assert_matches_reference(ConflictMatrix(personas), personas)
+
+
+def test_update_persona_recompiles_its_pairs():
+    rng = random.Random(7)
+    personas = [_persona(i, rng) for i in range(1, 11)]
+    matrix = ConflictMatrix(personas)
+    personas[3] = _persona(4, rng, behavior_pattern='reactive', goals='lead control', personality='driven')
+    matrix.update_persona(personas[3])
+    _assert_matches_reference(matrix, personas)
+
+
+def test_personas_outside_the_roster_or_missing_fields_use_the_reference():
+    rng = random.Random(3)
+    personas = [_persona(i, rng) for i in range(1, 6)]
+    del personas[0].communication_preference
+    matrix = ConflictMatrix(personas)
+    _assert_matches_reference(matrix, personas)
+    stranger = _persona(99, rng)
+    assert matrix.conflicts(personas[1], stranger) == analyze_potential_conflicts(personas[1], stranger)
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from conversation_history import ConversationHistory, fit_to_budget, entry_tokens
+from llm_cache import normalize_prompt
+from chat_request import format_conversation_history
+
+ANN = SimpleNamespace(id=1, name='Ann')
+BOB = SimpleNamespace(id=2, name='Bob')
+START = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def _entry(content):
+    return {'content': content, 'timestamp': START, 'metadata': {}}
+
+
+def _append(history, number, impact='unchanged', key_points=(), start=START):
+    history.append(ANN, BOB, f"exchange {number}", start + timedelta(minutes=number), {
+        'outcome': {'resolution_status': 'resolved', 'relationship_impact': impact, 'key_points': list(key_points)}
+    })
+
+
+def test_fit_to_budget_keeps_newest_entries_in_order():
+    entries = [_entry(str(i) * 100) for i in range(5)]  # 50 tokens each
+    assert entry_tokens(entries[0]) == 50
+    assert [e['content'][0] for e in fit_to_budget(entries, 120)] == ['3', '4']
+    assert fit_to_budget(entries, 1000) == entries
+    assert fit_to_budget([], 10) == []
+
+
+def test_fit_to_budget_truncates_an_oversized_newest_entry():
+    fitted = fit_to_budget([_entry('old'), _entry('x' * 1000 + 'END')], 50)
+    assert len(fitted) == 1
+    assert fitted[0]['content'].startswith('...') and fitted[0]['content'].endswith('END')
+    assert entry_tokens(fitted[0]) <= 51
+
+
+def test_summary_folds_all_but_raw_turns_at_each_interval():
+    history = ConversationHistory(raw_turns=2, summary_interval=3, token_budget=10000)
+    for number in range(4):
+        _append(history, number)
+    assert history.summary(1, 2) == ""
+    assert len(history.recent(2, 1)) == 4
+
+    _append(history, 4, impact='strengthened', key_points=['budget agreed'])
+    summary = history.summary(2, 1)
+    assert summary.startswith("Summary of exchanges 1-3:")
+    assert "3 resolved" in summary and "most recently unchanged" in summary
+    assert [turn['content'] for turn in history.recent(1, 2)] == ['exchange 3', 'exchange 4']
+
+    for number in range(5, 8):
+        _append(history, number, key_points=['budget agreed', 'timeline'])
+    summary = history.summary(1, 2)
+    assert summary.startswith("Summary of exchanges 1-6:")
+    assert "1 strengthened" in summary
+    assert "Points discussed: budget agreed; timeline" in summary
+    assert history.get_stats()['summary_refreshes'] == 2
+
+
+def test_recent_fits_raw_turns_into_budget_left_by_summary():
+    history = ConversationHistory(raw_turns=3, summary_interval=100, token_budget=60)
+    for number in range(3):
+        _append(history, number)
+    recent = history.recent(1, 2)
+    assert [turn['content'] for turn in recent] == ['exchange 1', 'exchange 2']
+    assert history.get_stats()['trimmed_turns'] == 1
+    assert history.recent(1, 3) == []
+
+
+def test_prompt_history_normalizes_alike_across_runs():
+    prompts = []
+    for start in (START, START + timedelta(days=3, hours=7, seconds=13)):
+        history = ConversationHistory(raw_turns=3, summary_interval=5, token_budget=10000)
+        for number in range(9):
+            _append(history, number, key_points=[f"point {number}"], start=start)
+        assert history.summary(1, 2)
+        prompts.append(format_conversation_history(history.recent(1, 2), history.summary(1, 2)))
+    assert prompts[0] != prompts[1]
+    assert normalize_prompt(prompts[0]) == normalize_prompt(prompts[1])
@@ -0,0 +1,44 @@
+import eventlet
+from sqlalchemy.exc import OperationalError
+from interaction_writer import InteractionWriter
+
+
+class FlakyWriter(InteractionWriter):
+    """Writer whose first `failures` inserts fail, counting every insert attempted."""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.inserts = []
+
+    def _insert(self, rows):
+        self.inserts.append(len(rows))
+        if len(self.inserts) <= self.failures:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return list(range(1, len(rows) + 1))
+
+
+def test_full_buffer_waits_for_pending_retry():
+    writer = FlakyWriter(failures=1, batch_size=2, flush_interval=60, retry_delay=60)
+    events = [writer.add({'content': str(i)}) for i in range(2)]
+    eventlet.sleep(0)
+    assert writer.inserts == [2]
+
+    # The buffer is past batch_size again, but the backoff is not cut short
+    events += [writer.add({'content': str(i)}) for i in range(2, 5)]
+    eventlet.sleep(0)
+    assert writer.inserts == [2]
+    assert writer.stats['retried_rows'] == 2
+
+    writer.flush()  # What the retry timer runs
+    assert writer.inserts == [2, 5]
+    assert [event.wait() for event in events] == [1, 2, 3, 4, 5]
+
+
+def test_full_buffer_flushes_without_pending_retry():
+    writer = FlakyWriter(failures=0, batch_size=2, flush_interval=60)
+    events = [writer.add({'content': str(i)}) for i in range(2)]
+    eventlet.sleep(0)
+    assert writer.inserts == [2]
+    assert [event.wait() for event in events] == [1, 2]
+    assert writer._timer is None
@@ -0,0 +1,71 @@
+import json
+from llm_backends import LLMBackends, ModelRouter, PROBE_INTERVAL, STATS_MIN_CALLS
+
+
+def _router(**kwargs):
+    return ModelRouter(large_model='large', small_model='small', early_exchanges=2, **kwargs)
+
+
+def test_without_small_model_everything_is_large():
+    router = ModelRouter(large_model='large', small_model=None)
+    assert router.choose(0, 1, 10, conflicts=()) == 'large'
+    assert ModelRouter(large_model='large', small_model='large').small_model is None
+
+
+def test_routing_rules_by_position_and_conflicts():
+    router = _router(adaptive=False)
+    assert router.choose(0, 1, 10, conflicts=['clash']) == 'small'  # Early exchange
+    assert router.choose(5, 1, 10, conflicts=()) == 'small'  # No known conflicts
+    assert router.choose(5, 1, 10, conflicts=['clash']) == 'large'
+    assert router.choose(9, 1, 10, conflicts=()) == 'large'  # Final exchange
+    assert router.choose(8, 3, 10, conflicts=()) == 'large'  # Chunk reaching the final exchange
+    assert router.choose(0, 1, 10, designated=True) == 'large'
+    assert router.get_stats()['small'] == 2 and router.get_stats()['large'] == 4
+
+
+def test_unhealthy_model_is_avoided_with_periodic_probes():
+    router = _router(adaptive=True, max_error_rate=0.3)
+    for _ in range(STATS_MIN_CALLS):
+        router.record('small', failed=True)
+        router.record('large', latency=1.0)
+    choices = [router.choose(0, 1, 10) for _ in range(PROBE_INTERVAL)]
+    assert choices.count('large') == PROBE_INTERVAL - 1
+    assert choices[-1] == 'small'
+    assert router.stats['probes'] == 1
+
+
+def test_slow_small_model_is_avoided():
+    router = _router(adaptive=True, latency_factor=1.0)
+    for _ in range(STATS_MIN_CALLS):
+        router.record('small', latency=3.0)
+        router.record('large', latency=1.0)
+    assert router.choose(0, 1, 10) == 'large'
+
+
+def test_health_is_ignored_when_not_adaptive():
+    router = _router(adaptive=False)
+    for _ in range(STATS_MIN_CALLS):
+        router.record('small', failed=True)
+        router.record('large', latency=1.0)
+    assert router.choose(0, 1, 10) == 'small'
+    assert router.get_stats()['models']['small']['errors'] == STATS_MIN_CALLS
+
+
+def test_backends_serve_their_models():
+    backends = LLMBackends(json.dumps({
+        'local': {'base_url': 'http://127.0.0.1:8008/v1', 'models': ['stub-small']}
+    }))
+    assert backends.backend('stub-small').name == 'local'
+    assert backends.backend('gpt-4') is backends.default
+    assert backends.client('stub-small') is backends.backends['local'].client
+    override = object()
+    backends.set_client(override)
+    assert backends.client('gpt-4') is override
+    backends.set_client(None)
+    assert backends.client('gpt-4') is backends.default.client
+
+
+def test_invalid_backend_config_is_ignored():
+    backends = LLMBackends('{"broken": ')
+    assert backends.backends == {}
+    assert backends.backend('anything') is backends.default
@@ -0,0 +1,78 @@
+from datetime import datetime
+from types import SimpleNamespace
+from llm_cache import LLMCache, normalize_prompt, build_completion, completion_text
+from chat_request import format_conversation_history
+
+MESSAGES = [
+    {'role': 'system', 'content': 'You simulate conversations.'},
+    {'role': 'user', 'content': 'Initiator: Ann\n  Receiver: Bob\n\nContext: planning'}
+]
+
+
+def _response(content, prompt_tokens=120, completion_tokens=40):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason='stop')],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens),
+        model='gpt-4'
+    )
+
+
+def _history(start_hour):
+    return [{
+        'content': f"Ann: point {number}",
+        'timestamp': datetime(2024, 1, 1, start_hour, 0, number),
+        'metadata': {'outcome': {'resolution_status': 'resolved', 'relationship_impact': 'unchanged'}}
+    } for number in range(3)]
+
+
+def test_normalize_strips_indentation_blank_lines_and_timestamps():
+    text = "  Previous interactions:\n\n[09:15:02]\n    Content: hi\n[not a stamp]\n"
+    assert normalize_prompt(text) == "Previous interactions:\nContent: hi\n[not a stamp]"
+
+
+def test_key_is_stable_across_runs_at_different_times():
+    cache = LLMCache()
+    first = [*MESSAGES, {'role': 'user', 'content': format_conversation_history(_history(9))}]
+    second = [*MESSAGES, {'role': 'user', 'content': format_conversation_history(_history(17))}]
+    assert first != second
+    assert cache.make_key('gpt-4', 0.7, first) == cache.make_key('gpt-4', 0.7, second)
+
+
+def test_key_depends_on_model_temperature_and_content():
+    cache = LLMCache()
+    key = cache.make_key('gpt-4', 0.7, MESSAGES)
+    assert cache.make_key('gpt-4o', 0.7, MESSAGES) != key
+    assert cache.make_key('gpt-4', 0.2, MESSAGES) != key
+    assert cache.make_key('gpt-4', 0.7, [MESSAGES[0], {'role': 'user', 'content': 'Initiator: Cy'}]) != key
+    assert cache.make_key('gpt-4', 0.7, [dict(message) for message in MESSAGES]) == key
+
+
+def test_cache_first_hits_after_store(app_context):
+    cache = LLMCache(default_policy='bypass')
+    cache.set_policy(1, 'cache_first')
+    response = _response('{"dialogue": "hi"}')
+    assert cache.lookup(1, 'gpt-4', 0.7, MESSAGES) is None
+    cache.store(1, 'gpt-4', 0.7, MESSAGES, response)
+
+    hit = cache.lookup(1, 'gpt-4', 0.7, MESSAGES)
+    assert hit.choices[0].message.content == '{"dialogue": "hi"}'
+    assert hit.from_cache and hit.usage.total_tokens == 160
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+    # Other simulations keep the default policy and never read the cache
+    assert cache.lookup(2, 'gpt-4', 0.7, MESSAGES) is None
+
+
+def test_record_only_stores_without_reading(app_context):
+    cache = LLMCache(default_policy='record_only')
+    cache.store(1, 'gpt-4', 0.7, MESSAGES, _response('{}'))
+    assert cache.lookup(1, 'gpt-4', 0.7, MESSAGES) is None
+    cache.set_policy(1, 'cache_first')
+    assert cache.lookup(1, 'gpt-4', 0.7, MESSAGES) is not None
+
+
+def test_completion_text_reads_forced_tool_calls():
+    call = SimpleNamespace(function=SimpleNamespace(arguments='{"a": 1}'))
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[call]))])
+    assert completion_text(response) == '{"a": 1}'
+    assert completion_text(build_completion('text')) == 'text'
@@ -0,0 +1,78 @@
+import pytest
+from llm_cache import build_completion
+import llm_cassette
+from llm_cassette import CassetteClient, CassetteMissError
+
+
+class EchoCompletions:
+    """Stands in for the provider: replies with the last message and counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model=None, messages=None, temperature=None, **kwargs):
+        self.calls += 1
+        return build_completion(f"{messages[-1]['content']} #{self.calls}", model, 50, 10)
+
+
+def _client(inner):
+    return type('Client', (), {'chat': type('Chat', (), {'completions': inner})})()
+
+
+def _text(response):
+    return response.choices[0].message.content
+
+
+def _messages(text):
+    return [{'role': 'user', 'content': text}]
+
+
+@pytest.mark.parametrize('name', ['cassette.jsonl', 'cassette.jsonl.gz'])
+def test_replay_serves_recorded_responses(tmp_path, name):
+    path = str(tmp_path / name)
+    provider = EchoCompletions()
+    recorder = CassetteClient('record', inner=_client(provider), path=path)
+    recorded = [_text(recorder.create(model='gpt-4', messages=_messages(text), temperature=0.7))
+                for text in ('hello', 'again', 'hello')]
+    llm_cassette.close()
+    assert recorder.stats['recorded'] == 3
+
+    player = CassetteClient('replay', path=path, latency='none')
+    # Identical requests get their recordings in turn, independent of the other requests' order
+    assert _text(player.create(model='gpt-4', messages=_messages('again'), temperature=0.7)) == recorded[1]
+    assert _text(player.create(model='gpt-4', messages=_messages('hello'), temperature=0.7)) == recorded[0]
+    replayed = player.create(model='gpt-4', messages=_messages('hello'), temperature=0.7)
+    assert _text(replayed) == recorded[2]
+    assert replayed.usage.total_tokens == 60
+    assert provider.calls == 3
+
+
+def test_replay_miss_raises(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl')
+    CassetteClient('record', inner=_client(EchoCompletions()), path=path).create(
+        model='gpt-4', messages=_messages('hello'), temperature=0.7)
+    llm_cassette.close()
+
+    player = CassetteClient('replay', path=path, latency='none')
+    with pytest.raises(CassetteMissError):
+        player.create(model='gpt-4', messages=_messages('hello'), temperature=0.2)
+    assert player.stats['missed'] == 1
+
+
+def test_replay_needs_an_existing_cassette(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CassetteClient('replay', path=str(tmp_path / 'missing.jsonl'))
+    with pytest.raises(ValueError):
+        CassetteClient('record', path=str(tmp_path / 'cassette.jsonl'))
+
+
+def test_truncated_gzip_cassette_keeps_complete_recordings(tmp_path):
+    path = tmp_path / 'cassette.jsonl.gz'
+    recorder = CassetteClient('record', inner=_client(EchoCompletions()), path=str(path))
+    for text in ('one', 'two', 'three'):
+        recorder.create(model='gpt-4', messages=_messages(text), temperature=0.7)
+    llm_cassette.close()
+    path.write_bytes(path.read_bytes()[:-20])
+
+    player = CassetteClient('replay', path=str(path), latency='none')
+    assert _text(player.create(model='gpt-4', messages=_messages('one'), temperature=0.7)) == 'one #1'
@@ -0,0 +1,58 @@
+import eventlet
+from llm_governor import LLMGovernor
+
+
+def _queue(governor, requests):
+    """Queue `requests` (simulation ids, in arrival order) behind a held slot; returns the grant order."""
+    granted = []
+
+    def call(simulation_id):
+        with governor.slot(simulation_id):
+            granted.append(simulation_id)
+
+    governor.acquire('holder')
+    for simulation_id in requests:
+        eventlet.spawn_n(call, simulation_id)
+    eventlet.sleep(0)
+    assert governor.get_stats()['queue_depth'] == len(requests)
+    governor.release('holder')
+    for _ in range(len(requests) + 1):
+        eventlet.sleep(0)
+    return granted
+
+
+def test_grants_immediately_below_cap():
+    governor = LLMGovernor(2)
+    governor.acquire(1)
+    governor.acquire(2)
+    assert governor.in_flight == 2
+    governor.release(1)
+    governor.release(2)
+    assert governor.in_flight == 0
+
+
+def test_fair_queue_interleaves_simulations():
+    governor = LLMGovernor(1)
+    granted = _queue(governor, ['a', 'a', 'a', 'b', 'b', 'b'])
+    assert granted == ['a', 'b', 'a', 'b', 'a', 'b']
+    assert governor.in_flight == 0
+
+
+def test_weight_gives_proportional_share():
+    governor = LLMGovernor(1)
+    governor.set_weight('fast', 2)
+    granted = _queue(governor, ['slow'] * 3 + ['fast'] * 6)
+    # Finish tags: slow 1, 2, 3; fast 0.5, 1, ..., 3; ties go to the earlier request
+    assert granted == ['fast', 'slow', 'fast', 'fast', 'slow', 'fast', 'fast', 'slow', 'fast']
+
+
+def test_killed_waiter_leaves_the_queue():
+    governor = LLMGovernor(1)
+    governor.acquire('holder')
+    waiter = eventlet.spawn(governor.acquire, 'gone')
+    eventlet.sleep(0)
+    waiter.kill()
+    assert governor.get_stats()['queue_depth'] == 0
+    governor.release('holder')
+    assert governor.in_flight == 0
+    assert governor.get_stats()['simulations']['gone']['waiting'] == 0
@@ -0,0 +1,64 @@
+import pytest
+from llm_cache import build_completion
+from llm_ledger import LLMLedger, CallUsage
+
+PRICING = {'gpt-4': (30.0, 60.0), 'gpt-4o': (2.5, 10.0), 'gpt-4o-mini': (0.15, 0.6)}
+
+
+@pytest.fixture
+def ledger():
+    ledger = LLMLedger(batch_size=1000, pricing=PRICING)
+    yield ledger
+    ledger._cancel_timer()
+
+
+def test_price_per_million_tokens(ledger):
+    assert ledger.price('gpt-4', 1_000_000, 0) == pytest.approx(30.0)
+    assert ledger.price('gpt-4', 2000, 500) == pytest.approx(0.09)
+    assert ledger.price('gpt-4o-mini', 10_000, 10_000) == pytest.approx(0.0075)
+
+
+def test_price_uses_longest_prefix_and_none_when_unknown(ledger):
+    assert ledger.price('gpt-4o-mini-2024-07-18', 1_000_000, 0) == pytest.approx(0.15)
+    assert ledger.price('gpt-4o-2024-08-06', 1_000_000, 0) == pytest.approx(2.5)
+    assert ledger.price('claude-x', 100, 100) is None
+    assert ledger.price(None, 100, 100) is None
+
+
+def test_usage_accumulates_every_attempt():
+    usage = CallUsage('gpt-4')
+    usage.attempts = 2
+    usage.add(build_completion('bad', 'gpt-4-0613', 1000, 200), latency=1.5)
+    usage.add(build_completion('{}', 'gpt-4-0613', 1000, 300), latency=2.0)
+    assert (usage.prompt_tokens, usage.completion_tokens) == (2000, 500)
+    assert usage.model == 'gpt-4-0613' and usage.latency == pytest.approx(3.5)
+
+
+def test_record_charges_tracked_simulations(ledger):
+    ledger.track(7, tokens=100, cost=1.0)
+    usage = CallUsage('gpt-4')
+    usage.attempts = 1
+    usage.add(build_completion('{}', 'gpt-4', 2000, 500))
+    ledger.record(usage, simulation_id=7)
+
+    hit = CallUsage('gpt-4')
+    hit.attempts = 1
+    hit.add(build_completion('{}', 'gpt-4', 2000, 500), cache_status='hit')
+    ledger.record(hit, simulation_id=7)
+
+    tokens, cost = ledger.spent(7)
+    assert tokens == 100 + 2500 + 2500
+    assert cost == pytest.approx(1.09)
+    assert [row['cost'] for row in ledger._buffer] == [pytest.approx(0.09), 0.0]
+    assert [row['retries'] for row in ledger._buffer] == [0, 0]
+
+    ledger.forget(7)
+    assert ledger.spent(7) == (0, 0.0)
+
+
+def test_unpriced_models_are_counted(ledger):
+    usage = CallUsage('local-model')
+    usage.attempts = 1
+    ledger.record(usage)
+    assert ledger.stats['unpriced'] == 1
+    assert ledger._buffer[0]['cost'] is None
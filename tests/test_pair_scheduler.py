@@ -0,0 +1,73 @@
+import pytest
+from pair_scheduler import PairScheduler
+
+
+def test_pair_index_covers_triangle_in_order():
+    scheduler = PairScheduler(range(6), max_depth=3)
+    indexes = [scheduler._pair_index(i, j) for i in range(6) for j in range(i + 1, 6)]
+    assert indexes == list(range(scheduler.total_pairs))
+    assert len(scheduler.depths) == 15
+
+
+def test_depth_is_symmetric_and_clamped():
+    scheduler = PairScheduler([30, 10, 20], max_depth=2)
+    assert scheduler.advance(30, 10) == 1
+    assert scheduler.depth(10, 30) == scheduler.depth(30, 10) == 1
+    assert scheduler.advance(10, 30, exchanges=5) == 1
+    assert scheduler.advance(10, 30) == 0
+    assert scheduler.is_pair_complete(30, 10)
+    assert scheduler.depth(10, 20) == scheduler.depth(20, 30) == 0
+    assert scheduler.completed_count == 1
+    assert scheduler.exchange_count == 2
+
+
+def test_acquire_runs_every_pair_to_depth():
+    scheduler = PairScheduler([1, 2, 3, 4], max_depth=2)
+    pairs = set()
+    while not scheduler.is_complete:
+        pair = scheduler.acquire()
+        assert pair is not None
+        pairs.add(pair)
+        scheduler.advance(*pair)
+        scheduler.release(*pair)
+    assert pairs == {(a, b) for a in range(1, 5) for b in range(a + 1, 5)}
+    assert scheduler.exchange_count == 12
+    assert scheduler.acquire() is None
+
+
+def test_acquire_skips_pairs_in_flight():
+    scheduler = PairScheduler([1, 2, 3], max_depth=1)
+    taken = [scheduler.acquire() for _ in range(3)]
+    assert sorted(taken) == [(1, 2), (1, 3), (2, 3)]
+    assert scheduler.acquire() is None
+
+
+def test_restore_round_trips_checkpoint_and_prefers_larger_counts():
+    scheduler = PairScheduler([1, 2, 3], max_depth=4)
+    scheduler.advance(1, 2, 2)
+    scheduler.advance(2, 3, 4)
+
+    restored = PairScheduler([1, 2, 3], max_depth=4)
+    restored.restore(scheduler.to_bytes(), {(2, 1): 3, (1, 3): 1})
+    assert restored.depth(1, 2) == 3
+    assert restored.depth(1, 3) == 1
+    assert restored.depth(2, 3) == 4
+    assert restored.completed_count == 1
+    assert restored.exchange_count == 8
+    # The deepest unfinished pair is picked up first
+    assert restored.acquire() == (1, 2)
+
+
+def test_restore_rejects_checkpoint_of_another_roster():
+    scheduler = PairScheduler([1, 2, 3], max_depth=4)
+    with pytest.raises(ValueError):
+        scheduler.restore(PairScheduler([1, 2, 3, 4], max_depth=4).to_bytes())
+
+
+def test_abandon_counts_pair_as_finished():
+    scheduler = PairScheduler([1, 2], max_depth=3)
+    pair = scheduler.acquire()
+    scheduler.abandon(*pair)
+    scheduler.abandon(*pair)
+    assert scheduler.is_complete
+    assert scheduler.acquire() is None
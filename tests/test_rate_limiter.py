@@ -0,0 +1,59 @@
+import pytest
+from rate_limiter import TokenBucket, LLMRateLimiter
+
+
+def test_bucket_refills_at_per_minute_rate():
+    bucket = TokenBucket(600, burst_seconds=10)  # 10 per second, capacity 100
+    now = bucket.updated
+    bucket.consume(100, now)
+    assert bucket.wait_time(10, now) == pytest.approx(1.0)
+    assert bucket.wait_time(10, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(10, now + 1.0) == 0.0
+
+
+def test_bucket_refill_is_capped_at_capacity():
+    bucket = TokenBucket(600, burst_seconds=10)
+    now = bucket.updated
+    bucket.consume(50, now)
+    bucket._refill(now + 60)
+    assert bucket.level == bucket.capacity == 100
+
+
+def test_oversized_request_waits_for_full_bucket_then_goes_into_debt():
+    bucket = TokenBucket(60, burst_seconds=10)  # 1 per second, capacity 10
+    now = bucket.updated
+    bucket.consume(5, now)
+    assert bucket.wait_time(50, now) == pytest.approx(5.0)
+    bucket.consume(50, now + 5)
+    assert bucket.level == pytest.approx(-40)
+    assert bucket.wait_time(1, now + 5) == pytest.approx(41.0)
+
+
+def test_adjust_refunds_overestimates_up_to_capacity():
+    bucket = TokenBucket(600, burst_seconds=10)
+    now = bucket.updated
+    bucket.consume(80, now)
+    bucket.adjust(30)
+    assert bucket.level == pytest.approx(50, abs=0.1)
+    bucket.adjust(500)
+    assert bucket.level == bucket.capacity
+
+
+def test_rate_limited_halves_rate_and_success_recovers_it():
+    limiter = LLMRateLimiter(600, 60000, recovery_step=0.25)
+    limiter.record_rate_limited(retry_after=0)
+    assert limiter.rate_factor == 0.5
+    assert limiter.requests.rate == pytest.approx(5.0)
+    assert limiter.requests.level <= 0
+    limiter.record_success()
+    limiter.record_success()
+    limiter.record_success()
+    assert limiter.rate_factor == 1.0
+    assert limiter.tokens.rate == pytest.approx(1000.0)
+
+
+def test_rate_limited_pause_sets_retry_delay():
+    limiter = LLMRateLimiter(600, 0)
+    assert limiter.retry_delay(2.0) == 2.0
+    limiter.record_rate_limited(retry_after=30)
+    assert 29 < limiter.retry_delay(2.0) <= 30
@@ -0,0 +1,100 @@
+import json
+import httpx2
+import pytest
+from openai import APITimeoutError, AuthenticationError, BadRequestError, RateLimitError
+from llm_cassette import CassetteMissError
+import retry_policy
+from retry_policy import RetryPolicy, CircuitBreaker, is_fatal, is_permanent, is_retryable, is_provider_failure
+
+REQUEST = httpx2.Request('POST', 'https://api.example.com/v1/chat/completions')
+
+
+def _status_error(cls, status):
+    return cls(f"HTTP {status}", response=httpx2.Response(status, request=REQUEST), body=None)
+
+
+def test_classification():
+    timeout = APITimeoutError(request=REQUEST)
+    rate_limited = _status_error(RateLimitError, 429)
+    bad_request = _status_error(BadRequestError, 400)
+    unauthorized = _status_error(AuthenticationError, 401)
+    miss = CassetteMissError("no recording")
+
+    assert is_retryable(timeout) and is_retryable(rate_limited)
+    assert is_retryable(json.JSONDecodeError("bad", "{", 0)) and is_retryable(AttributeError())
+    assert is_permanent(bad_request) and not is_retryable(bad_request) and not is_fatal(bad_request)
+    assert is_fatal(unauthorized) and not is_retryable(unauthorized)
+    assert is_fatal(miss) and not is_retryable(miss) and not is_permanent(miss)
+    assert is_provider_failure(timeout) and not is_provider_failure(rate_limited)
+
+
+@pytest.mark.parametrize('attempt', [1, 2, 3, 6, 10])
+def test_full_jitter_stays_within_bounds(attempt):
+    policy = RetryPolicy(base_delay=1.0, max_delay=30.0, seed=7)
+    cap = min(30.0, 2 ** attempt)
+    delays = [policy.backoff(attempt) for _ in range(500)]
+    assert all(0 <= delay <= cap for delay in delays)
+    # Full jitter spreads over the whole window rather than clustering at the cap
+    assert min(delays) < cap * 0.1 and max(delays) > cap * 0.9
+
+
+def test_seed_makes_jitter_reproducible():
+    first, second = RetryPolicy(seed=3), RetryPolicy(seed=3)
+    assert [first.backoff(2) for _ in range(5)] == [second.backoff(2) for _ in range(5)]
+
+
+def test_call_retries_until_success(monkeypatch):
+    monkeypatch.setattr(retry_policy.eventlet, 'sleep', lambda delay: None)
+    policy = RetryPolicy(max_attempts=3, seed=1)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise APITimeoutError(request=REQUEST)
+        return 'ok'
+
+    assert policy.call(flaky) == 'ok'
+    assert policy.stats['retries'] == 2
+
+
+def test_call_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(retry_policy.eventlet, 'sleep', lambda delay: None)
+    policy = RetryPolicy(max_attempts=2, seed=1)
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        raise ValueError("malformed reply")
+
+    with pytest.raises(ValueError):
+        policy.call(failing)
+    assert len(attempts) == 2
+    assert policy.stats['exhausted'] == 1
+
+
+def test_call_does_not_retry_permanent_errors():
+    policy = RetryPolicy(max_attempts=3)
+    attempts = []
+
+    def rejected():
+        attempts.append(1)
+        raise _status_error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        policy.call(rejected)
+    assert len(attempts) == 1
+    assert policy.stats['not_retryable'] == 1
+
+
+def test_breaker_opens_after_threshold_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure(_status_error(RateLimitError, 429))
+    breaker.record_failure(APITimeoutError(request=REQUEST))
+    assert breaker.state == 'closed'
+    breaker.record_failure(APITimeoutError(request=REQUEST))
+    assert breaker.state == 'open'
+    breaker.before_call()
+    assert breaker.state == 'half_open'
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
@@ -0,0 +1,60 @@
+import pytest
+from simulation_budget import SimulationBudget
+
+
+def test_from_dict_parses_and_validates_limits():
+    budget = SimulationBudget.from_dict({'max_tokens': '1500.0', 'max_cost': 2, 'max_seconds': '', 'extra': 1})
+    assert budget.to_dict() == {'max_tokens': 1500, 'max_cost': 2.0}
+    assert bool(budget)
+    assert not SimulationBudget.from_dict(None)
+    assert SimulationBudget.from_dict({}).to_dict() is None
+    for data in ({'max_cost': -1}, {'max_tokens': 'lots'}, ['max_cost']):
+        with pytest.raises(ValueError):
+            SimulationBudget.from_dict(data)
+
+
+def test_status_reports_remaining_and_first_exceeded_limit():
+    budget = SimulationBudget(max_tokens=1000, max_cost=1.0, max_exchanges=10)
+    status = budget.status(tokens=400, cost=0.25, seconds=12.34, exchanges=3)
+    assert status['remaining'] == {'tokens': 600, 'cost': 0.75, 'exchanges': 7}
+    assert status['spent']['seconds'] == 12.3
+    assert status['exceeded'] is None
+
+    status = budget.status(tokens=1200, cost=1.5, seconds=0, exchanges=3)
+    assert status['exceeded'] == 'max_tokens'
+    assert status['remaining']['tokens'] == 0
+
+
+def test_check_estimate_lists_violations():
+    budget = SimulationBudget(max_cost=1.0, max_seconds=60)
+    assert budget.check_estimate({'cost': 0.5, 'seconds': 30, 'total_tokens': 10 ** 6}) == []
+    assert budget.check_estimate({'cost': 2.5, 'seconds': 90}) == ['cost 2.50 > 1.00', 'seconds 90 > 60']
+    assert budget.check_estimate({}) == []
+
+
+class _Emitter:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data):
+        self.events.append(event)
+
+
+def test_simulation_error_stops_tracking_spend(app_context):
+    from database import db
+    from models import Simulation
+    from llm_ledger import llm_ledger
+    from simulation_manager import SimulationManager
+
+    simulation = Simulation(name='budgeted')
+    db.session.add(simulation)
+    db.session.commit()
+    socketio = _Emitter()
+    manager = SimulationManager(simulation.id, socketio=socketio, app=app_context)
+    llm_ledger.track(simulation.id, tokens=100, cost=0.5)
+
+    manager._handle_simulation_error("boom")
+    assert simulation.id not in llm_ledger._spent
+    db.session.expire_all()
+    assert db.session.get(Simulation, simulation.id).status == 'error'
+    assert socketio.events == ['simulation_error']
@@ -0,0 +1,111 @@
+import pytest
+from database import db
+from models import Persona
+from llm_ledger import llm_ledger
+from chat_request import EXPECTED_COMPLETION_TOKENS
+from llm_backends import ModelRouter
+from simulation_estimator import estimate_simulation, estimate_duration, CALL_OVERHEAD_SECONDS
+import simulation_estimator
+
+
+@pytest.fixture
+def large_only(monkeypatch):
+    monkeypatch.setattr(simulation_estimator, 'model_router', ModelRouter('gpt-4', None))
+
+
+@pytest.fixture
+def persona_ids(app_context, large_only):
+    personas = [Persona(name=f"P{i}", personality='logical driven', interests='planning', goals='lead the team',
+                        behavior_pattern='proactive', interaction_style='formal') for i in range(4)]
+    db.session.add_all(personas)
+    db.session.commit()
+    return [persona.id for persona in personas]
+
+
+def test_pairwise_counts_calls_per_pair(persona_ids):
+    estimate = estimate_simulation(persona_ids, 'long', exchanges_per_call=3)
+    assert estimate['pairs'] == 6 and estimate['max_depth'] == 10
+    assert estimate['exchanges'] == 60
+    assert estimate['calls'] == 6 * 4  # 10 exchanges in chunks of 3
+    assert estimate['completion_tokens'] == 60 * EXPECTED_COMPLETION_TOKENS
+    assert list(estimate['models']) == ['gpt-4']
+    assert estimate['cost'] == pytest.approx(
+        llm_ledger.price('gpt-4', estimate['prompt_tokens'], estimate['completion_tokens']), abs=1e-4)
+
+
+def test_calls_are_priced_for_the_routed_model(persona_ids, monkeypatch):
+    large = estimate_simulation(persona_ids, 'long')
+    monkeypatch.setattr(simulation_estimator, 'model_router',
+                        ModelRouter('gpt-4', 'gpt-4o-mini', early_exchanges=2, adaptive=False))
+    routed = estimate_simulation(persona_ids, 'long')
+
+    # Every pair clashes: two early exchanges on the small model, the rest and the final one on the large
+    assert routed['models']['gpt-4o-mini']['calls'] == 6 * 2
+    assert routed['models']['gpt-4']['calls'] == 6 * 8
+    assert routed['calls'] == large['calls'] and routed['total_tokens'] == large['total_tokens']
+    assert routed['cost'] == pytest.approx(sum(usage['cost'] for usage in routed['models'].values()), abs=1e-3)
+    assert routed['models']['gpt-4o-mini']['cost'] == pytest.approx(llm_ledger.price(
+        'gpt-4o-mini', routed['models']['gpt-4o-mini']['prompt_tokens'],
+        routed['models']['gpt-4o-mini']['completion_tokens']), abs=1e-4)
+    assert routed['cost'] < large['cost']
+    assert routed['seconds'] <= large['seconds']
+
+
+def test_group_rounds_follow_the_router(persona_ids, monkeypatch):
+    monkeypatch.setattr(simulation_estimator, 'model_router',
+                        ModelRouter('gpt-4', 'gpt-4o-mini', early_exchanges=2, adaptive=False))
+    estimate = estimate_simulation(persona_ids, 'medium', conversation_mode='group')
+    assert {model: usage['calls'] for model, usage in estimate['models'].items()} == {'gpt-4o-mini': 2, 'gpt-4': 3}
+
+
+def test_group_mode_runs_one_call_per_round(persona_ids):
+    estimate = estimate_simulation(persona_ids, 'medium', conversation_mode='group', parallelism=4)
+    assert estimate['calls'] == estimate['exchanges'] == 5
+    assert estimate['concurrency'] == 1
+
+
+def test_too_few_personas_cost_nothing(persona_ids):
+    estimate = estimate_simulation(persona_ids[:1], 'short')
+    assert estimate['calls'] == 0 and estimate['cost'] == 0 and estimate['seconds'] == 0
+
+
+def test_duration_is_set_by_the_slowest_limit(monkeypatch):
+    monkeypatch.setattr(simulation_estimator.llm_rate_limiter, 'requests', None)
+    monkeypatch.setattr(simulation_estimator.llm_rate_limiter, 'tokens', None)
+    monkeypatch.setattr(simulation_estimator.llm_ledger, 'seconds_per_completion_token', lambda model: 0.01)
+    by_model = {'gpt-4': {'calls': 10, 'prompt_tokens': 15000, 'completion_tokens': 5000}}
+    seconds, bottleneck = estimate_duration(by_model, total_tokens=20000, concurrency=2)
+    assert bottleneck == 'latency'
+    assert seconds == pytest.approx(10 * (CALL_OVERHEAD_SECONDS + 0.01 * 500) / 2)
+
+    monkeypatch.setattr(simulation_estimator.llm_rate_limiter, 'requests', type('Bucket', (), {'per_minute': 6}))
+    seconds, bottleneck = estimate_duration(by_model, total_tokens=20000, concurrency=2)
+    assert (seconds, bottleneck) == (100.0, 'requests_per_minute')
+    assert estimate_duration({}, 0, 1) == (0.0, None)
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'personas': '12'}, "Personas must be a list of persona ids"),
+    ({'personas': [1, '2']}, "Personas must be a list of persona ids"),
+    ({'personas': [1, 2], 'scenario_id': '1'}, "Invalid scenario"),
+    ({'personas': [1, 2], 'exchanges_per_call': 0}, "Exchanges per call must be between 1 and 5"),
+    ({'personas': [1, 2], 'exchanges_per_call': 'many'}, "Invalid exchanges per call"),
+    ({'personas': [1, 2], 'parallelism': -3}, "Parallelism must be between 1 and"),
+    ({'personas': [1, 2], 'budget': {'max_cost': -1}}, "Budget max_cost must be positive"),
+    ({'personas': [1, 2], 'conversation_depth': 'forever'}, "Invalid conversation depth"),
+    ([1, 2], "Invalid request data"),
+])
+def test_estimate_route_rejects_malformed_input(app_context, body, error):
+    response = app_context.test_client().post('/simulation/estimate', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+
+
+def test_estimate_route_returns_estimate(persona_ids):
+    from flask import current_app
+    response = current_app.test_client().post('/simulation/estimate', json={
+        'personas': persona_ids, 'conversation_depth': 'short', 'exchanges_per_call': 2, 'budget': {'max_cost': 0.0001}
+    })
+    assert response.status_code == 200
+    estimate = response.get_json()
+    assert estimate['calls'] == 6 and estimate['budget_violations']
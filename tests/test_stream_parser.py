@@ -0,0 +1,73 @@
+import json
+from stream_parser import DialogueStreamParser
+
+
+def _stream(text, chunk_size=3, **kwargs):
+    parser = DialogueStreamParser(**kwargs)
+    pieces = []
+    for start in range(0, len(text), chunk_size):
+        pieces.extend(parser.feed(text[start:start + chunk_size]))
+    texts = {}
+    for index, piece in pieces:
+        texts[index] = texts.get(index, '') + piece
+    return texts
+
+
+def test_single_exchange_dialogue():
+    text = json.dumps({'dialogue': 'Ann: hi\nBob: hello', 'sentiment': 'neutral'})
+    assert _stream(text) == {0: 'Ann: hi\nBob: hello'}
+
+
+def test_each_exchange_gets_its_own_index():
+    text = json.dumps({'exchanges': [{'dialogue': 'first'}, {'sentiment': 'x', 'dialogue': 'second'}]})
+    assert _stream(text, chunk_size=1) == {0: 'first', 1: 'second'}
+
+
+def test_nested_dialogue_keys_are_ignored():
+    text = json.dumps({
+        'outcome': {'dialogue': 'not this'},
+        'exchanges': [{'analysis': {'dialogue': 'nor this'}, 'dialogue': 'this'}],
+        'other': [{'dialogue': 'nor this one'}]
+    })
+    assert _stream(text) == {0: 'this'}
+
+
+def test_escapes_split_across_chunks():
+    value = 'quote " slash \\ tab \t café \U0001F600'
+    text = json.dumps({'dialogue': value})
+    for chunk_size in (1, 2, 5):
+        assert _stream(text, chunk_size=chunk_size) == {0: value}
+
+
+def test_keys_and_other_strings_are_not_captured():
+    text = json.dumps({'sentiment': 'dialogue', 'key_points': ['dialogue'], 'dialogue': 'yes'})
+    assert _stream(text) == {0: 'yes'}
+
+
+class _StreamingClient:
+    """Fake client whose completions stream `text` in small chunks, then a final finish chunk."""
+
+    def __init__(self, text, finish_reason):
+        from types import SimpleNamespace as NS
+        chunks = [NS(model='gpt-4', usage=None, choices=[NS(delta=NS(content=text[i:i + 4]), finish_reason=None)])
+                  for i in range(0, len(text), 4)]
+        chunks.append(NS(model='gpt-4', usage=None, choices=[NS(delta=NS(content=None), finish_reason=finish_reason)]))
+        chunks.append(NS(model='gpt-4', usage=NS(prompt_tokens=10, completion_tokens=5), choices=[]))
+        self.chat = NS(completions=NS(create=lambda **kwargs: iter(chunks)))
+
+
+def test_streamed_reply_keeps_finish_reason():
+    from chat_request import stream_chat_completion, parse_completion
+    text = json.dumps({'dialogue': 'Ann: hi', 'sentiment': 'neutral'})
+    deltas = []
+
+    response = stream_chat_completion(_StreamingClient(text, 'stop'), [], 'gpt-4', 0.7,
+                                      lambda stream_id, index, piece: deltas.append(piece))
+    assert ''.join(deltas) == 'Ann: hi'
+    assert response.choices[0].finish_reason == 'stop'
+    assert parse_completion(response) == (json.loads(text), True)
+
+    # Cut off at the token limit: still parsed, but not complete and so never cached
+    response = stream_chat_completion(_StreamingClient(text, 'length'), [], 'gpt-4', 0.7, lambda *args: None)
+    assert response.choices[0].finish_reason == 'length'
+    assert parse_completion(response)[1] is False
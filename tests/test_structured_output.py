@@ -0,0 +1,51 @@
+import json
+import pytest
+from structured_output import repair_json, ResponseParser
+
+
+def test_code_fence_and_surrounding_prose():
+    text = 'Here you go:\n```json\n{"dialogue": "hi", "sentiment": "neutral"}\n```'
+    assert json.loads(repair_json(text)) == {'dialogue': 'hi', 'sentiment': 'neutral'}
+
+
+def test_trailing_commas():
+    text = '{"key_points": ["a", "b",], "analysis": {"score": 5,},}'
+    assert json.loads(repair_json(text)) == {'key_points': ['a', 'b'], 'analysis': {'score': 5}}
+
+
+def test_raw_newlines_inside_strings():
+    text = '{"dialogue": "Ann: hi\nBob:\thello"}'
+    assert json.loads(repair_json(text)) == {'dialogue': 'Ann: hi\nBob:\thello'}
+
+
+def test_truncated_mid_string():
+    text = '{"exchanges": [{"dialogue": "Ann: hi", "outcome": {"key_points": ["agree on sco'
+    assert json.loads(repair_json(text)) == {
+        'exchanges': [{'dialogue': 'Ann: hi', 'outcome': {'key_points': ['agree on sco']}}]
+    }
+
+
+def test_truncated_after_comma_and_escape():
+    assert json.loads(repair_json('{"dialogue": "a", "scores": [1, 2, ')) == {'dialogue': 'a', 'scores': [1, 2]}
+    assert json.loads(repair_json('{"dialogue": "say \\')) == {'dialogue': 'say '}
+
+
+def test_valid_json_is_unchanged():
+    text = json.dumps({'dialogue': 'a, b}', 'items': [1, 2]})
+    assert repair_json(text) == text
+
+
+def test_parser_reports_repaired_replies():
+    parser = ResponseParser('text')
+    assert parser.parse_reply('{"a": 1}') == ({'a': 1}, False)
+    assert parser.parse_reply('{"a": 1,') == ({'a': 1}, True)
+    with pytest.raises(json.JSONDecodeError):
+        parser.parse('no json here')
+    assert parser.stats == {'parsed': 2, 'parse_failures': 2, 'repaired': 1, 'unrepairable': 1}
+
+
+def test_unknown_mode_falls_back_to_text():
+    assert ResponseParser('yaml').mode == 'text'
+    assert ResponseParser('text').request_options('exchange', {}) == {}
+    assert 'tools' in ResponseParser('tools').request_options('exchange', {})
+    assert 'response_format' in ResponseParser('json_schema').request_options('exchange', {})
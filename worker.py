@@ -0,0 +1,225 @@
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import time
+import socket
+import signal
+import argparse
+from datetime import datetime
+from app import app, logger, init_db
+from models import Simulation, Persona, SimulationCheckpoint
+from chat_request import generate_interactions
+from rate_limiter import llm_rate_limiter
+from llm_cache import llm_cache
+from llm_ledger import llm_ledger
+import llm_cassette
+from snapshots import PersonaSnapshot, ScenarioSnapshot
+from conflict_matrix import ConflictMatrix
+from simulation_manager import SimulationManager, build_interaction_context, build_interaction_metadata
+from retry_policy import is_retryable
+import job_queue
+
+
+class ExchangeWorker:
+    """Claims exchange jobs from the shared queue and generates them on a green pool.
+
+    Run one per process or host against the same database; rows are claimed
+    with SKIP LOCKED so workers never run the same job. LLM rate limits and the
+    concurrency cap apply per worker process, so divide the provider quota
+    across workers via LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE.
+    """
+    POLL_INTERVAL = 1.0  # seconds to sleep when the queue is empty
+    SWEEP_INTERVAL = 15  # seconds between stale-claim and completion sweeps
+    CONFIG_TTL = 10  # seconds a cached simulation config (and its status) is trusted
+    PERSONA_TTL = 60  # seconds before a cached persona snapshot is reloaded
+
+    def __init__(self, app, concurrency=4, name=None):
+        self.app = app
+        self.concurrency = max(1, concurrency)
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.pool = eventlet.GreenPool(self.concurrency)
+        self.is_running = False
+        self._configs = {}  # simulation_id -> (loaded_at, config)
+        self._personas = {}  # persona_id -> (loaded_at, PersonaSnapshot)
+        self._conflicts = {}  # simulation_id -> ConflictMatrix, kept across config reloads
+        self._last_sweep = 0.0
+        self._last_heartbeat = time.monotonic()
+        self._active = {}  # job id -> claimed job being processed
+        self.stats = {
+            'claimed': 0,
+            'completed': 0,
+            'failed': 0
+        }
+
+    def run(self):
+        """Claim and process jobs until stopped."""
+        self.is_running = True
+        logger.info(f"Worker {self.name} started with concurrency {self.concurrency}")
+        while self.is_running:
+            try:
+                if time.monotonic() - self._last_sweep >= self.SWEEP_INTERVAL:
+                    self._sweep()
+                if time.monotonic() - self._last_heartbeat >= job_queue.HEARTBEAT_INTERVAL:
+                    self._heartbeat()
+
+                free = self.pool.free()
+                if not free:
+                    eventlet.sleep(0.05)
+                    continue
+
+                with self.app.app_context():
+                    jobs = job_queue.claim_jobs(self.name, free)
+                self.stats['claimed'] += len(jobs)
+                for job in jobs:
+                    self.pool.spawn_n(self._process, job)
+                if not jobs:
+                    eventlet.sleep(self.POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"Worker {self.name} error claiming jobs: {str(e)}")
+                eventlet.sleep(self.POLL_INTERVAL)
+
+        self.pool.waitall()
+        llm_ledger.shutdown()
+        llm_cassette.close()
+        logger.info(f"Worker {self.name} stopped: {self.stats}")
+
+    def stop(self):
+        """Stop claiming new jobs; jobs already claimed run to completion."""
+        self.is_running = False
+
+    def _sweep(self):
+        self._last_sweep = time.monotonic()
+        with self.app.app_context():
+            job_queue.reclaim_stale_jobs()
+            job_queue.complete_finished_simulations()
+
+    def _heartbeat(self):
+        self._last_heartbeat = time.monotonic()
+        with self.app.app_context():
+            job_queue.heartbeat_jobs(self.name, list(self._active.values()))
+
+    def _simulation_config(self, simulation_id):
+        """Cached run configuration of a simulation, or None if it is no longer running."""
+        cached = self._configs.get(simulation_id)
+        if cached and time.monotonic() - cached[0] < self.CONFIG_TTL:
+            return cached[1]
+
+        config = None
+        simulation = Simulation.query.get(simulation_id)
+        checkpoint = SimulationCheckpoint.query.filter_by(simulation_id=simulation_id).first()
+        if simulation and checkpoint and simulation.status == 'running':
+            depth = checkpoint.conversation_depth
+            if depth not in SimulationManager.DEPTH_RANGES:
+                depth = 'medium'
+            scenario = ScenarioSnapshot.from_model(simulation.scenario) if simulation.scenario else None
+            llm_cache.set_policy(simulation_id, checkpoint.cache_policy or llm_cache.default_policy)
+            if simulation_id not in self._conflicts:
+                roster = Persona.query.filter(Persona.id.in_(checkpoint.persona_ids or [])).all()
+                self._conflicts[simulation_id] = ConflictMatrix(PersonaSnapshot.from_model(p) for p in roster)
+            config = {
+                'max_depth': SimulationManager.DEPTH_RANGES[depth][1],
+                'exchanges_per_call': checkpoint.exchanges_per_call or 1,
+                'context': build_interaction_context(simulation.name, scenario, checkpoint.custom_context),
+                'conflict_matrix': self._conflicts[simulation_id]
+            }
+        else:
+            self._conflicts.pop(simulation_id, None)
+        self._configs[simulation_id] = (time.monotonic(), config)
+        return config
+
+    def _persona(self, persona_id):
+        cached = self._personas.get(persona_id)
+        if cached and time.monotonic() - cached[0] < self.PERSONA_TTL:
+            return cached[1]
+
+        persona = Persona.query.get(persona_id)
+        if persona is None:
+            if cached:
+                return cached[1]  # Deleted mid-run; keep the last snapshot
+            raise ValueError(f"Persona {persona_id} not found")
+        snapshot = PersonaSnapshot.from_model(persona)
+        self._personas[persona_id] = (time.monotonic(), snapshot)
+        # Edited personas recompile their rows; unchanged ones cost one re-encode
+        for conflict_matrix in self._conflicts.values():
+            conflict_matrix.update_persona(snapshot)
+        return snapshot
+
+    def _process(self, job):
+        """Generate and store a single claimed exchange."""
+        self._active[job['id']] = job
+        try:
+            self._process_claimed(job)
+        finally:
+            self._active.pop(job['id'], None)
+
+    def _process_claimed(self, job):
+        with self.app.app_context():
+            try:
+                config = self._simulation_config(job['simulation_id'])
+                if config is None:
+                    job_queue.cancel_job(job, self.name)
+                    return
+
+                initiator = self._persona(job['initiator_id'])
+                receiver = self._persona(job['receiver_id'])
+                exchanges = generate_interactions(
+                    initiator,
+                    receiver,
+                    config['context'],
+                    simulation_id=job['simulation_id'],
+                    count=min(config['exchanges_per_call'], config['max_depth'] - job['sequence'] + 1),
+                    conflict_matrix=config['conflict_matrix'],
+                    depth=job['sequence'] - 1,
+                    max_depth=config['max_depth']
+                )
+                timestamp = datetime.utcnow()
+                interaction_id = job_queue.complete_job(job, self.name, [
+                    {
+                        'simulation_id': job['simulation_id'],
+                        'initiator_id': initiator.id,
+                        'receiver_id': receiver.id,
+                        'content': str(interaction_data['dialogue']),
+                        'timestamp': timestamp,
+                        'interaction_metadata': build_interaction_metadata(interaction_data)
+                    }
+                    for interaction_data in exchanges
+                ], config['max_depth'])
+                if interaction_id is not None:
+                    self.stats['completed'] += 1
+                    logger.info(f"Job {job['id']} done: pair ({initiator.id}, {receiver.id}) "
+                               f"exchanges {job['sequence']}-{job['sequence'] + len(exchanges) - 1}"
+                               f"/{config['max_depth']}")
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"Error processing job {job['id']} (attempt {job['attempts']}): {str(e)}")
+                try:
+                    # Requeued with backoff up to JOB_MAX_ATTEMPTS; only requests the provider
+                    # rejects outright fail at once
+                    job_queue.fail_job(job, self.name, e,
+                                       retry_delay=llm_rate_limiter.retry_delay(SimulationManager.RETRY_DELAY)
+                                       * 2 ** (job['attempts'] - 1),
+                                       final=not is_retryable(e))
+                except Exception as fail_error:
+                    logger.error(f"Error releasing job {job['id']}: {str(fail_error)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a distributed simulation worker")
+    parser.add_argument("--concurrency", type=int,
+                        default=int(os.environ.get("WORKER_CONCURRENCY", 4)),
+                        help="exchanges generated concurrently by this worker")
+    parser.add_argument("--name", default=os.environ.get("WORKER_NAME"),
+                        help="worker identity recorded on claimed jobs (default: host-pid)")
+    args = parser.parse_args()
+
+    init_db()
+    worker = ExchangeWorker(app, concurrency=args.concurrency, name=args.name)
+
+    def signal_handler(sig, frame):
+        logger.info(f"Stopping worker {worker.name}, finishing claimed jobs...")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    worker.run()